@@ -2,22 +2,25 @@
 Culinary Order Management - Agreement Integration (price lists & item prices)
 """
 
-import frappe
-from frappe import msgprint, _
-from frappe.exceptions import ValidationError, DoesNotExistError
-from typing import Optional
 import traceback
+from contextlib import contextmanager
+from typing import Optional
+
+import frappe
+from frappe import _, msgprint
+from frappe.exceptions import DoesNotExistError, ValidationError
+from frappe.utils import cint, getdate
 
 
 def _handle_agreement_error(
-	error: Exception, 
-	context: str, 
-	doc_name: Optional[str] = None,
+	error: Exception,
+	context: str,
+	doc_name: str | None = None,
 	show_user_message: bool = True,
-	reraise: bool = True
+	reraise: bool = True,
 ) -> None:
 	"""Handle Agreement operation errors with logging and user messages.
-	
+
 	Args:
 		error: Exception to handle
 		context: Error context (e.g. "Price List Creation")
@@ -27,19 +30,19 @@ def _handle_agreement_error(
 	"""
 	error_title = f"Agreement {context} Error"
 	error_details = f"Context: {context}\n"
-	
+
 	if doc_name:
 		error_details += f"Agreement: {doc_name}\n"
-	
+
 	error_details += f"Error Type: {type(error).__name__}\n"
-	error_details += f"Error Message: {str(error)}\n"
+	error_details += f"Error Message: {error!s}\n"
 	error_details += f"Traceback:\n{traceback.format_exc()}"
-	
+
 	frappe.log_error(message=error_details, title=error_title)
-	
+
 	if show_user_message:
 		user_msg = _("Error: {0}").format(str(error))
-		
+
 		if isinstance(error, frappe.exceptions.LinkValidationError):
 			user_msg = _("Invalid reference: {0}").format(str(error))
 		elif isinstance(error, frappe.exceptions.MandatoryError):
@@ -50,9 +53,9 @@ def _handle_agreement_error(
 			user_msg = _("Record not found: {0}").format(str(error))
 		elif isinstance(error, ValidationError):
 			user_msg = _("Validation error: {0}").format(str(error))
-		
+
 		msgprint(f"❌ {user_msg}", alert=True, indicator="red")
-	
+
 	if reraise:
 		raise
 
@@ -66,7 +69,7 @@ def _get_standard_selling_rate(item_code: str, currency: str) -> float:
 	)
 	if rate:
 		return float(rate)
-	
+
 	row = frappe.db.sql(
 		"""
 		select price_list_rate from `tabItem Price`
@@ -83,10 +86,49 @@ def _get_standard_selling_rate(item_code: str, currency: str) -> float:
 	return 0.0
 
 
-def _find_existing_item_price(price_list: str, item_code: str, currency: str, valid_from, valid_upto, agreement_name: str = None):
+def _get_standard_selling_rates(item_currencies: list) -> dict:
+	"""_get_standard_selling_rate'in toplu hali.
+
+	Args:
+		item_currencies: [(item_code, currency)]
+
+	Returns:
+		dict: {(item_code, currency): rate} - fiyat bulunamayanlar 0.0
+	"""
+	pairs = {(item_code, currency) for item_code, currency in item_currencies if item_code}
+	if not pairs:
+		return {}
+
+	item_codes = list({item_code for item_code, _ in pairs})
+	placeholders = ",".join(["%s"] * len(item_codes))
+	rows = frappe.db.sql(
+		f"""
+		select item_code, currency, price_list, price_list_rate, valid_from, modified
+		from `tabItem Price`
+		where item_code in ({placeholders}) and selling=1
+		order by (valid_from is null), valid_from desc, modified desc
+		""",
+		item_codes,
+		as_dict=True,
+	)
+
+	standard = {}
+	nearest = {}
+	for row in rows:
+		key = (row.item_code, row.currency)
+		if row.price_list == "Standard Selling" and row.price_list_rate:
+			standard.setdefault(key, float(row.price_list_rate))
+		nearest.setdefault(key, float(row.price_list_rate or 0))
+
+	return {key: standard.get(key) or nearest.get(key, 0.0) for key in pairs}
+
+
+def _find_existing_item_price(
+	price_list: str, item_code: str, currency: str, valid_from, valid_upto, agreement_name: str = None
+):
 	"""Find existing Item Price by agreement name (öncelikli) veya price list + item kombinasyonu.
-	
-	Agreement name kullanarak aynı anlaşmaya ait fiyatı bulur.
+
+	Item Price.custom_agreement (index'li) ile aynı anlaşmaya ait fiyatı bulur.
 	Tarih kontrolü YAPILMAZ - sadece agreement name ile eşleşme.
 	"""
 	query = """
@@ -97,212 +139,122 @@ def _find_existing_item_price(price_list: str, item_code: str, currency: str, va
 		  AND currency = %s
 	"""
 	params = [price_list, item_code, currency]
-	
+
 	# Agreement referansı varsa onu da filtrele (EN ÖNEMLİ)
 	if agreement_name:
-		query += " AND (note = %s OR note LIKE %s)"
-		params.extend([agreement_name, f"%{agreement_name}%"])
-	
+		query += " AND custom_agreement = %s"
+		params.append(agreement_name)
+
 	result = frappe.db.sql(query, tuple(params), as_dict=False)
 	return [row[0] for row in result] if result else []
 
 
-def _delete_overlapping_item_prices(price_list: str, item_code: str, new_from, new_upto, agreement_name: str = None) -> int:
-	"""Delete Item Price rows in same price list and item that overlap with given date range.
+SUPPLIER_ITEMS_PAGE_LENGTH = 200
+
+
+def _get_supplier_catalogue_rates(item_codes: list, currency: str) -> dict:
+	"""Ürün başına Standard Selling, yoksa en yakın satış fiyatı (tek sorgu).
+
+	_get_standard_selling_rate ile aynı öncelik: önce Standard Selling, sonra
+	(valid_from is null), valid_from desc, modified desc sırasıyla ilk satış fiyatı.
 
-	If dates are null, treat as open-ended.
-	Uses SQL to find overlapping records, then ORM to delete (triggers hooks).
-	Agreement name kullanarak sadece aynı anlaşmaya ait fiyatları siler.
-	
-	Args:
-		price_list: Price list name
-		item_code: Item code
-		new_from: New start date (can be None)
-		new_upto: New end date (can be None)
-		agreement_name: Agreement name (sadece bu anlaşmaya ait fiyatları sil)
-		
 	Returns:
-		Number of deleted records
-		
-	Raises:
-		ValidationError: Critical deletion error
+		dict: {item_code: rate}
 	"""
-	if not price_list or not item_code:
-		frappe.log_error(
-			message=f"Invalid parameters: price_list={price_list}, item_code={item_code}",
-			title="Item Price Cleanup - Invalid Parameters"
-		)
-		return 0
-	
-	try:
-		# Build SQL query for overlap detection
-		conditions = ["price_list = %s", "item_code = %s"]
-		values = [price_list, item_code]
-		
-		# Agreement filtresi - sadece aynı anlaşmaya ait fiyatları sil
-		if agreement_name:
-			conditions.append("(note = %s OR note LIKE %s)")
-			values.extend([agreement_name, f"%{agreement_name}%"])
-		
-		# Overlap logic
-		if new_from and new_upto:
-			# New range: [new_from, new_upto]
-			# Overlap if: (existing_from <= new_upto) AND (existing_upto >= new_from)
-			conditions.append("(IFNULL(valid_from, '0001-01-01') <= %s)")
-			values.append(new_upto)
-			conditions.append("(IFNULL(valid_upto, '9999-12-31') >= %s)")
-			values.append(new_from)
-		elif new_from:
-			# Only start date (open end)
-			conditions.append("(IFNULL(valid_upto, '9999-12-31') >= %s)")
-			values.append(new_from)
-		elif new_upto:
-			# Only end date (open start)
-			conditions.append("(IFNULL(valid_from, '0001-01-01') <= %s)")
-			values.append(new_upto)
-		
-		query = f"""
-			SELECT name 
-			FROM `tabItem Price`
-			WHERE {' AND '.join(conditions)}
-		"""
-		
-		overlapping_prices = frappe.db.sql(query, tuple(values), as_dict=False)
-		
-		if not overlapping_prices:
-			return 0
-		
-		price_names = [row[0] for row in overlapping_prices]
-		deleted_count = 0
-		failed_deletions = []
-		
-		for price_name in price_names:
-			try:
-				frappe.delete_doc("Item Price", price_name, ignore_permissions=True, force=True)
-				deleted_count += 1
-				
-			except frappe.exceptions.LinkExistsError as e:
-				failed_deletions.append((price_name, "Link exists", str(e)))
-				frappe.log_error(
-					message=f"Cannot delete Item Price '{price_name}' (linked): {str(e)}",
-					title="Item Price Cleanup - Link Exists"
-				)
-				
-			except frappe.exceptions.PermissionError as e:
-				failed_deletions.append((price_name, "Permission denied", str(e)))
-				frappe.log_error(
-					message=f"No permission to delete Item Price '{price_name}': {str(e)}",
-					title="Item Price Cleanup - Permission Error"
-				)
-				
-			except DoesNotExistError as e:
-				frappe.log_error(
-					message=f"Item Price '{price_name}' already deleted: {str(e)}",
-					title="Item Price Cleanup - Already Deleted"
-				)
-				
-			except Exception as e:
-				failed_deletions.append((price_name, "Unknown error", str(e)))
-				frappe.log_error(
-					message=f"Error deleting Item Price '{price_name}': {str(e)}\n{traceback.format_exc()}",
-					title="Item Price Cleanup - Unknown Error"
-				)
-		
-		if failed_deletions:
-			error_msg = f"{len(failed_deletions)} records could not be deleted:\n"
-			for name, reason, details in failed_deletions[:5]:
-				error_msg += f"  - {name}: {reason}\n"
-			
-			if len(failed_deletions) > 5:
-				error_msg += f"  ... and {len(failed_deletions) - 5} more\n"
-			
-			if deleted_count == 0:
-				frappe.throw(error_msg, ValidationError)
-			
-		return deleted_count
-		
-	except frappe.exceptions.QueryTimeoutError as e:
-		error_msg = f"Database query timeout: {str(e)}"
-		frappe.log_error(
-			message=f"{error_msg}\nQuery conditions: {conditions}",
-			title="Item Price Cleanup - Query Timeout"
-		)
-		frappe.throw(error_msg, ValidationError)
-		
-	except Exception as e:
-		error_msg = f"Item Price cleanup failed: {str(e)}"
-		frappe.log_error(
-			message=f"{error_msg}\n{traceback.format_exc()}",
-			title="Item Price Cleanup - Unexpected Error"
-		)
-		frappe.throw(error_msg, ValidationError)
+	if not item_codes:
+		return {}
 
+	placeholders = ",".join(["%s"] * len(item_codes))
+	rows = frappe.db.sql(
+		f"""
+		select item_code, price_list_rate
+		from (
+			select item_code, price_list_rate,
+			       row_number() over (
+			           partition by item_code
+			           order by (price_list = 'Standard Selling' and price_list_rate > 0) desc,
+			                    (valid_from is null), valid_from desc, modified desc
+			       ) as rn
+			from `tabItem Price`
+			where selling = 1 and currency = %s and item_code in ({placeholders})
+		) ranked
+		where rn = 1
+		""",
+		[currency, *item_codes],
+		as_dict=True,
+	)
+	return {row.item_code: float(row.price_list_rate or 0) for row in rows}
 
-@frappe.whitelist()
-def get_supplier_items_with_standard_prices(supplier: str, currency: str | None = None):
-	"""Get all active items for selected supplier with standard selling prices.
 
-	Returns: [{"item_code", "item_name", "uom", "standard_selling_rate", "price_list_rate", "currency"}]
-	price_list_rate is initialized with standard_selling_rate.
-	
-	Requires: Item and Supplier read permission
-	"""
+def _check_supplier_item_permissions():
 	if not frappe.has_permission("Item", "read"):
 		frappe.throw(_("You don't have permission to read Item"), frappe.PermissionError)
-	
+
 	if not frappe.has_permission("Supplier", "read"):
 		frappe.throw(_("You don't have permission to read Supplier"), frappe.PermissionError)
-	
-	if not supplier:
-		return []
+
+
+def _get_supplier_catalogue_currency(supplier: str, currency: str | None = None) -> str:
+	if currency:
+		return currency
+	return (
+		frappe.db.get_value("Supplier", supplier, "default_currency")
+		or frappe.db.get_value("Company", {"is_group": 0}, "default_currency")
+		or "EUR"
+	)
+
+
+def _load_supplier_items(supplier: str, currency: str, cursor=None, limit: int | None = None) -> tuple:
+	"""Tedarikçi ürünlerini (item_name, item_code) sırasıyla, keyset sayfalı yükle.
+
+	Args:
+		cursor: Önceki sayfanın son satırı [item_name, item_code]
+		limit: Sayfa boyutu (None = hepsi; tüm katalog için iter_supplier_items)
+
+	Returns:
+		tuple: (rows, next_cursor) - son sayfada next_cursor None
+	"""
+	conditions = ""
+	values = {"supplier": supplier}
+	if cursor:
+		last_name, last_code = frappe.parse_json(cursor)
+		conditions = (
+			"and (i.item_name > %(last_name)s or (i.item_name = %(last_name)s and i.name > %(last_code)s))"
+		)
+		values.update(last_name=last_name, last_code=last_code)
+
+	limit_clause = ""
+	if limit:
+		# Bir fazlası: sonraki sayfa var mı?
+		limit_clause = "limit %(limit)s"
+		values["limit"] = limit + 1
 
 	items = frappe.db.sql(
-		"""
+		f"""
 		select i.name as item_code, i.item_name, i.item_group,
 		       i.is_kitchen_item as kitchen_item,
 		       i.stock_uom as uom
 		from `tabItem` i
-		join `tabItem Supplier` s on s.parent = i.name and s.supplier = %s
+		join `tabItem Supplier` s on s.parent = i.name and s.supplier = %(supplier)s
 		where i.disabled = 0 and i.is_sales_item = 1
-		order by i.item_name
+		  {conditions}
+		order by i.item_name, i.name
+		{limit_clause}
 		""",
-		supplier,
+		values,
 		as_dict=True,
 	)
 
-	if not items:
-		return []
-
-	if not currency:
-		supplier_currency = frappe.db.get_value("Supplier", supplier, "default_currency")
-		if not supplier_currency:
-			company_currency = frappe.db.get_value("Company", {"is_group": 0}, "default_currency")
-			currency = company_currency or "EUR"
-		else:
-			currency = supplier_currency
-
-	item_codes = [it.item_code for it in items]
-	placeholders = ",".join(["%s"] * len(item_codes))
-	price_rows = []
-	if item_codes:
-		price_rows = frappe.db.sql(
-			f"""
-			select item_code, price_list_rate
-			from `tabItem Price`
-			where price_list = 'Standard Selling' and selling = 1
-			  and currency = %s and item_code in ({placeholders})
-			""",
-			[currency, *item_codes],
-			as_dict=True,
-		)
+	next_cursor = None
+	if limit and len(items) > limit:
+		items = items[:limit]
+		next_cursor = [items[-1].item_name, items[-1].item_code]
 
-	price_map = {r.item_code: float(r.price_list_rate) for r in price_rows}
+	rates = _get_supplier_catalogue_rates([it.item_code for it in items], currency)
 
 	result = []
 	for it in items:
-		std_rate = price_map.get(it.item_code, 0.0)
-		if not std_rate:
-			std_rate = _get_standard_selling_rate(it.item_code, currency)
+		std_rate = rates.get(it.item_code, 0.0)
 		result.append(
 			{
 				"item_code": it.item_code,
@@ -316,58 +268,183 @@ def get_supplier_items_with_standard_prices(supplier: str, currency: str | None
 			}
 		)
 
-	return result
+	return result, next_cursor
+
+
+def iter_supplier_items(supplier: str, currency: str, batch_size: int = SUPPLIER_ITEMS_PAGE_LENGTH):
+	"""Tedarikçi kataloğunu keyset sayfalarıyla parça parça üret.
+
+	Her parça bir ürün sorgusu + bir fiyat sorgusudur; katalog tek sorguda okunmaz
+	ve fiyat sorgusunun IN listesi batch_size ile sınırlı kalır.
+
+	Yields:
+		list: En fazla batch_size satır (get_supplier_items_with_standard_prices formatında)
+	"""
+	cursor = None
+	while True:
+		items, cursor = _load_supplier_items(supplier, currency, cursor, batch_size)
+		if items:
+			yield items
+		if not cursor:
+			break
+
+
+@frappe.whitelist()
+def get_supplier_items_with_standard_prices(supplier: str, currency: str | None = None):
+	"""Get all active items for selected supplier with standard selling prices.
+
+	Returns: [{"item_code", "item_name", "uom", "standard_selling_rate", "price_list_rate", "currency"}]
+	price_list_rate is initialized with standard_selling_rate.
+	Büyük kataloglar için get_supplier_items_page kullanın.
+
+	Requires: Item and Supplier read permission
+	"""
+	_check_supplier_item_permissions()
+
+	if not supplier:
+		return []
+
+	currency = _get_supplier_catalogue_currency(supplier, currency)
+	return [item for batch in iter_supplier_items(supplier, currency) for item in batch]
+
+
+@frappe.whitelist()
+def get_supplier_items_page(
+	supplier: str,
+	currency: str | None = None,
+	cursor=None,
+	page_length: int = SUPPLIER_ITEMS_PAGE_LENGTH,
+):
+	"""get_supplier_items_with_standard_prices'ın sayfalı hali.
+
+	Client next_cursor None olana kadar sayfa sayfa çağırır ve her sayfayı
+	tabloya ekler; tüm katalog tek büyük JSON olarak beklenmez.
+
+	Returns:
+		dict: {"items": [...], "next_cursor": [item_name, item_code] | None, "currency": str}
+
+	Requires: Item and Supplier read permission
+	"""
+	_check_supplier_item_permissions()
+
+	if not supplier:
+		return {"items": [], "next_cursor": None, "currency": currency}
+
+	currency = _get_supplier_catalogue_currency(supplier, currency)
+	page_length = min(cint(page_length) or SUPPLIER_ITEMS_PAGE_LENGTH, 1000)
+	items, next_cursor = _load_supplier_items(supplier, currency, cursor, page_length)
+	return {"items": items, "next_cursor": next_cursor, "currency": currency}
+
+
+def get_active_agreement_counts(customers) -> dict:
+	"""Müşteri başına aktif (submitted) anlaşma sayısı, tek GROUP BY sorgusu.
+
+	Returns:
+		dict: {customer: count} (aktif anlaşması olmayan müşteriler 0)
+	"""
+	customers = list({customer for customer in customers if customer})
+	if not customers:
+		return {}
+
+	counts = dict.fromkeys(customers, 0)
+	for customer, count in frappe.db.sql(
+		"""
+		SELECT customer, COUNT(*)
+		FROM `tabAgreement`
+		WHERE customer IN %(customers)s
+		  AND docstatus = 1
+		  AND status = 'Active'
+		GROUP BY customer
+	""",
+		{"customers": customers},
+	):
+		counts[customer] = count
+	return counts
+
+
+def sync_price_list_states(customers) -> dict:
+	"""Müşteri Price List'lerini aktif anlaşma durumuna göre aktive/deaktive et.
+
+	Sayımlar tek sorguda yapılır, değişmesi gereken listeler en fazla iki UPDATE ile
+	güncellenir (biri enable, biri disable).
+
+	Returns:
+		dict: {price_list_name: enabled} sadece değişenler
+	"""
+	counts = get_active_agreement_counts(customers)
+	if not counts:
+		return {}
+
+	# Price List adı müşteri adıyla aynı
+	current = dict(
+		frappe.get_all(
+			"Price List",
+			filters={"name": ["in", list(counts)]},
+			fields=["name", "enabled"],
+			as_list=True,
+		)
+	)
+
+	changes = {}
+	for price_list_name, enabled in current.items():
+		should_enable = 1 if counts[price_list_name] > 0 else 0
+		if cint(enabled) != should_enable:
+			changes[price_list_name] = should_enable
+
+	for should_enable in (1, 0):
+		names = [name for name, enabled in changes.items() if enabled == should_enable]
+		if names:
+			frappe.db.set_value(
+				"Price List", {"name": ["in", names]}, "enabled", should_enable, update_modified=False
+			)
+			frappe.logger().info(
+				f"Price List {', '.join(names)} {'aktivated' if should_enable else 'deactivated'}"
+			)
+
+	return changes
 
 
 def create_price_list_for_agreement(doc, method):
 	"""Create/update price list when Agreement is created/updated.
-	
+
 	Each agreement item can have its own currency.
 	Manual commits removed (uses Frappe's automatic transaction management).
-	
+
 	Raises:
 		ValidationError: Price list creation failed or invalid data
 	"""
 	if not doc.customer:
 		error_msg = _("Customer field is empty, cannot create price list")
-		frappe.log_error(
-			message=error_msg,
-			title="Agreement Price List - Missing Customer"
-		)
+		frappe.log_error(message=error_msg, title="Agreement Price List - Missing Customer")
 		msgprint(f"❌ {error_msg}", indicator="red", alert=True)
 		frappe.throw(error_msg, ValidationError)
-		
+
 	try:
 		price_list_created = False
 		currencies_used = set()
 		for item in doc.agreement_items:
 			if item.currency:
 				currencies_used.add(item.currency)
-		
+
 		if not currencies_used:
 			try:
 				company_currency = frappe.db.get_value("Company", {"is_group": 0}, "default_currency")
 				if not company_currency:
 					frappe.log_error(
 						message="No default currency found for company",
-						title="Agreement Price List - Missing Currency"
+						title="Agreement Price List - Missing Currency",
 					)
 					company_currency = "EUR"
 				currencies_used.add(company_currency)
 			except DoesNotExistError:
 				frappe.throw(_("Company not found, cannot determine default currency"), ValidationError)
-		
+
+		# Müşterinin herhangi bir aktif anlaşması var mı kontrol et (para birimi döngüsünden bağımsız)
+		should_enable = 1 if get_active_agreement_counts([doc.customer]).get(doc.customer) else 0
+
 		for currency in currencies_used:
 			price_list_name = f"{doc.customer}"
-			
-			# Müşterinin herhangi bir aktif anlaşması var mı kontrol et
-			active_count = frappe.db.count("Agreement", {
-				"customer": doc.customer,
-				"docstatus": 1,
-				"status": "Active"
-			})
-			should_enable = 1 if active_count > 0 else 0
-			
+
 			try:
 				if not frappe.db.exists("Price List", price_list_name):
 					price_list = frappe.new_doc("Price List")
@@ -378,9 +455,19 @@ def create_price_list_for_agreement(doc, method):
 					price_list.insert(ignore_permissions=True)
 					price_list_created = True
 					if should_enable:
-						msgprint(_("✅ Price List '{0}' created and activated ({1})").format(price_list_name, currency), indicator="green")
+						msgprint(
+							_("✅ Price List '{0}' created and activated ({1})").format(
+								price_list_name, currency
+							),
+							indicator="green",
+						)
 					else:
-						msgprint(_("✅ Price List '{0}' created (will be activated when agreement becomes active)").format(price_list_name), indicator="blue")
+						msgprint(
+							_(
+								"✅ Price List '{0}' created (will be activated when agreement becomes active)"
+							).format(price_list_name),
+							indicator="blue",
+						)
 				else:
 					price_list = frappe.get_doc("Price List", price_list_name)
 					price_list_created = True
@@ -389,368 +476,886 @@ def create_price_list_for_agreement(doc, method):
 						price_list.enabled = should_enable
 						price_list.save(ignore_permissions=True)
 						if should_enable:
-							msgprint(_("✅ Price List '{0}' activated").format(price_list_name), indicator="green")
+							msgprint(
+								_("✅ Price List '{0}' activated").format(price_list_name), indicator="green"
+							)
 						else:
-							msgprint(_("ℹ️ Price List '{0}' deactivated (no active agreements)").format(price_list_name), indicator="orange")
+							msgprint(
+								_("ℹ️ Price List '{0}' deactivated (no active agreements)").format(
+									price_list_name
+								),
+								indicator="orange",
+							)
 					else:
-						msgprint(_("✅ Price List '{0}' already exists").format(price_list_name), indicator="blue")
-						
+						msgprint(
+							_("✅ Price List '{0}' already exists").format(price_list_name), indicator="blue"
+						)
+
 			except frappe.exceptions.DuplicateEntryError as e:
 				if frappe.db.exists("Price List", price_list_name):
 					frappe.log_error(
 						message=f"Price list '{price_list_name}' already exists (race condition)",
-						title="Agreement Price List - Duplicate Entry"
+						title="Agreement Price List - Duplicate Entry",
 					)
 					continue
 				else:
-					frappe.throw(_("Price List creation failed (duplicate): {0}").format(str(e)), ValidationError)
-					
+					frappe.throw(
+						_("Price List creation failed (duplicate): {0}").format(str(e)), ValidationError
+					)
+
 			except frappe.exceptions.MandatoryError as e:
 				frappe.throw(_("Mandatory field missing (Price List): {0}").format(str(e)), ValidationError)
-				
+
 			except ValidationError as e:
 				frappe.throw(_("Price List validation error: {0}").format(str(e)), ValidationError)
 
 		# Price List başarıyla oluşturuldu mu kontrol et
 		if not price_list_created:
 			error_msg = _("Failed to create or verify Price List for customer '{0}'").format(doc.customer)
-			frappe.log_error(
-				message=error_msg,
-				title="Agreement Price List - Creation Failed"
-			)
+			frappe.log_error(message=error_msg, title="Agreement Price List - Creation Failed")
 			msgprint(f"❌ {error_msg}", indicator="red", alert=True)
 			frappe.throw(error_msg, ValidationError)
-		
+
 		try:
 			doc.price_list = f"{doc.customer}"
 			doc.db_set("price_list", doc.price_list, update_modified=False)
 		except Exception as e:
 			frappe.throw(_("Could not link Price List to Agreement: {0}").format(str(e)), ValidationError)
-		
+
 		# Price List var, şimdi fiyatları senkronize et
 		sync_item_prices(doc, method)
-	
+
 	except frappe.exceptions.LinkValidationError as e:
 		_handle_agreement_error(e, "Price List Creation", doc.name)
-		
+
 	except frappe.exceptions.MandatoryError as e:
 		_handle_agreement_error(e, "Price List Creation", doc.name)
-		
+
 	except ValidationError as e:
 		_handle_agreement_error(e, "Price List Creation", doc.name)
-	
+
 	except Exception as e:
 		_handle_agreement_error(e, "Price List Creation", doc.name)
 
 
-def sync_item_prices(doc, method):
-	"""Sync Item Prices when Agreement is updated.
-	
-	Each item is added to price list based on its currency.
-	Overlapping records are cleaned using ORM (triggers hooks).
-	
-	Raises:
-		ValidationError: Item Price synchronization failed
+ITEM_PRICE_BATCH_SIZE = 500
+
+
+def _chunks(values: list, size: int = ITEM_PRICE_BATCH_SIZE):
+	"""Listeyi size uzunluğunda parçalara böl."""
+	for i in range(0, len(values), size):
+		yield values[i : i + size]
+
+
+def _skip_item_price_hooks() -> bool:
+	"""Item Price yazımlarında ORM hook'larını atla (site_config ile opt-in).
+
+	Bu uygulamanın Item Price hook'u sadece Standard Selling için çalışır; müşteri
+	price list'leri için atlamak güvenlidir. Başka uygulamalar Item Price hook'u
+	kullanıyorsa `culinary_item_price_sync_skip_hooks` açılmamalıdır.
 	"""
-	if not doc.customer:
-		frappe.log_error(
-			message="Customer field is empty",
-			title="Agreement Item Price Sync - Missing Customer"
-		)
-		msgprint(_("❌ Customer field is missing, cannot sync prices"), indicator="red", alert=True)
-		return
-	
-	# Price List varlık kontrolü - MUTLAKA olmalı
-	price_list_name = f"{doc.customer}"
-	if not frappe.db.exists("Price List", price_list_name):
-		error_msg = _("Price List '{0}' not found! Please create price list first.").format(price_list_name)
-		frappe.log_error(
-			message=f"Price List '{price_list_name}' does not exist for agreement {doc.name}",
-			title="Agreement Item Price Sync - Critical: Price List Missing"
-		)
-		msgprint(f"❌ {error_msg}", indicator="red", alert=True)
-		frappe.throw(error_msg, ValidationError)
-		
-	try:
-		discount_rate = frappe.utils.flt(getattr(doc, "discount_rate", 0))
-		
-		try:
-			company_ccy = frappe.db.get_value("Company", {"is_group": 0}, "default_currency")
-			if not company_ccy:
-				company_ccy = "EUR"
-				frappe.log_error(
-					message="No default currency found, using EUR",
-					title="Agreement Item Price Sync - Missing Currency"
-				)
-		except Exception as e:
-			company_ccy = "EUR"
+	return bool(frappe.conf.get("culinary_item_price_sync_skip_hooks"))
+
+
+def _is_overlapping(valid_from, valid_upto, new_from, new_upto) -> bool:
+	"""İki tarih aralığı çakışıyor mu? Boş tarihler açık uçlu kabul edilir."""
+	if new_upto and valid_from and getdate(valid_from) > getdate(new_upto):
+		return False
+	if new_from and valid_upto and getdate(valid_upto) < getdate(new_from):
+		return False
+	return True
+
+
+def _get_agreement_item_prices(price_list: str, agreement_name: str) -> list:
+	"""Anlaşmaya ait tüm Item Price kayıtlarını tek sorguda getir."""
+	return frappe.db.sql(
+		"""
+		SELECT name, item_code, currency, price_list_rate, valid_from, valid_upto
+		FROM `tabItem Price`
+		WHERE price_list = %s
+		  AND custom_agreement = %s
+		""",
+		(price_list, agreement_name),
+		as_dict=True,
+	)
+
+
+def _get_agreement_price_targets(doc, company_ccy: str, failed_items: list) -> dict:
+	"""Anlaşmanın olması gereken fiyat setini hesapla.
+
+	Returns:
+		dict: {(item_code, currency): effective_rate}
+	"""
+	discount_rate = frappe.utils.flt(getattr(doc, "discount_rate", 0))
+	targets = {}
+
+	for item in doc.agreement_items:
+		if not item.item_code:
 			frappe.log_error(
-				message=f"Could not get company currency: {str(e)}",
-				title="Agreement Item Price Sync - Currency Error"
+				message=f"Item code is empty in row {item.idx}",
+				title="Agreement Item Price Sync - Missing Item Code",
 			)
-		
-		processed_items = 0
-		deleted_prices = 0
-		failed_items = []
-		
-		for item in doc.agreement_items:
-			if not item.item_code:
-				frappe.log_error(
-					message=f"Item code is empty in row {item.idx}",
-					title="Agreement Item Price Sync - Missing Item Code"
-				)
-				continue
-				
-			try:
-				item_ccy = item.currency or company_ccy
-				price_list_name = f"{doc.customer}"
-				
-				try:
-					# Sadece bu anlaşmaya ait fiyatları temizle
-					deleted_count = _delete_overlapping_item_prices(
-						price_list_name, 
-						item.item_code, 
-						doc.valid_from, 
-						doc.valid_to,
-						doc.name  # Agreement name ekledik
-					)
-					deleted_prices += deleted_count
-				except ValidationError as e:
-					frappe.log_error(
-						message=f"Cleanup failed for item {item.item_code}: {str(e)}",
-						title="Agreement Item Price Sync - Cleanup Failed"
-					)
-				
-				if not frappe.db.exists("Price List", price_list_name):
-					error_msg = f"Price List '{price_list_name}' not found"
-					frappe.log_error(
-						message=f"{error_msg} (Item: {item.item_code})",
-						title="Agreement Item Price Sync - Price List Not Found"
-					)
-					failed_items.append((item.item_code, error_msg))
-					continue
-					
-				row_agreement_rate = frappe.utils.flt(getattr(item, "price_list_rate", 0))
-				if row_agreement_rate:
-					effective_rate = row_agreement_rate
-				else:
-					std_rate = frappe.utils.flt(getattr(item, "standard_selling_rate", 0))
-					if not std_rate:
-						try:
-							std_rate = _get_standard_selling_rate(item.item_code, item_ccy)
-						except Exception as e:
-							frappe.log_error(
-								message=f"Could not get standard selling rate for {item.item_code}: {str(e)}",
-								title="Agreement Item Price Sync - Rate Not Found"
-							)
-							std_rate = 0.0
-					
-					effective_rate = std_rate * (1.0 - (discount_rate / 100.0)) if discount_rate else std_rate
-				
-				if effective_rate <= 0:
-					error_msg = "Valid price not found or zero"
-					frappe.log_error(
-						message=f"{error_msg} (Item: {item.item_code}, Rate: {effective_rate})",
-						title="Agreement Item Price Sync - Invalid Rate"
-					)
-					failed_items.append((item.item_code, error_msg))
-					continue
-				
-				# Bu anlaşmaya ait mevcut fiyatı bul
-				existing = _find_existing_item_price(
-					price_list_name, 
-					item.item_code, 
-					item_ccy, 
-					doc.valid_from, 
-					doc.valid_to,
-					doc.name  # Agreement name ekledik
-				)
-				
+			continue
+
+		item_ccy = item.currency or company_ccy
+		row_agreement_rate = frappe.utils.flt(getattr(item, "price_list_rate", 0))
+		if row_agreement_rate:
+			effective_rate = row_agreement_rate
+		else:
+			std_rate = frappe.utils.flt(getattr(item, "standard_selling_rate", 0))
+			if not std_rate:
 				try:
-					if existing:
-						ip = frappe.get_doc("Item Price", existing[0])
-						ip.price_list_rate = effective_rate
-						if hasattr(ip, "customer"):
-							setattr(ip, "customer", doc.customer)
-						# Agreement referansını güncelle
-						ip.note = doc.name
-						ip.save(ignore_permissions=True)
-					else:
-						ip = frappe.new_doc("Item Price")
-						ip.item_code = item.item_code
-						ip.price_list = price_list_name
-						ip.price_list_rate = effective_rate
-						ip.currency = item_ccy
-						ip.valid_from = doc.valid_from
-						ip.valid_upto = doc.valid_to
-						# Agreement referansını kaydet (note alanına)
-						ip.note = doc.name
-						if hasattr(ip, "customer"):
-							setattr(ip, "customer", doc.customer)
-						ip.insert(ignore_permissions=True)
-					
-					processed_items += 1
-					
-				except frappe.exceptions.MandatoryError as e:
-					error_msg = f"Mandatory field missing: {str(e)}"
-					failed_items.append((item.item_code, error_msg))
-					frappe.log_error(
-						message=f"{error_msg} (Item: {item.item_code})",
-						title="Agreement Item Price Sync - Mandatory Error"
-					)
-					
-				except ValidationError as e:
-					error_msg = f"Validation error: {str(e)}"
-					failed_items.append((item.item_code, error_msg))
+					std_rate = _get_standard_selling_rate(item.item_code, item_ccy)
+				except Exception as e:
 					frappe.log_error(
-						message=f"{error_msg} (Item: {item.item_code})",
-						title="Agreement Item Price Sync - Validation Error"
+						message=f"Could not get standard selling rate for {item.item_code}: {e!s}",
+						title="Agreement Item Price Sync - Rate Not Found",
 					)
-					
-			except Exception as e:
-				error_msg = f"Unexpected error: {str(e)}"
-				failed_items.append((item.item_code, error_msg))
-				frappe.log_error(
-					message=f"{error_msg}\n{traceback.format_exc()}",
-					title="Agreement Item Price Sync - Item Error"
-				)
-		
-		if processed_items > 0:
-			msg = _("✅ {0} item prices updated").format(processed_items)
-			if deleted_prices > 0:
-				msg += _(" ({0} old records cleaned)").format(deleted_prices)
-			msgprint(msg, indicator="green", alert=True)
+					std_rate = 0.0
+
+			effective_rate = std_rate * (1.0 - (discount_rate / 100.0)) if discount_rate else std_rate
+
+		if effective_rate <= 0:
+			error_msg = "Valid price not found or zero"
+			frappe.log_error(
+				message=f"{error_msg} (Item: {item.item_code}, Rate: {effective_rate})",
+				title="Agreement Item Price Sync - Invalid Rate",
+			)
+			failed_items.append((item.item_code, error_msg))
+			continue
+
+		targets[(item.item_code, item_ccy)] = effective_rate
+
+	return targets
+
+
+def _plan_item_price_sync(doc, targets: dict, existing: list) -> tuple:
+	"""Hedef fiyat seti ile mevcut Item Price kayıtlarını karşılaştır.
+
+	- Her (item_code, currency) hedefi için bir mevcut kayıt güncellenir (varsa)
+	- Eşleşmeyen, anlaşma tarihleriyle çakışan kayıtlar silinir
+	- Anlaşmadan çıkarılmış ürünlerin kayıtları silinir
+
+	Returns:
+		tuple: (inserts [(item_code, currency, rate)], updates {name: {field: value}},
+		deletes [name], unchanged count)
+	"""
+	agreement_item_codes = {item_code for item_code, _ in targets}
+	agreement_item_codes.update(item.item_code for item in doc.agreement_items if item.item_code)
+
+	# Çakışan kayıtlar önce eşleşsin
+	existing = sorted(
+		existing,
+		key=lambda r: not _is_overlapping(r.valid_from, r.valid_upto, doc.valid_from, doc.valid_to),
+	)
+
+	matched = set()
+	updates = {}
+	deletes = []
+	unchanged = 0
+
+	for row in existing:
+		key = (row.item_code, row.currency)
+		if key in targets and key not in matched:
+			matched.add(key)
+			changes = {}
+			if abs(frappe.utils.flt(row.price_list_rate) - targets[key]) > 1e-9:
+				changes["price_list_rate"] = targets[key]
+			if str(row.valid_from or "") != str(doc.valid_from or ""):
+				changes["valid_from"] = doc.valid_from
+			if str(row.valid_upto or "") != str(doc.valid_to or ""):
+				changes["valid_upto"] = doc.valid_to
+			if changes:
+				updates[row.name] = changes
+			else:
+				unchanged += 1
+		elif row.item_code not in agreement_item_codes or _is_overlapping(
+			row.valid_from, row.valid_upto, doc.valid_from, doc.valid_to
+		):
+			deletes.append(row.name)
+
+	inserts = [
+		(item_code, currency, rate)
+		for (item_code, currency), rate in targets.items()
+		if (item_code, currency) not in matched
+	]
+	return inserts, updates, deletes, unchanged
+
+
+PRICE_SYNC_PROGRESS_STEP = 50
+
+
+def _report_progress(on_progress, count: int = 1):
+	if on_progress:
+		on_progress(count)
+
+
+def _make_price_sync_progress(doc, total: int):
+	"""Arka plan senkronizasyonunda forma ilerleme yayınlayan sayaç döndür.
+
+	Sadece doc.flags.price_sync_progress açıksa (bkz. run_agreement_price_sync)
+	yayın yapılır; her PRICE_SYNC_PROGRESS_STEP kayıtta bir güncellenir.
+	"""
+	if not doc.flags.price_sync_progress or not total:
+		return None
+
+	state = {"done": 0, "published": 0}
+
+	def on_progress(count: int):
+		state["done"] += count
+		if state["done"] - state["published"] < PRICE_SYNC_PROGRESS_STEP and state["done"] < total:
+			return
+		state["published"] = state["done"]
+		frappe.publish_progress(
+			min(state["done"], total) * 100 / total,
+			title=_("Generating Item Prices"),
+			doctype="Agreement",
+			docname=doc.name,
+			description=_("{0} / {1} item prices").format(min(state["done"], total), total),
+		)
+
+	return on_progress
+
+
+def _get_linked_item_prices(price_names: list) -> dict:
+	"""Başka belgelerden (iptal edilmemiş) link verilen Item Price'ları bul.
+
+	Link alanı başına bir sorgu; frappe.delete_doc'un tek tek yaptığı kontrolün toplu hali.
+
+	Returns:
+		dict: {item_price_name: linked_doctype}
+	"""
+	from frappe.model.rename_doc import get_link_fields
+
+	linked = {}
+	for link_field in get_link_fields("Item Price"):
+		if link_field.get("issingle"):
+			continue
+		remaining = [name for name in price_names if name not in linked]
+		if not remaining:
+			break
+		for name in frappe.get_all(
+			link_field["parent"],
+			filters={link_field["fieldname"]: ["in", remaining], "docstatus": ["<", 2]},
+			pluck=link_field["fieldname"],
+			distinct=True,
+		):
+			linked[name] = link_field["parent"]
+	return linked
+
+
+def _delete_item_prices(price_names: list, skip_hooks: bool = False, on_progress=None) -> tuple:
+	"""Item Price kayıtlarını toplu sil.
+
+	skip_hooks=False: ORM ile tek tek silinir (hook ve link kontrolleri çalışır).
+	skip_hooks=True: ITEM_PRICE_BATCH_SIZE'lık parçalar halinde tek DELETE ile silinir.
+
+	Returns:
+		tuple: (deleted_count, failed [(name, reason, details)])
+	"""
+	deleted_count = 0
+	failed_deletions = []
+
+	if skip_hooks:
+		for batch in _chunks(price_names):
+			# ORM'in link kontrolü yerine parça başına toplu kontrol
+			linked = _get_linked_item_prices(batch)
+			for price_name, linked_doctype in linked.items():
+				failed_deletions.append((price_name, "Link exists", f"Linked with {linked_doctype}"))
+
+			batch = [price_name for price_name in batch if price_name not in linked]
+			if batch:
+				frappe.db.delete("Item Price", {"name": ["in", batch]})
+				deleted_count += len(batch)
+			_report_progress(on_progress, len(batch) + len(linked))
+
+		if failed_deletions:
+			frappe.log_error(
+				message="Cannot delete linked Item Prices:\n"
+				+ "\n".join(f"{name}: {details}" for name, reason, details in failed_deletions),
+				title="Item Price Cleanup - Link Exists",
+			)
+		return deleted_count, failed_deletions
+
+	for price_name in price_names:
+		_report_progress(on_progress)
+		try:
+			frappe.delete_doc("Item Price", price_name, ignore_permissions=True, force=True)
+			deleted_count += 1
+
+		except frappe.exceptions.LinkExistsError as e:
+			failed_deletions.append((price_name, "Link exists", str(e)))
+			frappe.log_error(
+				message=f"Cannot delete Item Price '{price_name}' (linked): {e!s}",
+				title="Item Price Cleanup - Link Exists",
+			)
+
+		except frappe.exceptions.PermissionError as e:
+			failed_deletions.append((price_name, "Permission denied", str(e)))
+			frappe.log_error(
+				message=f"No permission to delete Item Price '{price_name}': {e!s}",
+				title="Item Price Cleanup - Permission Error",
+			)
+
+		except DoesNotExistError as e:
+			frappe.log_error(
+				message=f"Item Price '{price_name}' already deleted: {e!s}",
+				title="Item Price Cleanup - Already Deleted",
+			)
+
+		except Exception as e:
+			failed_deletions.append((price_name, "Unknown error", str(e)))
+			frappe.log_error(
+				message=f"Error deleting Item Price '{price_name}': {e!s}\n{traceback.format_exc()}",
+				title="Item Price Cleanup - Unknown Error",
+			)
+
+	return deleted_count, failed_deletions
+
+
+def _update_item_prices(doc, updates: dict, skip_hooks: bool, failed_items: list, on_progress=None) -> int:
+	"""Planlanan Item Price güncellemelerini uygula."""
+	if not updates:
+		return 0
+
+	if skip_hooks:
+		names = list(updates)
+		for batch in _chunks(names):
+			frappe.db.bulk_update(
+				"Item Price",
+				{name: updates[name] for name in batch},
+				chunk_size=ITEM_PRICE_BATCH_SIZE,
+			)
+			_report_progress(on_progress, len(batch))
+		return len(names)
+
+	updated = 0
+	for name, changes in updates.items():
+		_report_progress(on_progress)
+		try:
+			ip = frappe.get_doc("Item Price", name)
+			ip.update(changes)
+			if hasattr(ip, "customer"):
+				ip.customer = doc.customer
+			# Agreement referansını güncelle
+			ip.note = doc.name
+			ip.custom_agreement = doc.name
+			ip.save(ignore_permissions=True)
+			updated += 1
+		except Exception as e:
+			_record_item_price_failure(failed_items, name, e)
+	return updated
+
+
+def _insert_item_prices(
+	doc, price_list_name: str, inserts: list, skip_hooks: bool, failed_items: list, on_progress=None
+) -> int:
+	"""Planlanan yeni Item Price kayıtlarını oluştur."""
+	if not inserts:
+		return 0
+
+	if skip_hooks:
+		return _bulk_insert_item_prices(doc, price_list_name, inserts, on_progress)
+
+	inserted = 0
+	for item_code, currency, rate in inserts:
+		_report_progress(on_progress)
+		try:
+			ip = frappe.new_doc("Item Price")
+			ip.item_code = item_code
+			ip.price_list = price_list_name
+			ip.price_list_rate = rate
+			ip.currency = currency
+			ip.valid_from = doc.valid_from
+			ip.valid_upto = doc.valid_to
+			# Agreement referansını kaydet (note: okunabilir, custom_agreement: index'li)
+			ip.note = doc.name
+			ip.custom_agreement = doc.name
+			if hasattr(ip, "customer"):
+				ip.customer = doc.customer
+			ip.insert(ignore_permissions=True)
+			inserted += 1
+		except Exception as e:
+			_record_item_price_failure(failed_items, item_code, e)
+	return inserted
+
+
+def _bulk_insert_item_prices(doc, price_list_name: str, inserts: list, on_progress=None) -> int:
+	"""Item Price kayıtlarını çok satırlı INSERT ile oluştur (hook'suz yol).
+
+	Item Price.validate'in doldurduğu alanlar (item_name, item_description,
+	buying/selling, reference) burada toplu olarak hesaplanır.
+	"""
+	item_codes = list({item_code for item_code, _, _ in inserts})
+	item_details = {
+		row.name: row
+		for row in frappe.get_all(
+			"Item",
+			filters={"name": ["in", item_codes]},
+			fields=["name", "item_name", "description"],
+		)
+	}
+	price_list = frappe.db.get_value(
+		"Price List", price_list_name, ["buying", "selling"], as_dict=True
+	) or frappe._dict(buying=0, selling=1)
+
+	now = frappe.utils.now()
+	user = frappe.session.user
+	fields = [
+		"name",
+		"creation",
+		"modified",
+		"owner",
+		"modified_by",
+		"docstatus",
+		"item_code",
+		"item_name",
+		"item_description",
+		"price_list",
+		"buying",
+		"selling",
+		"currency",
+		"price_list_rate",
+		"valid_from",
+		"valid_upto",
+		"note",
+		"custom_agreement",
+		"customer",
+		"reference",
+	]
+	values = []
+	for item_code, currency, rate in inserts:
+		item = item_details.get(item_code) or frappe._dict()
+		values.append(
+			(
+				frappe.generate_hash(length=10),
+				now,
+				now,
+				user,
+				user,
+				0,
+				item_code,
+				item.item_name,
+				item.description,
+				price_list_name,
+				price_list.buying,
+				price_list.selling,
+				currency,
+				rate,
+				doc.valid_from,
+				doc.valid_to,
+				doc.name,
+				doc.name,
+				doc.customer,
+				doc.customer if price_list.selling else None,
+			)
+		)
+
+	for batch in _chunks(values):
+		frappe.db.bulk_insert("Item Price", fields, batch)
+		_report_progress(on_progress, len(batch))
+	return len(values)
+
+
+def _record_item_price_failure(failed_items: list, item_code: str, error: Exception):
+	if isinstance(error, frappe.exceptions.MandatoryError):
+		error_msg = f"Mandatory field missing: {error!s}"
+		message = f"{error_msg} (Item: {item_code})"
+		title = "Agreement Item Price Sync - Mandatory Error"
+	elif isinstance(error, ValidationError):
+		error_msg = f"Validation error: {error!s}"
+		message = f"{error_msg} (Item: {item_code})"
+		title = "Agreement Item Price Sync - Validation Error"
+	else:
+		error_msg = f"Unexpected error: {error!s}"
+		message = f"{error_msg}\n{traceback.format_exc()}"
+		title = "Agreement Item Price Sync - Item Error"
+	failed_items.append((item_code, error_msg))
+	frappe.log_error(message=message, title=title)
+
+
+def sync_item_prices(doc, method, skip_hooks: bool | None = None):
+	"""Sync Item Prices when Agreement is updated.
+
+	Hedef fiyat seti tüm anlaşma için hesaplanır, mevcut Item Price kayıtları
+	tek sorguyla okunur ve fark (insert/update/delete) parçalar halinde uygulanır.
+
+	Args:
+		doc: Agreement document
+		method: Hook method name
+		skip_hooks: Item Price ORM hook'larını atla (None ise site_config'e bakılır)
+
+	Raises:
+		ValidationError: Item Price synchronization failed
+	"""
+	if not doc.customer:
+		frappe.log_error(
+			message="Customer field is empty", title="Agreement Item Price Sync - Missing Customer"
+		)
+		msgprint(_("❌ Customer field is missing, cannot sync prices"), indicator="red", alert=True)
+		return
+
+	# Price List varlık kontrolü - MUTLAKA olmalı
+	price_list_name = f"{doc.customer}"
+	if not frappe.db.exists("Price List", price_list_name):
+		error_msg = _("Price List '{0}' not found! Please create price list first.").format(price_list_name)
+		frappe.log_error(
+			message=f"Price List '{price_list_name}' does not exist for agreement {doc.name}",
+			title="Agreement Item Price Sync - Critical: Price List Missing",
+		)
+		msgprint(f"❌ {error_msg}", indicator="red", alert=True)
+		frappe.throw(error_msg, ValidationError)
+
+	if skip_hooks is None:
+		skip_hooks = _skip_item_price_hooks()
+
+	try:
+		try:
+			company_ccy = frappe.db.get_value("Company", {"is_group": 0}, "default_currency")
+			if not company_ccy:
+				company_ccy = "EUR"
+				frappe.log_error(
+					message="No default currency found, using EUR",
+					title="Agreement Item Price Sync - Missing Currency",
+				)
+		except Exception as e:
+			company_ccy = "EUR"
+			frappe.log_error(
+				message=f"Could not get company currency: {e!s}",
+				title="Agreement Item Price Sync - Currency Error",
+			)
+
+		failed_items = []
+		targets = _get_agreement_price_targets(doc, company_ccy, failed_items)
+		existing = _get_agreement_item_prices(price_list_name, doc.name)
+		inserts, updates, deletes, unchanged = _plan_item_price_sync(doc, targets, existing)
+		on_progress = _make_price_sync_progress(doc, len(deletes) + len(updates) + len(inserts))
+
+		deleted_prices, failed_deletions = _delete_item_prices(deletes, skip_hooks, on_progress)
+		if failed_deletions:
+			frappe.log_error(
+				message=f"{len(failed_deletions)} Item Price records could not be deleted for agreement {doc.name}",
+				title="Agreement Item Price Sync - Cleanup Failed",
+			)
+
+		processed_items = unchanged
+		processed_items += _update_item_prices(doc, updates, skip_hooks, failed_items, on_progress)
+		processed_items += _insert_item_prices(
+			doc, price_list_name, inserts, skip_hooks, failed_items, on_progress
+		)
+
+		if processed_items > 0:
+			msg = _("✅ {0} item prices updated").format(processed_items)
+			if deleted_prices > 0:
+				msg += _(" ({0} old records cleaned)").format(deleted_prices)
+			msgprint(msg, indicator="green", alert=True)
 		else:
 			# Hiç item işlenemediyse uyarı ver
 			if not failed_items:
 				msgprint(_("⚠️ No items to process in this agreement"), indicator="orange", alert=True)
-		
+
 		if failed_items:
 			error_summary = _("⚠️ {0} items could not be processed:").format(len(failed_items)) + "\n"
 			for item_code, reason in failed_items[:3]:
 				error_summary += f"  - {item_code}: {reason}\n"
-			
+
 			if len(failed_items) > 3:
 				error_summary += _("  ... and {0} more").format(len(failed_items) - 3) + "\n"
-			
+
 			msgprint(error_summary, indicator="orange", alert=True)
-			
+
 			if processed_items == 0:
 				# Hiçbir fiyat oluşturulamadıysa MUTLAKA throw et
-				frappe.throw(_("❌ No item prices could be synchronized!") + f"\n{error_summary}", ValidationError)
-		
+				frappe.throw(
+					_("❌ No item prices could be synchronized!") + f"\n{error_summary}", ValidationError
+				)
+
 	except frappe.exceptions.LinkValidationError as e:
 		_handle_agreement_error(e, "Item Price Sync", doc.name)
-		
+
 	except ValidationError as e:
 		_handle_agreement_error(e, "Item Price Sync", doc.name)
-		
+
 	except Exception as e:
 		_handle_agreement_error(e, "Item Price Sync", doc.name)
 
 
-def cleanup_item_prices(doc, method):
-	"""Clean up Item Prices when Agreement is cancelled.
-	
-	Overlapping records are deleted using ORM (triggers hooks).
-	
+PRICE_SYNC_JOB_PREFIX = "agreement_price_sync"
+
+
+def _get_async_price_sync_threshold() -> int:
+	"""Bu sayıda veya daha fazla ürünü olan anlaşmalarda fiyatlar arka planda üretilir.
+
+	site_config: `culinary_async_price_sync_threshold` (varsayılan 50, 0 = her zaman arka plan).
+	"""
+	value = frappe.conf.get("culinary_async_price_sync_threshold")
+	return 50 if value is None else cint(value)
+
+
+def should_sync_prices_async(doc) -> bool:
+	return len(doc.agreement_items or []) >= _get_async_price_sync_threshold()
+
+
+def enqueue_agreement_price_sync(doc):
+	"""Fiyat üretimini arka plan job'ına al ve anlaşmayı Pending olarak işaretle.
+
+	Aynı anlaşma için kuyrukta bekleyen job varsa yenisi eklenmez.
+	"""
+	doc.db_set("price_sync_status", "Pending", update_modified=False, notify=True)
+	frappe.enqueue(
+		"culinary_order_management.culinary_order_management.agreement.run_agreement_price_sync",
+		queue="long",
+		timeout=3600,
+		job_id=f"{PRICE_SYNC_JOB_PREFIX}::{doc.name}",
+		deduplicate=True,
+		enqueue_after_commit=True,
+		agreement_name=doc.name,
+	)
+	msgprint(_("⏳ Item prices are being generated in the background"), indicator="blue", alert=True)
+
+
+def run_agreement_price_sync(agreement_name: str):
+	"""Arka plan job'ı: anlaşmanın Price List ve Item Price kayıtlarını oluşturur.
+
+	sync_item_prices diff tabanlı olduğundan job tekrar çalıştırıldığında mevcut
+	kayıtlar güncellenir, mükerrer Item Price oluşmaz.
+	"""
+	doc = frappe.get_doc("Agreement", agreement_name)
+
+	# Job beklerken iptal/expire olduysa fiyat üretme
+	if doc.docstatus != 1 or doc.status != "Active":
+		doc.db_set("price_sync_status", None, update_modified=False, notify=True)
+		frappe.db.commit()
+		return
+
+	doc.db_set("price_sync_status", "Running", update_modified=False, notify=True)
+	frappe.db.commit()
+
+	doc.flags.price_sync_progress = True
+	try:
+		create_price_list_for_agreement(doc, "background_job")
+		doc.db_set("price_sync_status", "Done", update_modified=False, notify=True)
+		frappe.db.commit()
+	except Exception:
+		frappe.db.rollback()
+		doc.db_set("price_sync_status", "Failed", update_modified=False, notify=True)
+		frappe.db.commit()
+		raise
+
+
+@frappe.whitelist()
+def retry_agreement_price_sync(agreement_name: str):
+	"""Başarısız fiyat senkronizasyonunu yeniden kuyruğa al."""
+	doc = frappe.get_doc("Agreement", agreement_name)
+	doc.check_permission("write")
+
+	if doc.docstatus != 1 or doc.status != "Active":
+		frappe.throw(_("Only submitted and active agreements can sync prices"))
+
+	enqueue_agreement_price_sync(doc)
+	return {"success": True}
+
+
+def cleanup_item_prices(doc, method, skip_hooks: bool | None = None):
+	"""Clean up Item Prices when Agreement is cancelled/expired.
+
+	Anlaşmaya ait (custom_agreement) tüm Item Price kayıtları tek sorguyla bulunur ve
+	parçalar halinde silinir. Link verilmiş kayıtlar silinmez, raporlanır.
+
+	Args:
+		doc: Agreement document
+		method: Hook method name
+		skip_hooks: True ise toplu DELETE (hızlı yol), False ise ORM ile silinir
+			(hook ve link kontrolleri); None ise site_config'e bakılır
+
+	Returns:
+		dict: {"deleted": int, "failed": [(name, reason, details)]}; silinecek kayıt yoksa
+		(müşteri/Price List eksik dahil) {"deleted": 0, "failed": []}
+
 	Raises:
 		ValidationError: Item Price cleanup failed
 	"""
 	if not doc.customer:
 		error_msg = _("Customer field is empty, cannot cleanup prices")
-		frappe.log_error(
-			message=error_msg,
-			title="Agreement Item Price Cleanup - Missing Customer"
-		)
+		frappe.log_error(message=error_msg, title="Agreement Item Price Cleanup - Missing Customer")
 		msgprint(f"⚠️ {error_msg}", indicator="orange", alert=True)
-		return
+		return {"deleted": 0, "failed": []}
 
 	try:
 		price_list_name = f"{doc.customer}"
-		total_removed = 0
-		failed_items = []
-		
+
 		if not frappe.db.exists("Price List", price_list_name):
 			msg = _("Price List '{0}' not found, no prices to cleanup").format(price_list_name)
-			frappe.log_error(
-				message=msg,
-				title="Agreement Item Price Cleanup - Price List Not Found"
-			)
+			frappe.log_error(message=msg, title="Agreement Item Price Cleanup - Price List Not Found")
 			msgprint(f"ℹ️ {msg}", indicator="blue", alert=True)
-			return
-		
-		for item in doc.agreement_items:
-			if not item.item_code:
-				frappe.log_error(
-					message=f"Item code is empty in row {item.idx}",
-					title="Agreement Item Price Cleanup - Missing Item Code"
-				)
-				continue
-			
-			try:
-				# Sadece bu anlaşmaya ait fiyatları temizle
-				removed = _delete_overlapping_item_prices(
-					price_list_name, 
-					item.item_code, 
-					doc.valid_from, 
-					doc.valid_to,
-					doc.name  # Agreement name ekledik
-				)
-				total_removed += removed
-				
-			except ValidationError as e:
-				error_msg = f"Cleanup error: {str(e)}"
-				failed_items.append((item.item_code, error_msg))
-				frappe.log_error(
-					message=f"{error_msg} (Item: {item.item_code})",
-					title="Agreement Item Price Cleanup - Critical Error"
-				)
-				
-			except Exception as e:
-				error_msg = f"Unexpected error: {str(e)}"
-				failed_items.append((item.item_code, error_msg))
-				frappe.log_error(
-					message=f"{error_msg}\n{traceback.format_exc()}",
-					title="Agreement Item Price Cleanup - Unexpected Error"
-				)
-		
+			return {"deleted": 0, "failed": []}
+
+		if skip_hooks is None:
+			skip_hooks = _skip_item_price_hooks()
+
+		# Sadece bu anlaşmaya ait fiyatları temizle
+		price_names = [row.name for row in _get_agreement_item_prices(price_list_name, doc.name)]
+		if not price_names:
+			msgprint(_("ℹ️ No price records found to remove for this agreement"), indicator="blue", alert=True)
+			return {"deleted": 0, "failed": []}
+
+		total_removed, failed_deletions = _delete_item_prices(price_names, skip_hooks)
+
 		if total_removed > 0:
 			msgprint(_("✅ {0} price records removed").format(total_removed), indicator="green", alert=True)
-		else:
-			# Hiç fiyat silinmediyse bilgi ver
-			if not failed_items:
-				msgprint(_("ℹ️ No price records found to remove for this agreement"), indicator="blue", alert=True)
-		
-		if failed_items:
-			error_summary = _("⚠️ {0} items could not be cleaned:").format(len(failed_items)) + "\n"
-			for item_code, reason in failed_items[:3]:
-				error_summary += f"  - {item_code}: {reason}\n"
-			
-			if len(failed_items) > 3:
-				error_summary += _("  ... and {0} more").format(len(failed_items) - 3) + "\n"
-			
+
+		if failed_deletions:
+			error_summary = (
+				_("⚠️ {0} price records could not be removed:").format(len(failed_deletions)) + "\n"
+			)
+			for price_name, reason, details in failed_deletions[:3]:
+				error_summary += f"  - {price_name}: {reason}\n"
+
+			if len(failed_deletions) > 3:
+				error_summary += _("  ... and {0} more").format(len(failed_deletions) - 3) + "\n"
+
 			msgprint(error_summary, indicator="orange", alert=True)
-			
-			if total_removed == 0 and len(failed_items) == len(doc.agreement_items):
-				frappe.throw(_("❌ No price records could be removed!") + f"\n{error_summary}", ValidationError)
-		
+
+			if total_removed == 0:
+				frappe.throw(
+					_("❌ No price records could be removed!") + f"\n{error_summary}", ValidationError
+				)
+
+		return {"deleted": total_removed, "failed": failed_deletions}
+
 	except frappe.exceptions.LinkValidationError as e:
 		_handle_agreement_error(e, "Item Price Cleanup", doc.name)
-		
+
 	except ValidationError as e:
 		_handle_agreement_error(e, "Item Price Cleanup", doc.name)
-	
+
 	except Exception as e:
 		_handle_agreement_error(e, "Item Price Cleanup", doc.name)
 
 
+ITEM_AGREEMENT_INDEX_KEY = "culinary_item_agreements"
+
+
+def _load_item_agreements(item_codes: list) -> dict:
+	"""Ürünleri içeren anlaşma satırlarını DB'den tek sorguda oku.
+
+	Returns:
+		dict: {item_code: [{"agreement", "customer", "supplier", "docstatus", "status",
+		"discount_rate", "valid_from", "valid_to", "item_code", "price_list_rate",
+		"currency", "standard_selling_rate"}]}
+	"""
+	result = {item_code: [] for item_code in item_codes}
+	for batch in _chunks(list(item_codes)):
+		placeholders = ",".join(["%s"] * len(batch))
+		rows = frappe.db.sql(
+			f"""
+			SELECT ag.name AS agreement, ag.customer, ag.supplier, ag.docstatus, ag.status,
+			       ag.discount_rate, ag.valid_from, ag.valid_to,
+			       ai.item_code, ai.price_list_rate, ai.currency, ai.standard_selling_rate
+			FROM `tabAgreement` ag
+			JOIN `tabAgreement Item` ai ON ai.parent = ag.name AND ai.parenttype = 'Agreement'
+			WHERE ai.item_code IN ({placeholders})
+			ORDER BY ag.name
+			""",
+			batch,
+			as_dict=True,
+		)
+		for row in rows:
+			result[row.item_code].append(row)
+	return result
+
+
+def get_item_agreements(item_codes: list) -> dict:
+	"""Ürün → anlaşma index'inden okuma (Redis), eksikleri DB'den tamamla.
+
+	Index tüm anlaşma satırlarını docstatus/status ile birlikte tutar; çağıran taraf
+	kendi kuralına göre filtreler (ör. sadece Active, müşteri + tarih).
+	"""
+	from culinary_order_management.culinary_order_management.redis_utils import hmget, hset_many
+
+	item_codes = list({code for code in item_codes if code})
+	if not item_codes:
+		return {}
+
+	result = hmget(ITEM_AGREEMENT_INDEX_KEY, item_codes)
+	missing = [item_code for item_code in item_codes if item_code not in result]
+	if missing:
+		loaded = _load_item_agreements(missing)
+		hset_many(ITEM_AGREEMENT_INDEX_KEY, loaded)
+		result.update(loaded)
+	return result
+
+
+def get_active_item_agreements(item_codes: list) -> dict:
+	"""Ürün → aktif (submitted + Active) anlaşma satırları."""
+	return {
+		item_code: [e for e in entries if e.docstatus == 1 and e.status == "Active"]
+		for item_code, entries in get_item_agreements(item_codes).items()
+	}
+
+
+def refresh_item_agreement_index(item_codes: list):
+	"""Verilen ürünlerin index kayıtlarını DB'den yeniden hesapla."""
+	from culinary_order_management.culinary_order_management.redis_utils import hset_many
+
+	item_codes = list({code for code in item_codes if code})
+	if not item_codes:
+		return
+	hset_many(ITEM_AGREEMENT_INDEX_KEY, _load_item_agreements(item_codes))
+
+
+def _normalize_index_entries(entries: list) -> list:
+	return sorted(tuple(sorted((key, str(value)) for key, value in entry.items())) for entry in entries or [])
+
+
+@frappe.whitelist()
+def check_item_agreement_index(rebuild: bool = True) -> dict:
+	"""Ürün → anlaşma index'ini DB ile karşılaştır, tutarsız kayıtları düzelt.
+
+	Günlük scheduler ile de çalışır.
+
+	Returns:
+		dict: {"checked": int, "mismatched": [item_code], "rebuilt": bool}
+	"""
+	frappe.only_for("System Manager")
+	rebuild = cint(rebuild)
+
+	cache = frappe.cache()
+	cached = {
+		frappe.safe_decode(item_code): entries
+		for item_code, entries in cache.hgetall(ITEM_AGREEMENT_INDEX_KEY).items()
+	}
+
+	mismatched = []
+	for batch in _chunks(list(cached)):
+		for item_code, entries in _load_item_agreements(batch).items():
+			if _normalize_index_entries(entries) != _normalize_index_entries(cached[item_code]):
+				mismatched.append(item_code)
+				if rebuild:
+					cache.hset(ITEM_AGREEMENT_INDEX_KEY, item_code, entries)
+
+	if mismatched:
+		frappe.log_error(
+			message=f"{len(mismatched)} item agreement index entries were stale: {', '.join(mismatched[:20])}",
+			title="Item Agreement Index - Inconsistent",
+		)
+
+	return {"checked": len(cached), "mismatched": mismatched, "rebuilt": bool(rebuild)}
+
+
+STANDARD_PRICE_CHANGES_KEY = "culinary_standard_price_changes"
+
+
 def sync_agreement_prices_on_standard_change(doc, method):
-	"""Item Price (Standard Selling) güncellendiğinde ilgili Agreement'ların Item Price kayıtlarını güncelle.
-	
+	"""Item Price (Standard Selling) güncellendiğinde değişen ürünü kuyruğa al.
+
+	Değişiklikler ürün bazında birleştirilir (Redis set) ve her dakika çalışan
+	process_standard_price_changes job'ı ile toplu işlenir. Böylece 5.000 satırlık
+	bir import binlerce commit yerine birkaç toplu işleme dönüşür.
+
 	ÖNEMLİ: Agreement Item'a DOKUNULMAZ (submitted belge)
 	Sadece Item Price kayıtları güncellenir.
-	
+
 	Args:
 		doc: Item Price document
 		method: ERPNext hook method name (after_insert veya on_update)
@@ -758,128 +1363,183 @@ def sync_agreement_prices_on_standard_change(doc, method):
 	# Sadece Standard Selling price list için çalış
 	if doc.price_list != "Standard Selling":
 		return
-	
+
 	# Item code kontrolü
 	if not doc.item_code:
 		return
-	
+
 	# Değişiklik var mı kontrol et (sadece update için - insert'te atlıyoruz)
 	if method == "on_update" and not doc.has_value_changed("price_list_rate"):
 		return
-	
-	try:
-		# Bu item'ı içeren aktif agreement'ları bul
-		agreements = frappe.db.sql("""
-			SELECT DISTINCT 
-				a.name, 
-				a.customer, 
-				a.discount_rate,
-				a.valid_from,
-				a.valid_to,
-				ai.item_code,
-				ai.currency
-			FROM `tabAgreement` a
-			JOIN `tabAgreement Item` ai ON ai.parent = a.name
-			WHERE a.docstatus = 1
-			  AND a.status = 'Active'
-			  AND ai.item_code = %s
-		""", (doc.item_code,), as_dict=True)
-		
-		if not agreements:
-			frappe.logger().info(f"No active agreements found for item {doc.item_code}")
-			return
-		
-		updated_count = 0
-		failed_agreements = []
-		
-		for agreement_data in agreements:
-			try:
-				# Yeni fiyatı hesapla
-				new_standard_rate = doc.price_list_rate
-				discount_rate = frappe.utils.flt(agreement_data.discount_rate or 0)
-				
-				if discount_rate > 0:
-					new_price = new_standard_rate * (1 - discount_rate / 100.0)
-				else:
-					new_price = new_standard_rate
-				
-				# Price List name
-				price_list_name = agreement_data.customer
-				currency = agreement_data.currency or doc.currency
-				
-				# Item Price'ı güncelle (eski fiyatı da döndürür)
-				updated, old_agr_price = update_agreement_item_price(
-					price_list=price_list_name,
-					item_code=agreement_data.item_code,
-					currency=currency,
-					new_price=new_price,
-					valid_from=agreement_data.valid_from,
-					valid_upto=agreement_data.valid_to,
-					agreement_name=agreement_data.name
-				)
-				
-				if updated:
-					updated_count += 1
-					frappe.logger().info(
-						f"✅ Agreement {agreement_data.name} - {agreement_data.item_code}: "
-						f"Price updated from {old_agr_price} to {new_price} {currency}"
-					)
-					
-					# Eski standard rate bul (Agreement Item'dan)
-					old_std_rate = frappe.db.get_value("Agreement Item", {
-						"parent": agreement_data.name,
-						"item_code": agreement_data.item_code
-					}, "standard_selling_rate") or 0
-					
-					# Child table'a kaydet
-					create_price_change_log(
-						agreement_name=agreement_data.name,
-						item_code=agreement_data.item_code,
-						old_price=old_agr_price,
-						new_price=new_price,
-						currency=currency,
-						old_standard=float(old_std_rate),
-						new_standard=new_standard_rate,
-						source="Automatic"
-					)
-					
-			except Exception as e:
-				failed_agreements.append((agreement_data.name, str(e)))
-				frappe.log_error(
-					message=f"Agreement {agreement_data.name} price update failed: {str(e)}\n{traceback.format_exc()}",
-					title="Agreement Price Sync - Item Update Failed"
-				)
-		
-		# Sonuç mesajı
-		if updated_count > 0:
-			msg = _("✅ {0} agreement price updated for {1}").format(updated_count, doc.item_code)
-			msgprint(msg, indicator="green", alert=True)
-			
-			# Log oluştur
-			frappe.logger().info(f"Standard price change: {doc.item_code} - {updated_count} agreements updated")
-		
-		if failed_agreements:
-			error_msg = _("⚠️ {0} agreement(s) could not be updated:").format(len(failed_agreements)) + "\n"
-			for name, error in failed_agreements[:3]:
-				error_msg += f"  - {name}: {error}\n"
-			
-			if len(failed_agreements) > 3:
-				error_msg += f"  ... and {len(failed_agreements) - 3} more\n"
-			
-			msgprint(error_msg, indicator="orange", alert=True)
-			
-	except Exception as e:
-		frappe.log_error(
-			message=f"Failed to sync agreement prices for {doc.item_code}: {str(e)}\n{traceback.format_exc()}",
-			title="Agreement Price Sync - Critical Error"
+
+	item_code = doc.item_code
+
+	def queue_change():
+		try:
+			frappe.cache().sadd(STANDARD_PRICE_CHANGES_KEY, item_code)
+		except Exception as e:
+			frappe.log_error(
+				message=f"Failed to queue standard price change for {item_code}: {e!s}",
+				title="Agreement Price Sync - Queue Failed",
+			)
+
+	# Job commit edilmemiş fiyatı okumasın diye commit sonrası kuyruğa al
+	frappe.db.after_commit.add(queue_change)
+
+
+def _pop_standard_price_changes() -> list:
+	"""Kuyruktaki ürün kodlarını atomik olarak al (SPOP, parça parça)."""
+	from culinary_order_management.culinary_order_management.redis_utils import spop_many
+
+	item_codes = []
+	while batch := spop_many(STANDARD_PRICE_CHANGES_KEY, ITEM_PRICE_BATCH_SIZE):
+		item_codes.extend(batch)
+	return item_codes
+
+
+def process_standard_price_changes():
+	"""Birleştirilmiş Standard Selling değişikliklerini Agreement Item Price'larına yansıt.
+
+	Scheduler tarafından her dakika çağrılır. Ürünler ITEM_PRICE_BATCH_SIZE'lık
+	parçalar halinde işlenir, her parça tek commit ile kaydedilir. Hata alan parça
+	bir sonraki çalışmada tekrar denenmek üzere kuyruğa geri konur.
+	"""
+	item_codes = _pop_standard_price_changes()
+	if not item_codes:
+		return
+
+	updated_count = 0
+	for batch in _chunks(item_codes):
+		try:
+			updated_count += _apply_standard_price_changes(batch)
+			frappe.db.commit()
+		except Exception as e:
+			frappe.db.rollback()
+			frappe.cache().sadd(STANDARD_PRICE_CHANGES_KEY, *batch)
+			frappe.log_error(
+				message=f"Failed to sync agreement prices for {len(batch)} items: {e!s}\n{traceback.format_exc()}",
+				title="Agreement Price Sync - Critical Error",
+			)
+
+	frappe.logger().info(
+		f"Standard price changes processed: {len(item_codes)} items, {updated_count} agreement prices updated"
+	)
+
+
+def _apply_standard_price_changes(item_codes: list) -> int:
+	"""Verilen ürünlerin güncel Standard Selling fiyatlarını aktif anlaşmalara uygula.
+
+	Standard fiyatlar ve anlaşmalara ait Item Price kayıtları iki toplu sorguyla,
+	etkilenen anlaşmalar ürün → anlaşma index'inden okunur. Commit çağıran tarafa aittir.
+
+	Returns:
+		int: Güncellenen Item Price sayısı
+	"""
+	placeholders = ",".join(["%s"] * len(item_codes))
+
+	# Her ürün ve para birimi için en son değişen Standard Selling fiyatı
+	standard_prices = {}
+	for row in frappe.db.sql(
+		f"""
+		SELECT item_code, currency, price_list_rate
+		FROM `tabItem Price`
+		WHERE price_list = 'Standard Selling'
+		  AND item_code IN ({placeholders})
+		ORDER BY modified DESC
+		""",
+		item_codes,
+		as_dict=True,
+	):
+		standard_prices.setdefault((row.item_code, row.currency), row)
+
+	if not standard_prices:
+		return 0
+
+	# Para birimi olmayan anlaşma satırları Price List para birimini kullanır
+	price_list_currency = frappe.db.get_value("Price List", "Standard Selling", "currency")
+
+	# Bu ürünleri içeren aktif agreement'lar (index'ten)
+	agreements = [entry for entries in get_active_item_agreements(item_codes).values() for entry in entries]
+
+	if not agreements:
+		return 0
+
+	agreement_names = list({row.agreement for row in agreements})
+	agreement_placeholders = ",".join(["%s"] * len(agreement_names))
+	existing_prices = {}
+	for row in frappe.db.sql(
+		f"""
+		SELECT name, custom_agreement, price_list, item_code, currency, price_list_rate
+		FROM `tabItem Price`
+		WHERE custom_agreement IN ({agreement_placeholders})
+		  AND item_code IN ({placeholders})
+		""",
+		[*agreement_names, *item_codes],
+		as_dict=True,
+	):
+		existing_prices.setdefault((row.custom_agreement, row.price_list, row.item_code, row.currency), row)
+
+	updates = {}
+	price_logs = []
+	for agreement_data in agreements:
+		currency = agreement_data.currency or price_list_currency
+		standard = standard_prices.get((agreement_data.item_code, currency))
+		if not standard:
+			continue
+
+		# Yeni fiyatı hesapla
+		new_standard_rate = frappe.utils.flt(standard.price_list_rate)
+		discount_rate = frappe.utils.flt(agreement_data.discount_rate or 0)
+		if discount_rate > 0:
+			new_price = new_standard_rate * (1 - discount_rate / 100.0)
+		else:
+			new_price = new_standard_rate
+
+		existing = existing_prices.get(
+			(agreement_data.agreement, agreement_data.customer, agreement_data.item_code, currency)
 		)
-		# Re-raise etme - Item Price update'i iptal etmesin
-		msgprint(
-			_("⚠️ Agreement price sync failed: {0}").format(str(e)),
-			indicator="red",
-			alert=True
+		if not existing:
+			frappe.log_error(
+				message=f"Item Price not found for {agreement_data.item_code} in {agreement_data.customer} (Agreement: {agreement_data.agreement})",
+				title="Agreement Price Update - Item Price Not Found",
+			)
+			continue
+
+		old_price = frappe.utils.flt(existing.price_list_rate)
+		if abs(old_price - new_price) < 0.01:
+			continue
+
+		updates[existing.name] = {"price_list_rate": new_price}
+		price_logs.append(
+			dict(
+				agreement_name=agreement_data.agreement,
+				item_code=agreement_data.item_code,
+				old_price=old_price,
+				new_price=new_price,
+				currency=currency,
+				old_standard=frappe.utils.flt(agreement_data.standard_selling_rate),
+				new_standard=new_standard_rate,
+				source="Automatic",
+			)
 		)
 
+	if not updates:
+		return 0
+
+	if _skip_item_price_hooks():
+		frappe.db.bulk_update("Item Price", updates, chunk_size=ITEM_PRICE_BATCH_SIZE)
+	else:
+		for name, changes in updates.items():
+			item_price_doc = frappe.get_doc("Item Price", name)
+			item_price_doc.update(changes)
+			item_price_doc.save(ignore_permissions=True)
+
+	with price_history_buffer():
+		for log in price_logs:
+			create_price_change_log(**log, commit=False)
+
+	return len(updates)
+
 
 def update_agreement_item_price(
 	price_list: str,
@@ -888,10 +1548,11 @@ def update_agreement_item_price(
 	new_price: float,
 	valid_from,
 	valid_upto,
-	agreement_name: str
+	agreement_name: str,
+	commit: bool = True,
 ) -> tuple:
 	"""Belirli bir Agreement'ın Item Price kaydını güncelle.
-	
+
 	Args:
 		price_list: Price list name (customer name)
 		item_code: Item code
@@ -900,50 +1561,46 @@ def update_agreement_item_price(
 		valid_from: Valid from date
 		valid_upto: Valid to date
 		agreement_name: Agreement name (for note field)
-		
+		commit: False ise commit çağıran tarafa kalır (toplu güncellemede tek commit)
+
 	Returns:
 		tuple: (success: bool, old_price: float) - Eski fiyatı da döndür
 	"""
 	try:
 		# Mevcut Item Price'ı bul
 		existing = _find_existing_item_price(
-			price_list,
-			item_code,
-			currency,
-			valid_from,
-			valid_upto,
-			agreement_name
+			price_list, item_code, currency, valid_from, valid_upto, agreement_name
 		)
-		
+
 		if not existing:
 			frappe.log_error(
 				message=f"Item Price not found for {item_code} in {price_list} (Agreement: {agreement_name})",
-				title="Agreement Price Update - Item Price Not Found"
+				title="Agreement Price Update - Item Price Not Found",
 			)
 			return (False, 0)
-		
+
 		# ÖNCE eski fiyatı al
 		item_price_name = existing[0]
 		item_price_doc = frappe.get_doc("Item Price", item_price_name)
 		old_price = item_price_doc.price_list_rate
-		
+
 		# Item Price'ı güncelle (ORM ile - hook'lar tetiklenir!)
 		item_price_doc.price_list_rate = new_price
 		item_price_doc.save(ignore_permissions=True)
-		
-		# Commit et (önemli!)
-		frappe.db.commit()
-		
+
+		if commit:
+			frappe.db.commit()
+
 		frappe.logger().info(
 			f"Item Price {item_price_name} updated: {old_price} → {new_price} {currency} (ORM - hooks triggered)"
 		)
-		
+
 		return (True, float(old_price) if old_price else 0)
-		
+
 	except Exception as e:
 		frappe.log_error(
-			message=f"Failed to update Item Price: {str(e)}\n{traceback.format_exc()}",
-			title="Agreement Price Update - Update Failed"
+			message=f"Failed to update Item Price: {e!s}\n{traceback.format_exc()}",
+			title="Agreement Price Update - Update Failed",
 		)
 		return (False, 0)
 
@@ -951,141 +1608,219 @@ def update_agreement_item_price(
 @frappe.whitelist()
 def manual_update_agreement_prices(agreement_name: str):
 	"""Manuel olarak Agreement'ın Item Price kayıtlarını güncelle.
-	
+
 	Args:
 		agreement_name: Agreement name
-		
+
 	Returns:
 		dict: {"success": bool, "updated_count": int, "price_changes": list}
 	"""
 	try:
 		# Agreement'ı getir
 		agreement = frappe.get_doc("Agreement", agreement_name)
-		
+
 		# Sadece submitted ve aktif agreement'lar güncellenebilir
 		if agreement.docstatus != 1:
-			return {
-				"success": False,
-				"error": _("Only submitted agreements can be updated")
-			}
-		
+			return {"success": False, "error": _("Only submitted agreements can be updated")}
+
 		if agreement.status != "Active":
-			return {
-				"success": False,
-				"error": _("Only active agreements can be updated")
-			}
-		
+			return {"success": False, "error": _("Only active agreements can be updated")}
+
 		updated_count = 0
 		price_changes = []
 		failed_items = []
-		
-		for item in agreement.agreement_items:
-			if not item.item_code:
-				continue
-			
-			try:
-				# Güncel Standard Selling fiyatını çek
-				currency = item.currency or frappe.db.get_value("Company", {"is_group": 0}, "default_currency") or "EUR"
-				new_standard_rate = _get_standard_selling_rate(item.item_code, currency)
-				
-				if not new_standard_rate or new_standard_rate <= 0:
-					failed_items.append((item.item_code, "Standard Selling price not found"))
-					continue
-				
-				# Yeni fiyatı hesapla
-				discount_rate = frappe.utils.flt(agreement.discount_rate or 0)
-				if discount_rate > 0:
-					new_price = new_standard_rate * (1 - discount_rate / 100.0)
-				else:
-					new_price = new_standard_rate
-				
-				# Eski fiyatı al
-				price_list_name = agreement.customer
-				existing = _find_existing_item_price(
-					price_list_name,
-					item.item_code,
-					currency,
-					agreement.valid_from,
-					agreement.valid_to,
-					agreement.name
-				)
-				
-				if not existing:
-					failed_items.append((item.item_code, "Item Price not found"))
-					continue
-				
-				# Eski fiyatı oku
-				old_price = frappe.db.get_value("Item Price", existing[0], "price_list_rate")
-				
-				# Fiyat değişti mi?
-				if abs(float(old_price) - new_price) < 0.01:
+
+		# Geçmiş satırları biriktirilip tek INSERT ile yazılır; fiyatlar ve geçmiş
+		# çalışma sonunda tek commit ile kaydedilir
+		with price_history_buffer():
+			for item in agreement.agreement_items:
+				if not item.item_code:
 					continue
-				
-				# Güncelle (eski fiyatı döndürür)
-				updated, returned_old_price = update_agreement_item_price(
-					price_list=price_list_name,
-					item_code=item.item_code,
-					currency=currency,
-					new_price=new_price,
-					valid_from=agreement.valid_from,
-					valid_upto=agreement.valid_to,
-					agreement_name=agreement.name
-				)
-				
-				if updated:
-					updated_count += 1
-					price_changes.append({
-						"item_code": item.item_code,
-						"old_price": returned_old_price,
-						"new_price": new_price,
-						"currency": currency
-					})
-					
-					# Log oluştur (child table'a kaydet)
-					create_price_change_log(
-						agreement_name=agreement.name,
+
+				try:
+					# Güncel Standard Selling fiyatını çek
+					currency = (
+						item.currency
+						or frappe.db.get_value("Company", {"is_group": 0}, "default_currency")
+						or "EUR"
+					)
+					new_standard_rate = _get_standard_selling_rate(item.item_code, currency)
+
+					if not new_standard_rate or new_standard_rate <= 0:
+						failed_items.append((item.item_code, "Standard Selling price not found"))
+						continue
+
+					# Yeni fiyatı hesapla
+					discount_rate = frappe.utils.flt(agreement.discount_rate or 0)
+					if discount_rate > 0:
+						new_price = new_standard_rate * (1 - discount_rate / 100.0)
+					else:
+						new_price = new_standard_rate
+
+					# Eski fiyatı al
+					price_list_name = agreement.customer
+					existing = _find_existing_item_price(
+						price_list_name,
+						item.item_code,
+						currency,
+						agreement.valid_from,
+						agreement.valid_to,
+						agreement.name,
+					)
+
+					if not existing:
+						failed_items.append((item.item_code, "Item Price not found"))
+						continue
+
+					# Eski fiyatı oku
+					old_price = frappe.db.get_value("Item Price", existing[0], "price_list_rate")
+
+					# Fiyat değişti mi?
+					if abs(float(old_price) - new_price) < 0.01:
+						continue
+
+					# Güncelle (eski fiyatı döndürür)
+					updated, returned_old_price = update_agreement_item_price(
+						price_list=price_list_name,
 						item_code=item.item_code,
-						old_price=returned_old_price,
-						new_price=new_price,
 						currency=currency,
-						old_standard=frappe.utils.flt(item.standard_selling_rate),
-						new_standard=new_standard_rate,
-						source="Manual"
+						new_price=new_price,
+						valid_from=agreement.valid_from,
+						valid_upto=agreement.valid_to,
+						agreement_name=agreement.name,
+						commit=False,
 					)
-					
-			except Exception as e:
-				failed_items.append((item.item_code, str(e)))
-				frappe.log_error(
-					message=f"Failed to update price for {item.item_code}: {str(e)}\n{traceback.format_exc()}",
-					title="Manual Agreement Price Update - Item Failed"
-				)
-		
+
+					if updated:
+						updated_count += 1
+						price_changes.append(
+							{
+								"item_code": item.item_code,
+								"old_price": returned_old_price,
+								"new_price": new_price,
+								"currency": currency,
+							}
+						)
+
+						# Log oluştur (child table'a kaydet)
+						create_price_change_log(
+							agreement_name=agreement.name,
+							item_code=item.item_code,
+							old_price=returned_old_price,
+							new_price=new_price,
+							currency=currency,
+							old_standard=frappe.utils.flt(item.standard_selling_rate),
+							new_standard=new_standard_rate,
+							source="Manual",
+							commit=False,
+						)
+
+				except Exception as e:
+					failed_items.append((item.item_code, str(e)))
+					frappe.log_error(
+						message=f"Failed to update price for {item.item_code}: {e!s}\n{traceback.format_exc()}",
+						title="Manual Agreement Price Update - Item Failed",
+					)
+
 		# Sonuç mesajı
-		result = {
-			"success": True,
-			"updated_count": updated_count,
-			"price_changes": price_changes
-		}
-		
+		result = {"success": True, "updated_count": updated_count, "price_changes": price_changes}
+
 		if failed_items:
 			error_msg = _("⚠️ {0} item(s) could not be updated:").format(len(failed_items)) + "\n"
 			for item_code, reason in failed_items[:3]:
 				error_msg += f"  - {item_code}: {reason}\n"
 			result["warning"] = error_msg
-		
+
 		frappe.db.commit()
 		return result
-		
+
 	except Exception as e:
 		frappe.db.rollback()
 		frappe.log_error(
-			message=f"Manual agreement price update failed: {str(e)}\n{traceback.format_exc()}",
-			title="Manual Agreement Price Update - Failed"
+			message=f"Manual agreement price update failed: {e!s}\n{traceback.format_exc()}",
+			title="Manual Agreement Price Update - Failed",
 		)
-		return {
-			"success": False,
-			"error": str(e)
-		}
+		return {"success": False, "error": str(e)}
+
+
+PRICE_HISTORY_BUFFER_KEY = "culinary_price_history_buffer"
+PRICE_HISTORY_BUFFER_SIZE = 500
+PRICE_HISTORY_FIELDS = [
+	"change_date",
+	"item_code",
+	"old_standard_rate",
+	"new_standard_rate",
+	"old_agreement_rate",
+	"new_agreement_rate",
+	"currency",
+	"change_percentage",
+	"changed_by",
+	"source",
+]
+
+
+@contextmanager
+def price_history_buffer():
+	"""Blok içindeki create_price_change_log çağrılarını biriktir.
+
+	Satırlar blok sonunda (veya PRICE_HISTORY_BUFFER_SIZE'a ulaşınca) tek bir çok
+	satırlı INSERT ile yazılır. Blok hata ile biterse biriken satırlar atılır.
+	İç içe kullanılabilir; yazma en dıştaki blokta yapılır.
+	"""
+	depth = frappe.flags.price_history_buffer_depth or 0
+	if not depth:
+		frappe.local.cache[PRICE_HISTORY_BUFFER_KEY] = []
+	frappe.flags.price_history_buffer_depth = depth + 1
+	try:
+		yield
+		if not depth:
+			flush_price_history()
+	finally:
+		frappe.flags.price_history_buffer_depth = depth
+		if not depth:
+			frappe.local.cache.pop(PRICE_HISTORY_BUFFER_KEY, None)
+
+
+def flush_price_history() -> int:
+	"""Biriken Agreement Item Price History satırlarını tek INSERT ile yaz."""
+	buffer = frappe.local.cache.get(PRICE_HISTORY_BUFFER_KEY)
+	if not buffer:
+		return 0
+
+	rows = list(buffer)
+	buffer.clear()
+
+	now = frappe.utils.now()
+	user = frappe.session.user
+	fields = [
+		"name",
+		"creation",
+		"modified",
+		"owner",
+		"modified_by",
+		"docstatus",
+		"parent",
+		"parenttype",
+		"parentfield",
+		*PRICE_HISTORY_FIELDS,
+	]
+	values = [
+		(
+			frappe.generate_hash(length=10),
+			now,
+			now,
+			user,
+			user,
+			0,
+			row["parent"],
+			"Agreement",
+			"price_history",
+			*(row[field] for field in PRICE_HISTORY_FIELDS),
+		)
+		for row in rows
+	]
+	frappe.db.bulk_insert("Agreement Item Price History", fields, values)
+	return len(values)
 
 
 def create_price_change_log(
@@ -1096,10 +1831,14 @@ def create_price_change_log(
 	currency: str,
 	old_standard: float = 0,
 	new_standard: float = 0,
-	source: str = "Automatic"
+	source: str = "Automatic",
+	commit: bool = True,
 ):
 	"""Fiyat değişiklik logu oluştur (child table'a kaydet).
-	
+
+	price_history_buffer() bloğu içinde çağrılırsa satır biriktirilir ve toplu
+	yazılır; change_date ve changed_by çağrı anındaki değerlerle saklanır.
+
 	Args:
 		agreement_name: Agreement name
 		item_code: Item code
@@ -1109,134 +1848,126 @@ def create_price_change_log(
 		old_standard: Old standard selling rate
 		new_standard: New standard selling rate
 		source: "Automatic" or "Manual"
+		commit: Commit after insert (toplu işlemlerde çağıran commit eder)
 	"""
 	try:
 		# Child table'a doğrudan SQL ile ekle (submitted belge için)
 		diff = new_price - old_price
 		diff_pct = (diff / old_price * 100) if old_price > 0 else 0
-		
+
+		values = {
+			"parent": agreement_name,
+			"change_date": frappe.utils.now(),
+			"item_code": item_code,
+			"old_standard_rate": old_standard,
+			"new_standard_rate": new_standard,
+			"old_agreement_rate": old_price,
+			"new_agreement_rate": new_price,
+			"currency": currency,
+			"change_percentage": diff_pct,
+			"changed_by": frappe.session.user,
+			"source": source,
+		}
+
+		buffer = frappe.local.cache.get(PRICE_HISTORY_BUFFER_KEY)
+		if frappe.flags.price_history_buffer_depth and buffer is not None:
+			buffer.append(values)
+			if len(buffer) >= PRICE_HISTORY_BUFFER_SIZE:
+				flush_price_history()
+			return
+
 		# Yeni row oluştur
 		row = frappe.new_doc("Agreement Item Price History")
-		row.parent = agreement_name
 		row.parenttype = "Agreement"
 		row.parentfield = "price_history"
-		row.change_date = frappe.utils.now()
-		row.item_code = item_code
-		row.old_standard_rate = old_standard
-		row.new_standard_rate = new_standard
-		row.old_agreement_rate = old_price
-		row.new_agreement_rate = new_price
-		row.currency = currency
-		row.change_percentage = diff_pct
-		row.changed_by = frappe.session.user
-		row.source = source
+		row.update(values)
 		row.insert(ignore_permissions=True)
-		
-		frappe.db.commit()
-		
-		frappe.logger().info(f"Price change logged to child table: {agreement_name} - {item_code}: {old_price} → {new_price}")
-		
+
+		if commit:
+			frappe.db.commit()
+
+		frappe.logger().info(
+			f"Price change logged to child table: {agreement_name} - {item_code}: {old_price} → {new_price}"
+		)
+
 	except Exception as e:
 		frappe.log_error(
-			message=f"Failed to create price change log: {str(e)}\n{traceback.format_exc()}",
-			title="Price Change Log - Failed"
+			message=f"Failed to create price change log: {e!s}\n{traceback.format_exc()}",
+			title="Price Change Log - Failed",
 		)
 
 
 @frappe.whitelist()
 def clear_price_history(agreement_name: str, item_code: str = None):
 	"""Agreement'ın fiyat değişiklik geçmişini temizle.
-	
+
 	Args:
 		agreement_name: Agreement name
 		item_code: Opsiyonel - Belirli bir ürün için temizle
-		
+
 	Returns:
 		dict: {"success": bool, "deleted_count": int}
 	"""
 	try:
 		# Permission check
 		if not frappe.has_permission("Agreement", "write"):
-			return {
-				"success": False,
-				"error": _("You don't have permission to modify Agreement")
-			}
-		
+			return {"success": False, "error": _("You don't have permission to modify Agreement")}
+
 		# Silme filtreleri
 		filters = {"parent": agreement_name}
 		if item_code:
 			filters["item_code"] = item_code
-		
+
 		# Kaç kayıt silinecek?
 		count = frappe.db.count("Agreement Item Price History", filters)
-		
+
 		if count == 0:
-			return {
-				"success": True,
-				"deleted_count": 0,
-				"message": _("No records to delete")
-			}
-		
+			return {"success": True, "deleted_count": 0, "message": _("No records to delete")}
+
 		# SQL ile toplu silme (hızlı)
 		frappe.db.delete("Agreement Item Price History", filters)
 		frappe.db.commit()
-		
+
 		frappe.logger().info(f"Price history cleared: {agreement_name} - {count} records deleted")
-		
-		return {
-			"success": True,
-			"deleted_count": count,
-			"message": _("{0} records deleted").format(count)
-		}
-		
+
+		return {"success": True, "deleted_count": count, "message": _("{0} records deleted").format(count)}
+
 	except Exception as e:
 		frappe.db.rollback()
 		frappe.log_error(
-			message=f"Failed to clear price history: {str(e)}\n{traceback.format_exc()}",
-			title="Clear Price History - Failed"
+			message=f"Failed to clear price history: {e!s}\n{traceback.format_exc()}",
+			title="Clear Price History - Failed",
 		)
-		return {
-			"success": False,
-			"error": str(e)
-		}
+		return {"success": False, "error": str(e)}
 
 
 @frappe.whitelist()
 def delete_price_history_row(row_name: str):
 	"""Tek bir price history kaydını sil.
-	
+
 	Args:
 		row_name: Price history row name
-		
+
 	Returns:
 		dict: {"success": bool}
 	"""
 	try:
 		# Permission check
 		if not frappe.has_permission("Agreement", "write"):
-			return {
-				"success": False,
-				"error": _("You don't have permission to modify Agreement")
-			}
-		
+			return {"success": False, "error": _("You don't have permission to modify Agreement")}
+
 		# ORM ile sil (hooks tetiklenir)
 		frappe.delete_doc("Agreement Item Price History", row_name, ignore_permissions=True, force=True)
 		frappe.db.commit()
-		
+
 		frappe.logger().info(f"Price history row deleted: {row_name}")
-		
-		return {
-			"success": True,
-			"message": _("Record deleted")
-		}
-		
+
+		return {"success": True, "message": _("Record deleted")}
+
 	except Exception as e:
 		frappe.db.rollback()
 		frappe.log_error(
-			message=f"Failed to delete price history row: {str(e)}\n{traceback.format_exc()}",
-			title="Delete Price History Row - Failed"
+			message=f"Failed to delete price history row: {e!s}\n{traceback.format_exc()}",
+			title="Delete Price History Row - Failed",
 		)
-		return {
-			"success": False,
-			"error": str(e)
-		}
+		return {"success": False, "error": str(e)}
@@ -1,12 +1,16 @@
 import json
-from typing import Any, Dict, List, Optional, Tuple
+import re
+from collections import OrderedDict
+from typing import Any
 
 import frappe
 from frappe import _
 from frappe.permissions import has_permission
 
+from culinary_order_management.culinary_order_management.item_search import SupplierItemIndex
 
-def _parse_filters(raw_filters: Any) -> Dict[str, Any]:
+
+def _parse_filters(raw_filters: Any) -> dict[str, Any]:
 	"""filters parametresini sözlüğe dönüştürür (JSON string olabilir)."""
 	if isinstance(raw_filters, str):
 		try:
@@ -16,6 +20,102 @@ def _parse_filters(raw_filters: Any) -> Dict[str, Any]:
 	return raw_filters or {}
 
 
+SUPPLIER_ITEMS_CACHE_KEY = "culinary_supplier_items"
+SUPPLIER_ITEMS_VERSION_KEY = "culinary_supplier_items_version"
+SUPPLIER_ITEM_INDEX_LIMIT = 16
+
+# Süreç içi trigram index'leri (LRU): {(site, supplier): SupplierItemIndex}
+_supplier_item_indexes = OrderedDict()
+
+
+def _get_supplier_items_cache_ttl() -> int:
+	"""Tedarikçi ürün seti cache süresi (site_config: culinary_supplier_items_cache_ttl).
+
+	Item/Item Supplier değişikliklerinde zaten silinir; TTL sadece üst sınırdır. 0 = cache kapalı.
+	"""
+	ttl = frappe.conf.get("culinary_supplier_items_cache_ttl")
+	return 3600 if ttl is None else int(ttl)
+
+
+def get_supplier_items(supplier: str) -> list[tuple[str, str]]:
+	"""Tedarikçinin ürünleri (en son değiştirilen önce), Redis'te cache'lenir.
+
+	Returns:
+		[(item_code, item_name)]
+	"""
+	ttl = _get_supplier_items_cache_ttl()
+	if ttl:
+		cached = frappe.cache().hget(SUPPLIER_ITEMS_CACHE_KEY, supplier)
+		if cached is not None:
+			return [tuple(row) for row in cached]
+
+	rows = frappe.db.sql(
+		"""
+		select i.name, i.item_name
+		  from `tabItem Supplier` s
+		  join `tabItem` i on i.name = s.parent
+		 where s.supplier = %s and s.parenttype = 'Item'
+		 group by i.name, i.item_name, i.modified
+		 order by i.modified desc
+		""",
+		supplier,
+	)
+	rows = [tuple(row) for row in rows]
+
+	if ttl:
+		frappe.cache().hset(SUPPLIER_ITEMS_CACHE_KEY, supplier, [list(row) for row in rows])
+		frappe.cache().expire(frappe.cache().make_key(SUPPLIER_ITEMS_CACHE_KEY), ttl)
+	return rows
+
+
+def _get_supplier_items_version(supplier: str) -> str:
+	"""Tedarikçi ürün setinin sürümü; değişince süreçlerdeki index'ler yeniden kurulur."""
+	cache = frappe.cache()
+	version = cache.hget(SUPPLIER_ITEMS_VERSION_KEY, supplier)
+	if version is None:
+		version = frappe.generate_hash(length=10)
+		cache.hset(SUPPLIER_ITEMS_VERSION_KEY, supplier, version)
+	return version
+
+
+def get_supplier_item_index(supplier: str) -> SupplierItemIndex:
+	"""Tedarikçinin trigram index'i (süreç içi, Redis'teki sürümle doğrulanır).
+
+	Sürüm ürünler okunmadan önce alınır; arada gelen bir değişiklik bir sonraki
+	aramada yeniden kurulumu tetikler.
+	"""
+	key = (frappe.local.site, supplier)
+	version = _get_supplier_items_version(supplier)
+	index = _supplier_item_indexes.get(key)
+	if index is None or index.version != version:
+		index = SupplierItemIndex(get_supplier_items(supplier), version)
+		_supplier_item_indexes[key] = index
+
+	_supplier_item_indexes.move_to_end(key)
+	while len(_supplier_item_indexes) > SUPPLIER_ITEM_INDEX_LIMIT:
+		_supplier_item_indexes.popitem(last=False)
+	return index
+
+
+def clear_supplier_items_cache(doc, method=None, *args):
+	"""Item kaydedildiğinde/silindiğinde eski ve yeni tedarikçilerinin ürün setini ve
+	index sürümünü sil.
+
+	Item Supplier, Item'ın child tablosu olduğu için Item hook'ları yeterli.
+	"""
+	suppliers = {row.supplier for row in doc.get("supplier_items") or [] if row.supplier}
+	before_save = doc.get_doc_before_save() if method == "on_update" else None
+	if before_save:
+		suppliers.update(row.supplier for row in before_save.get("supplier_items") or [] if row.supplier)
+	if method == "after_rename":
+		# Eski ad ile cache'lenmiş setler
+		suppliers.update(frappe.get_all("Item Supplier", filters={"parent": doc.name}, pluck="supplier"))
+
+	if suppliers:
+		frappe.cache().hdel(SUPPLIER_ITEMS_CACHE_KEY, list(suppliers))
+		frappe.cache().hdel(SUPPLIER_ITEMS_VERSION_KEY, list(suppliers))
+
+
 @frappe.whitelist()
 def item_by_supplier(
 	doctype: str = "Item",
@@ -23,45 +123,35 @@ def item_by_supplier(
 	searchfield: str = "name",
 	start: int = 0,
 	page_len: int = 20,
-	filters: Optional[Any] = None,
-) -> List[Tuple[str, str]]:
+	filters: Any | None = None,
+) -> list[tuple[str, str]]:
 	"""Tedarikçiye bağlı ürünleri döndürür.
-	
-	`tabItem Supplier` üzerinden eşleşme yapılır.
-	Arama, item `name` ve `item_name` alanlarında yapılır.
-	
+
+	`tabItem Supplier` üzerinden eşleşme yapılır; tedarikçinin ürün seti cache'lenir
+	ve süreç içi trigram index'i ile aranır (bkz. item_search.py). Alt dize araması
+	yapılır, sıralama modified desc. searchfield="item_name" ise sadece ürün adında,
+	aksi halde item `name` ve `item_name` alanlarında aranır.
+
 	Requires: Item read permission
 	"""
 	# Permission check
 	if not has_permission("Item", "read"):
 		frappe.throw(_("You don't have permission to read Item"), frappe.PermissionError)
-	
+
 	flt = _parse_filters(filters)
 	supplier = flt.get("supplier") or flt.get("default_supplier")
 
 	if not supplier or supplier == "__NONE__":
 		return []
 
-	like_txt = f"%{txt}%" if txt else "%"
+	start = int(start or 0)
+	page_len = int(page_len or 20)
 
-	# Güvenli alan doğrulama: sadece izin verilen alan adları
-	allowed_fields = {"name", "item_name"}
-	sf = searchfield if searchfield in allowed_fields else "name"
+	# Cache kapalıysa index de kurulmaz, DB'den okunan set taranır
+	if not _get_supplier_items_cache_ttl():
+		return SupplierItemIndex.scan(get_supplier_items(supplier), txt, start, page_len, searchfield)
 
-	return frappe.db.sql(
-		"""
-		select i.name, i.item_name
-		  from `tabItem` i
-		  where exists (
-				select 1 from `tabItem Supplier` s
-				 where s.parent = i.name and s.supplier = %s
-		  )
-			and (i.{sf} like %s or i.item_name like %s)
-		  order by i.modified desc
-		  limit %s offset %s
-		""".format(sf=sf),
-		(supplier, like_txt, like_txt, page_len, start),
-	)
+	return get_supplier_item_index(supplier).search(txt, start, page_len, searchfield)
 
 
 @frappe.whitelist()
@@ -71,15 +161,125 @@ def item_query_by_supplier(
 	searchfield: str = "name",
 	start: int = 0,
 	page_len: int = 20,
-	filters: Optional[Any] = None,
+	filters: Any | None = None,
 ):
 	"""Link alanı sorguları için tedarikçiye göre ürün sorgusu proxy'si.
-	
+
 	Permission check item_by_supplier() içinde yapılır.
 	"""
 	return item_by_supplier(doctype, txt, searchfield, start, page_len, filters)
 
 
+ORDERABLE_ITEMS_CACHE_KEY = "culinary_orderable_items"
+
+
+def _get_orderable_items_cache_ttl() -> int:
+	"""Müşterinin sipariş edilebilir ürün seti cache süresi (site_config: culinary_orderable_items_cache_ttl).
+
+	0 verilirse cache kapalıdır.
+	"""
+	ttl = frappe.conf.get("culinary_orderable_items_cache_ttl")
+	return 300 if ttl is None else int(ttl)
+
+
+def _get_item_search_mode() -> str:
+	"""Ürün seçici arama modu (site_config: culinary_item_search_mode).
+
+	- prefix (varsayılan): kod, ad veya addaki herhangi bir kelime txt ile başlar
+	- contains: kod veya ad txt'yi içerir
+	- fulltext: Item.item_name FULLTEXT index'i ile (patch ile eklenir)
+	"""
+	mode = frappe.conf.get("culinary_item_search_mode") or "prefix"
+	return mode if mode in ("prefix", "contains", "fulltext") else "prefix"
+
+
+def _orderable_items_cache_name(customer: str, posting_date: str) -> str:
+	return f"{ORDERABLE_ITEMS_CACHE_KEY}::{customer}::{posting_date}"
+
+
+def get_orderable_items(customer: str, posting_date: str) -> list[tuple[str, str]]:
+	"""Müşterinin posting_date'te geçerli anlaşmalarındaki ürünler, en yeni anlaşma önce.
+
+	Sonuç müşteri + tarih bazında kısa süreli cache'lenir; her tuşa basışta
+	sorgu çalışmaz. Agreement değişikliklerinde clear_orderable_items_cache ile silinir.
+
+	Returns:
+		[(item_code, item_name)]
+	"""
+	ttl = _get_orderable_items_cache_ttl()
+	cache_name = _orderable_items_cache_name(customer, posting_date)
+	if ttl:
+		cached = frappe.cache().get_value(cache_name)
+		if cached is not None:
+			return [tuple(row) for row in cached]
+
+	# valid_from/valid_to zorunlu alanlar; ifnull olmadan (customer, valid_from, valid_to) index'i kullanılır
+	rows = frappe.db.sql(
+		"""
+		select ai.item_code, i.item_name
+		  from `tabAgreement` ag
+		  join `tabAgreement Item` ai on ai.parent = ag.name and ai.parenttype = 'Agreement'
+		  join `tabItem` i on i.name = ai.item_code
+		 where ag.customer = %s
+		   and ag.valid_from <= %s
+		   and ag.valid_to >= %s
+		 group by ai.item_code, i.item_name
+		 order by max(ag.valid_from) desc
+		""",
+		(customer, posting_date, posting_date),
+	)
+	rows = [tuple(row) for row in rows]
+
+	if ttl:
+		frappe.cache().set_value(cache_name, [list(row) for row in rows], expires_in_sec=ttl)
+	return rows
+
+
+def clear_orderable_items_cache(customer: str):
+	"""Müşterinin tüm tarihler için cache'lenmiş ürün setini sil."""
+	if customer:
+		frappe.cache().delete_keys(f"{ORDERABLE_ITEMS_CACHE_KEY}::{customer}::")
+
+
+def _match_items(rows: list[tuple[str, str]], txt: str, mode: str) -> list[tuple[str, str]]:
+	"""Cache'lenmiş [(item_code, item_name)] setinde bellek içi arama; sıralama korunur."""
+	needle = txt.casefold()
+	if mode == "contains":
+		return [row for row in rows if needle in row[0].casefold() or needle in (row[1] or "").casefold()]
+
+	return [
+		row
+		for row in rows
+		if row[0].casefold().startswith(needle)
+		or any(word.startswith(needle) for word in (row[1] or "").casefold().split())
+	]
+
+
+def _fulltext_orderable_items(rows: list[tuple[str, str]], txt: str) -> list[tuple[str, str]]:
+	"""FULLTEXT (boolean mode, kelime öneki) ile item_name araması + kod öneki."""
+	if not rows:
+		return []
+
+	# Boolean mode operatörlerini temizle, her kelime zorunlu önek olsun
+	terms = " ".join(f"+{word}*" for word in re.sub(r'[+\-<>()~*"@]', " ", txt).split())
+	if not terms:
+		return rows
+
+	item_codes = [row[0] for row in rows]
+	matched = set(
+		frappe.db.sql_list(
+			"""
+			select name
+			  from `tabItem`
+			 where name in %(item_codes)s
+			   and (name like %(prefix)s or match(item_name) against (%(terms)s in boolean mode))
+			""",
+			{"item_codes": item_codes, "prefix": f"{txt}%", "terms": terms},
+		)
+	)
+	return [row for row in rows if row[0] in matched]
+
+
 @frappe.whitelist()
 def items_by_customer_agreement(
 	doctype: str = "Item",
@@ -87,46 +287,35 @@ def items_by_customer_agreement(
 	searchfield: str = "name",
 	start: int = 0,
 	page_len: int = 20,
-	filters: Optional[Any] = None,
+	filters: Any | None = None,
 ):
 	"""Müşterinin geçerli anlaşmalarına göre sipariş edebileceği ürünleri listeler.
-	
-	Tarih kontrolü Agreement.valid_from/valid_to üzerinden yapılır.
-	
+
+	Tarih kontrolü Agreement.valid_from/valid_to üzerinden yapılır. Müşterinin ürün
+	seti cache'lenir, arama culinary_item_search_mode'a göre yapılır.
+
 	Requires: Agreement read permission
 	"""
 	# Permission check
 	if not has_permission("Agreement", "read"):
 		frappe.throw(_("You don't have permission to read Agreement"), frappe.PermissionError)
-	
+
 	flt = _parse_filters(filters)
 	customer = flt.get("customer")
-	posting_date = flt.get("posting_date") or frappe.utils.nowdate()
+	posting_date = str(frappe.utils.getdate(flt.get("posting_date") or frappe.utils.nowdate()))
 
 	if not customer:
 		return []
 
-	like_txt = f"%{txt}%" if txt else "%"
-
-	# Güvenli alan doğrulama: sadece izin verilen alan adları
-	allowed_fields = {"name", "item_name"}
-	sf = searchfield if searchfield in allowed_fields else "name"
+	rows = get_orderable_items(customer, posting_date)
 
-	query = f"""
-		select i.name, i.item_name
-		  from `tabAgreement` ag
-		  join `tabAgreement Item` ai on ai.parent = ag.name
-		  join `tabItem` i on i.name = ai.item_code
-		 where ag.customer = %s
-		   and ifnull(ag.valid_from, '0001-01-01') <= %s
-		   and ifnull(ag.valid_to, '9999-12-31') >= %s
-		   and (i.{sf} like %s or i.item_name like %s)
-		 group by i.name, i.item_name
-		 order by max(ag.valid_from) desc
-		 limit %s offset %s
-	"""
+	txt = (txt or "").strip()
+	if txt:
+		mode = _get_item_search_mode()
+		if mode == "fulltext":
+			rows = _fulltext_orderable_items(rows, txt)
+		else:
+			rows = _match_items(rows, txt, mode)
 
-	return frappe.db.sql(
-		query,
-		(customer, posting_date, posting_date, like_txt, like_txt, page_len, start),
-	)
+	start = int(start or 0)
+	return rows[start : start + int(page_len or 20)]
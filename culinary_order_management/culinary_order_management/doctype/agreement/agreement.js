@@ -7,80 +7,35 @@ frappe.ui.form.on('Agreement', {
                 frm.savesubmit();
             });
         }
-		// Sadece submitted ve aktif agreement'lar için bilgilendirme
-		if (frm.doc.docstatus === 1 && frm.doc.status === 'Active') {
-			// Fiyat değişikliği olan ürünleri tespit et (bilgilendirme amaçlı)
-			let price_changed_count = 0;
-			
-			if (frm.doc.agreement_items) {
-				frm.doc.agreement_items.forEach(function(item) {
-					let original = parseFloat(item.price_list_rate) || 0;
-					let current = parseFloat(item.current_agreement_rate) || 0;
-					if (Math.abs(current - original) > 0.01 && current > 0) {
-						price_changed_count++;
-					}
-				});
-			}
-			
-			if (price_changed_count > 0) {
-				// Bilgilendirme indicator (aksiyon gerektirmez)
-				frm.dashboard.add_indicator(__('Fiyat Değişikliği: {0} ürün', [price_changed_count]), 'blue');
-				
-				// Bilgilendirme butonu - Fiyat değişikliklerini göster
-				frm.add_custom_button(__('Fiyat Değişikliklerini Gör'), function() {
-					// Fiyat değişikliklerini listele
-					let html = '<table class="table table-bordered" style="margin-top: 10px;"><thead><tr>' +
-							  '<th>Ürün</th><th>Original Price</th><th>Current Price (Portal)</th><th>Fark</th>' +
-							  '</tr></thead><tbody>';
-					
-					let changes = [];
-					frm.doc.agreement_items.forEach(function(item) {
-						let original = parseFloat(item.price_list_rate) || 0;
-						let current = parseFloat(item.current_agreement_rate) || 0;
-						
-						if (Math.abs(current - original) > 0.01 && current > 0) {
-							let diff = current - original;
-							let diff_pct = (diff / original * 100).toFixed(2);
-							let color = diff > 0 ? 'red' : 'green';
-							
-							html += `<tr>
-								<td><strong>${item.item_code}</strong><br><small>${item.item_name || ''}</small></td>
-								<td>${original.toFixed(2)} ${item.currency || 'EUR'}</td>
-								<td style="font-weight: bold;">${current.toFixed(2)} ${item.currency || 'EUR'}</td>
-								<td style="color: ${color}; font-weight: bold;">${diff > 0 ? '+' : ''}${diff.toFixed(2)} (${diff > 0 ? '+' : ''}${diff_pct}%)</td>
-							</tr>`;
-							
-							changes.push({item_code: item.item_code, diff: diff});
+		// Arka planda fiyat üretimi durumu (ilerleme çubuğu job tarafından yayınlanır)
+		if (frm.doc.docstatus === 1 && frm.doc.price_sync_status) {
+			const sync_colors = {Pending: 'orange', Running: 'blue', Done: 'green', Failed: 'red'};
+			frm.dashboard.add_indicator(
+				__('Price Sync: {0}', [__(frm.doc.price_sync_status)]),
+				sync_colors[frm.doc.price_sync_status] || 'gray'
+			);
+
+			if (frm.doc.price_sync_status === 'Failed' && frm.doc.status === 'Active') {
+				frm.add_custom_button(__('Retry Price Sync'), function() {
+					frappe.call({
+						method: 'culinary_order_management.culinary_order_management.agreement.retry_agreement_price_sync',
+						args: {
+							agreement_name: frm.doc.name
+						},
+						freeze: true,
+						callback: function() {
+							frm.reload_doc();
 						}
 					});
-					
-					html += '</tbody></table>';
-					
-					if (changes.length > 0) {
-						html = '<div style="margin-bottom: 15px;">' +
-							   '<p><strong>ℹ️ BİLGİLENDİRME:</strong></p>' +
-							   '<p>Portal fiyatları <strong>zaten güncel</strong>. Aşağıdaki farklar Agreement yapıldıktan sonra oluşan fiyat değişikliklerini gösterir.</p>' +
-							   '<p><em>Agreement belgesi (tarihsel kayıt) değişmez, portal her zaman güncel fiyatları gösterir.</em></p>' +
-							   '</div>' + html;
-						
-						frappe.msgprint({
-							title: __('Fiyat Değişiklikleri (Bilgilendirme)'),
-							indicator: 'blue',
-							message: html,
-							wide: true
-						});
-					} else {
-						frappe.msgprint({
-							title: __('Fiyat Durumu'),
-							indicator: 'green',
-							message: '<p>✅ Tüm fiyatlar Agreement yapıldığından beri değişmedi.</p>'
-						});
-					}
-				}, __('Bilgi'));
-			} else {
-				// Fiyatlar güncel
-				frm.dashboard.add_indicator(__('Fiyatlar Güncel'), 'green');
+				}, __('İşlemler'));
 			}
+		}
+		// Sadece submitted ve aktif agreement'lar için bilgilendirme
+		if (frm.doc.docstatus === 1 && frm.doc.status === 'Active') {
+			// Fiyat karşılaştırması form açılışında hesaplanmaz; sadece istendiğinde sayfa sayfa yüklenir
+			frm.add_custom_button(__('Fiyat Değişikliklerini Gör'), function() {
+				show_price_changes(frm);
+			}, __('Bilgi'));
 			
 			// Price History silme butonu
 			if (frm.doc.price_history && frm.doc.price_history.length > 0) {
@@ -115,3 +70,152 @@ frappe.ui.form.on('Agreement', {
 	// before_submit hook'u public/js/agreement.js dosyasında tanımlı
 	// Bu dosyada sadece form mantığı var, before_submit hook'u yok
 });
+
+frappe.ui.form.on('Agreement Item', {
+	// "Current Prices (Live)" bölümü sadece satır açıldığında doldurulur
+	form_render: function(frm, cdt, cdn) {
+		let row = locals[cdt][cdn];
+		if (frm.doc.docstatus !== 1 || !row.item_code) return;
+		
+		let grid_row = frm.fields_dict.agreement_items.grid.grid_rows_by_docname[cdn];
+		let indicator = grid_row && grid_row.grid_form && grid_row.grid_form.fields_dict.price_change_indicator;
+		if (!indicator) return;
+		
+		indicator.$wrapper.html(`<div class="text-muted" style="padding: 10px;">${__('Loading...')}</div>`);
+		frappe.call({
+			method: PRICE_COMPARISON_METHOD,
+			args: {
+				agreement_name: frm.doc.name,
+				item_codes: [row.item_code]
+			},
+			callback: function(r) {
+				let data = (r.message && r.message.rows || [])[0];
+				if (!data) {
+					indicator.$wrapper.empty();
+					return;
+				}
+				row.current_standard_rate = data.current_standard;
+				row.current_agreement_rate = data.current_agreement;
+				grid_row.grid_form.refresh_field('current_standard_rate');
+				grid_row.grid_form.refresh_field('current_agreement_rate');
+				indicator.$wrapper.html(get_price_change_html(data));
+			}
+		});
+	}
+});
+
+const PRICE_COMPARISON_METHOD = 'culinary_order_management.culinary_order_management.doctype.agreement.agreement.get_price_comparison';
+const PRICE_CHANGES_PAGE_LENGTH = 50;
+
+function show_price_changes(frm) {
+	let dialog = new frappe.ui.Dialog({
+		title: __('Fiyat Değişiklikleri (Bilgilendirme)'),
+		size: 'extra-large',
+		fields: [{fieldname: 'changes_html', fieldtype: 'HTML'}],
+		primary_action_label: __('Daha Fazla Yükle'),
+		primary_action: function() {
+			load_page();
+		}
+	});
+	let $body = dialog.fields_dict.changes_html.$wrapper;
+	let loaded = 0;
+	
+	$body.html('<div style="margin-bottom: 15px;">' +
+		'<p><strong>ℹ️ BİLGİLENDİRME:</strong></p>' +
+		'<p>Portal fiyatları <strong>zaten güncel</strong>. Aşağıdaki farklar Agreement yapıldıktan sonra oluşan fiyat değişikliklerini gösterir.</p>' +
+		'<p><em>Agreement belgesi (tarihsel kayıt) değişmez, portal her zaman güncel fiyatları gösterir.</em></p>' +
+		'</div>' +
+		'<table class="table table-bordered" style="margin-top: 10px;"><thead><tr>' +
+		'<th>Ürün</th><th>Original Price</th><th>Current Price (Portal)</th><th>Fark</th>' +
+		'</tr></thead><tbody></tbody></table>');
+	
+	function load_page() {
+		frappe.call({
+			method: PRICE_COMPARISON_METHOD,
+			args: {
+				agreement_name: frm.doc.name,
+				start: loaded,
+				page_length: PRICE_CHANGES_PAGE_LENGTH,
+				changed_only: 1
+			},
+			callback: function(r) {
+				let result = r.message || {total: 0, rows: []};
+				if (!result.total) {
+					dialog.hide();
+					frappe.msgprint({
+						title: __('Fiyat Durumu'),
+						indicator: 'green',
+						message: '<p>✅ Tüm fiyatlar Agreement yapıldığından beri değişmedi.</p>'
+					});
+					return;
+				}
+				
+				let rows_html = result.rows.map(function(data) {
+					let original = data.original_agreement;
+					let current = data.current_agreement || original;
+					let diff = current - original;
+					let diff_pct = original ? (diff / original * 100).toFixed(2) : '0.00';
+					let color = diff > 0 ? 'red' : 'green';
+					return `<tr>
+						<td><strong>${data.item_code}</strong><br><small>${data.item_name || ''}</small></td>
+						<td>${original.toFixed(2)} ${data.currency}</td>
+						<td style="font-weight: bold;">${current.toFixed(2)} ${data.currency}</td>
+						<td style="color: ${color}; font-weight: bold;">${diff > 0 ? '+' : ''}${diff.toFixed(2)} (${diff > 0 ? '+' : ''}${diff_pct}%)</td>
+					</tr>`;
+				}).join('');
+				$body.find('tbody').append(rows_html);
+				
+				loaded += result.rows.length;
+				dialog.set_title(__('Fiyat Değişiklikleri: {0} / {1} ürün', [loaded, result.total]));
+				if (loaded >= result.total) {
+					dialog.get_primary_btn().addClass('hide');
+				}
+				dialog.show();
+			}
+		});
+	}
+	
+	load_page();
+}
+
+function get_price_change_html(data) {
+	let standard_diff = data.current_standard - data.original_standard;
+	let standard_pct = data.original_standard > 0 ? standard_diff / data.original_standard * 100 : 0;
+	let agreement_diff = data.current_agreement - data.original_agreement;
+	let agreement_pct = data.original_agreement > 0 ? agreement_diff / data.original_agreement * 100 : 0;
+	
+	// Değişiklik yoksa
+	if (Math.abs(standard_diff) < 0.01 && Math.abs(agreement_diff) < 0.01) {
+		return '<div style="padding: 10px; color: #28a745; font-weight: bold;">✅ Prices are up to date</div>';
+	}
+	
+	let get_color = (diff) => (Math.abs(diff) < 0.01 || diff < 0) ? '#28a745' : '#dc3545';
+	let signed = (value, digits) => (value >= 0 ? '+' : '') + value.toFixed(digits);
+	let price_row = (label, original, current, diff, pct, background) => `
+		<tr${background ? ' style="background-color: #ffffff;"' : ''}>
+			<td style="padding: 5px;">${label}</td>
+			<td style="text-align: right; padding: 5px;">${original.toFixed(2)} ${data.currency}</td>
+			<td style="text-align: right; padding: 5px; font-weight: bold;">${current.toFixed(2)} ${data.currency}</td>
+			<td style="text-align: right; padding: 5px; color: ${get_color(diff)}; font-weight: bold;">
+				${signed(diff, 2)} (${signed(pct, 1)}%)
+			</td>
+		</tr>`;
+	
+	return `
+		<div style="padding: 10px; background-color: #f8f9fa; border-radius: 5px; border-left: 4px solid ${get_color(agreement_diff)};">
+			<table style="width: 100%; font-size: 12px; border-collapse: collapse;">
+				<thead>
+					<tr style="border-bottom: 2px solid #dee2e6;">
+						<th style="text-align: left; padding: 5px; font-weight: bold;">Type</th>
+						<th style="text-align: right; padding: 5px; font-weight: bold;">Original</th>
+						<th style="text-align: right; padding: 5px; font-weight: bold;">Current</th>
+						<th style="text-align: right; padding: 5px; font-weight: bold;">Change</th>
+					</tr>
+				</thead>
+				<tbody>
+					${price_row('Standard Selling', data.original_standard, data.current_standard, standard_diff, standard_pct)}
+					${price_row('Agreement Price', data.original_agreement, data.current_agreement, agreement_diff, agreement_pct, true)}
+				</tbody>
+			</table>
+		</div>`;
+}
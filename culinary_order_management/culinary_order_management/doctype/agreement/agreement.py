@@ -1,320 +1,341 @@
 import frappe
 from frappe import _
 from frappe.model.document import Document
-from frappe.utils import getdate, nowdate
+from frappe.utils import cint, flt, getdate, nowdate
 
 
 class Agreement(Document):
 	"""Customer-Supplier agreement master.
-	
+
 	Professional submittable document with automatic status management.
 	Status is based on docstatus and validity dates.
 	"""
-	
-	def onload(self):
-		"""Load güncel fiyatları hesapla ve virtual field'lara set et."""
-		if self.docstatus != 1:
-			return
-		
-		from culinary_order_management.culinary_order_management.agreement import (
-			_get_standard_selling_rate,
-			_find_existing_item_price
-		)
-		
-		for item in self.agreement_items:
-			if not item.item_code:
-				continue
-			
-			try:
-				# Güncel Standard Selling fiyatı
-				currency = item.currency or frappe.db.get_value("Company", {"is_group": 0}, "default_currency") or "EUR"
-				current_standard = _get_standard_selling_rate(item.item_code, currency)
-				
-				# Güncel Agreement fiyatı (Item Price'dan)
-				price_list_name = self.customer
-				current_agreement = self._get_current_agreement_rate(item.item_code, price_list_name, currency)
-				
-				# Virtual field'lara set et
-				item.current_standard_rate = current_standard
-				item.current_agreement_rate = current_agreement
-				
-				# Fiyat değişimi HTML göstergesi
-				item.price_change_indicator = self._get_price_change_html(
-					original_standard=frappe.utils.flt(item.standard_selling_rate),
-					current_standard=current_standard,
-					original_agreement=frappe.utils.flt(item.price_list_rate),
-					current_agreement=current_agreement,
-					currency=currency
-				)
-				
-			except Exception as e:
-				frappe.log_error(
-					message=f"Failed to load current prices for {item.item_code}: {str(e)}",
-					title="Agreement Load - Price Calculation Failed"
-				)
-	
-	def _get_current_agreement_rate(self, item_code: str, price_list: str, currency: str) -> float:
-		"""Item Price'dan güncel Agreement fiyatını çek."""
-		try:
-			item_price = frappe.db.get_value(
-				"Item Price",
-				{
-					"price_list": price_list,
-					"item_code": item_code,
-					"currency": currency,
-					"note": ["like", f"%{self.name}%"]
-				},
-				"price_list_rate"
-			)
-			
-			return float(item_price) if item_price else 0.0
-			
-		except Exception:
-			return 0.0
-	
-	def _get_price_change_html(
-		self,
-		original_standard: float,
-		current_standard: float,
-		original_agreement: float,
-		current_agreement: float,
-		currency: str
-	) -> str:
-		"""Fiyat değişimi HTML göstergesi oluştur."""
-		
-		# Değişiklik hesapla
-		standard_diff = current_standard - original_standard
-		standard_pct = (standard_diff / original_standard * 100) if original_standard > 0 else 0
-		
-		agreement_diff = current_agreement - original_agreement
-		agreement_pct = (agreement_diff / original_agreement * 100) if original_agreement > 0 else 0
-		
-		# Renk belirleme
-		def get_color(diff):
-			if abs(diff) < 0.01:
-				return "#28a745"  # green
-			return "#dc3545" if diff > 0 else "#28a745"  # red/green
-		
-		standard_color = get_color(standard_diff)
-		agreement_color = get_color(agreement_diff)
-		
-		# Değişiklik yoksa
-		if abs(standard_diff) < 0.01 and abs(agreement_diff) < 0.01:
-			return '<div style="padding: 10px; color: #28a745; font-weight: bold;">✅ Prices are up to date</div>'
-		
-		html = f"""
-		<div style="padding: 10px; background-color: #f8f9fa; border-radius: 5px; border-left: 4px solid {agreement_color};">
-			<table style="width: 100%; font-size: 12px; border-collapse: collapse;">
-				<thead>
-					<tr style="border-bottom: 2px solid #dee2e6;">
-						<th style="text-align: left; padding: 5px; font-weight: bold;">Type</th>
-						<th style="text-align: right; padding: 5px; font-weight: bold;">Original</th>
-						<th style="text-align: right; padding: 5px; font-weight: bold;">Current</th>
-						<th style="text-align: right; padding: 5px; font-weight: bold;">Change</th>
-					</tr>
-				</thead>
-				<tbody>
-					<tr>
-						<td style="padding: 5px;">Standard Selling</td>
-						<td style="text-align: right; padding: 5px;">{original_standard:.2f} {currency}</td>
-						<td style="text-align: right; padding: 5px; font-weight: bold;">{current_standard:.2f} {currency}</td>
-						<td style="text-align: right; padding: 5px; color: {standard_color}; font-weight: bold;">
-							{standard_diff:+.2f} ({standard_pct:+.1f}%)
-						</td>
-					</tr>
-					<tr style="background-color: #ffffff;">
-						<td style="padding: 5px;">Agreement Price</td>
-						<td style="text-align: right; padding: 5px;">{original_agreement:.2f} {currency}</td>
-						<td style="text-align: right; padding: 5px; font-weight: bold;">{current_agreement:.2f} {currency}</td>
-						<td style="text-align: right; padding: 5px; color: {agreement_color}; font-weight: bold;">
-							{agreement_diff:+.2f} ({agreement_pct:+.1f}%)
-						</td>
-					</tr>
-				</tbody>
-			</table>
-		</div>
-		"""
-		
-		return html
-	
+
 	def validate(self):
 		"""Validate agreement before save."""
 		self.validate_dates()
 		self.validate_items()
 		self.update_status()
-	
+
 	def before_submit(self):
 		"""Validate before submit."""
 		self.validate_dates()
 		self.validate_items()
-		
+
 		# Check for overlapping agreements
 		self.check_overlapping_agreements()
-	
+
 	def on_submit(self):
 		"""Submit edildiğinde fiyat listelerini oluştur.
-		
+
 		Sadece aktif anlaşmalar için fiyatları oluştur.
 		Başlamadı durumundakiler scheduled job ile aktif olunca oluşturulacak.
 		"""
-		# External hook fonksiyonunu çağır
-		from culinary_order_management.culinary_order_management.agreement import create_price_list_for_agreement
-		
-		# Sadece aktif anlaşmalar için fiyat oluştur
+		# External hook fonksiyonlarını çağır
+		from culinary_order_management.culinary_order_management.agreement import (
+			create_price_list_for_agreement,
+			enqueue_agreement_price_sync,
+			should_sync_prices_async,
+		)
+
+		# Sadece aktif anlaşmalar için fiyat oluştur (büyük anlaşmalar arka planda)
 		if self.status == "Active":
-			create_price_list_for_agreement(self, "on_submit")
-	
+			if should_sync_prices_async(self):
+				enqueue_agreement_price_sync(self)
+			else:
+				create_price_list_for_agreement(self, "on_submit")
+				self.db_set("price_sync_status", "Done", update_modified=False)
+
+		self.refresh_price_indexes()
+
 	def on_update_after_submit(self):
 		"""Allow limited updates after submit."""
 		if self.has_value_changed("valid_from") or self.has_value_changed("valid_to"):
-			frappe.throw(_("Validity dates cannot be changed after submission. Please cancel and create a new agreement."))
-		
+			frappe.throw(
+				_(
+					"Validity dates cannot be changed after submission. Please cancel and create a new agreement."
+				)
+			)
+
 		if self.has_value_changed("customer") or self.has_value_changed("supplier"):
 			frappe.throw(_("Customer and Supplier cannot be changed after submission."))
-		
-		# Fiyatları senkronize et
-		from culinary_order_management.culinary_order_management.agreement import sync_item_prices
-		sync_item_prices(self, "on_update_after_submit")
-	
+
+		# Fiyatları senkronize et (büyük anlaşmalar arka planda)
+		from culinary_order_management.culinary_order_management.agreement import (
+			enqueue_agreement_price_sync,
+			should_sync_prices_async,
+			sync_item_prices,
+		)
+
+		if self.status == "Active" and should_sync_prices_async(self):
+			enqueue_agreement_price_sync(self)
+		else:
+			sync_item_prices(self, "on_update_after_submit")
+		self.refresh_price_indexes()
+
+	def on_update(self):
+		"""Taslak anlaşmalar da fiyat çözümlemesine dahil, index'leri tazele."""
+		self.refresh_price_indexes()
+
+	def after_delete(self):
+		self.refresh_price_indexes()
+
+	def refresh_price_indexes(self):
+		"""Ürün → anlaşma index'ini, müşterinin Sales Order fiyat index'ini ve ürün seçici
+		cache'ini (Redis) yeniden kur.
+
+		Commit sonrası çalışır; geri alınan işlemler index'e yansımaz.
+		"""
+		from culinary_order_management.culinary_order_management.agreement import refresh_item_agreement_index
+		from culinary_order_management.culinary_order_management.api import clear_orderable_items_cache
+		from culinary_order_management.culinary_order_management.sales_order import (
+			rebuild_agreement_price_cache,
+		)
+
+		item_codes = {item.item_code for item in self.agreement_items if item.item_code}
+		customers = {self.customer}
+		# Taslakta çıkarılan ürünlerin index kaydı da güncellenmeli
+		before_save = self.get_doc_before_save()
+		if before_save:
+			item_codes.update(item.item_code for item in before_save.agreement_items if item.item_code)
+			customers.add(before_save.customer)
+
+		def refresh():
+			refresh_item_agreement_index(list(item_codes))
+			rebuild_agreement_price_cache(self)
+			for customer in customers:
+				clear_orderable_items_cache(customer)
+
+		frappe.db.after_commit.add(refresh)
+
 	def validate_dates(self):
 		"""Validate validity dates."""
 		if not self.valid_from:
 			frappe.throw(_("Valid From date is mandatory"))
-		
+
 		if not self.valid_to:
 			frappe.throw(_("Valid To date is mandatory"))
-		
+
 		valid_from = getdate(self.valid_from)
 		valid_to = getdate(self.valid_to)
-		
+
 		if valid_from > valid_to:
 			frappe.throw(_("Valid To date cannot be before Valid From date"))
-	
+
 	def validate_items(self):
 		"""Validate agreement items."""
 		if not self.agreement_items:
 			frappe.throw(_("Please add at least one item"))
-		
+
 		# Duplicate item check
 		item_codes = [item.item_code for item in self.agreement_items if item.item_code]
 		if len(item_codes) != len(set(item_codes)):
 			frappe.throw(_("Duplicate items are not allowed"))
-		
+
 		# Price validation
 		for item in self.agreement_items:
 			if not item.item_code:
 				frappe.throw(_("Row {0}: Item Code is mandatory").format(item.idx))
-			
+
 			if not item.price_list_rate or item.price_list_rate <= 0:
 				frappe.throw(_("Row {0}: Please enter a valid price").format(item.idx))
-	
+
 	def check_overlapping_agreements(self):
 		"""Aynı müşteri-tedarikçi için aktif anlaşma kontrolü (tarih bağımsız)."""
 		if self.docstatus != 0:
 			return
-		
+
 		# Eğer replacement işlemi içindeyse kontrolü atla
 		if self.flags.get("is_replacement"):
 			return
-		
-		active_agreements = frappe.db.sql("""
+
+		active_agreements = frappe.db.sql(
+			"""
 			SELECT name, valid_from, valid_to, status
 			FROM `tabAgreement`
 			WHERE customer = %s
 			  AND supplier = %s
 			  AND docstatus = 1
 			  AND name != %s
-		""", (self.customer, self.supplier, self.name), as_dict=True)
-		
+		""",
+			(self.customer, self.supplier, self.name),
+			as_dict=True,
+		)
+
 		if active_agreements:
 			agreement_names = ", ".join([d.name for d in active_agreements])
 			frappe.throw(
-				_("Aktif anlaşma mevcut: {0}. Lütfen önce mevcut anlaşmayı iptal edin.").format(agreement_names),
-				title=_("Aktif Anlaşma Var")
+				_("Aktif anlaşma mevcut: {0}. Lütfen önce mevcut anlaşmayı iptal edin.").format(
+					agreement_names
+				),
+				title=_("Aktif Anlaşma Var"),
 			)
-	
+
 	def update_status(self):
 		"""Tarih bazlı dinamik status hesaplama."""
 		# İptal edildiyse
 		if self.docstatus == 2:
 			self.status = "Cancelled"
 			return
-		
+
 		# Taslaksa henüz başlamamış kabul ediyoruz
 		if self.docstatus == 0:
 			self.status = "Not Started"
 			return
-		
+
 		# Tarih kontrolü (sadece submitted belgeler için)
 		if self.docstatus == 1 and self.valid_from and self.valid_to:
-			today = getdate(nowdate())
-			valid_from = getdate(self.valid_from)
-			valid_to = getdate(self.valid_to)
-			
-			if today < valid_from:
-				self.status = "Not Started"
-			elif today > valid_to:
-				self.status = "Expired"
-			else:
-				self.status = "Active"
-	
+			self.status = get_status_for_dates(self.valid_from, self.valid_to)
+
 	def on_cancel(self):
 		"""İptal edildiğinde status güncelle, Price List'i deaktive et ve fiyatları temizle."""
 		self.update_status()
-		
-		# Price List'i deaktive et (ama önce başka aktif anlaşma var mı kontrol et)
-		if self.customer:
-			price_list_name = f"{self.customer}"
-			if frappe.db.exists("Price List", price_list_name):
-				# Aynı müşteri için başka aktif anlaşma var mı?
-				other_active = frappe.db.count("Agreement", {
-					"customer": self.customer,
-					"docstatus": 1,
-					"status": "Active",
-					"name": ["!=", self.name]
-				})
-				
-				# Başka aktif anlaşma yoksa Price List'i deaktive et
-				if not other_active:
-					frappe.db.set_value("Price List", price_list_name, "enabled", 0, update_modified=False)
-		
+
+		# Price List'i deaktive et (müşterinin başka aktif anlaşması yoksa)
+		# Status job'ı Price List'leri run sonunda toplu günceller
+		if self.customer and not self.flags.defer_price_list_sync:
+			from culinary_order_management.culinary_order_management.agreement import sync_price_list_states
+
+			sync_price_list_states([self.customer])
+
 		# External hook fonksiyonunu çağır (fiyatları temizler)
 		from culinary_order_management.culinary_order_management.agreement import cleanup_item_prices
+
 		cleanup_item_prices(self, "on_cancel")
+		self.refresh_price_indexes()
+
+
+def _get_current_agreement_rates(
+	agreement_name: str, price_list: str, item_codes: list | None = None
+) -> dict:
+	"""Item Price'dan anlaşmaya ait güncel fiyatları çek.
+
+	Returns:
+		dict: {(item_code, currency): rate}
+	"""
+	filters = {"price_list": price_list, "custom_agreement": agreement_name}
+	if item_codes is not None:
+		filters["item_code"] = ["in", item_codes]
+
+	rates = {}
+	for row in frappe.get_all(
+		"Item Price",
+		filters=filters,
+		fields=["item_code", "currency", "price_list_rate"],
+	):
+		rates.setdefault((row.item_code, row.currency), float(row.price_list_rate or 0))
+	return rates
+
+
+@frappe.whitelist()
+def get_price_comparison(
+	agreement_name: str,
+	start: int = 0,
+	page_length: int = 50,
+	changed_only: int = 0,
+	item_codes=None,
+):
+	"""Orijinal ve güncel (Standard Selling / Agreement) fiyat karşılaştırması.
+
+	Form açılışında hesaplanmaz; client sadece kullanıcı paneli/satırı açtığında çağırır.
+	Sayfa başına sadece o sayfadaki ürünler için iki toplu sorgu çalışır. changed_only
+	verilirse tüm satırlar karşılaştırılıp sadece anlaşma fiyatı değişenler sayfalanır
+	(Fiyat Değişiklikleri diyaloğu sadece anlaşma farkını gösterir).
+
+	Returns:
+		dict: {"total": int, "rows": [{"item_code", "item_name", "currency",
+		"original_standard", "current_standard", "original_agreement",
+		"current_agreement", "changed", "agreement_changed"}]}
+		changed: standart ya da anlaşma fiyatı değişti; agreement_changed: anlaşma fiyatı değişti
+	"""
+	if not frappe.has_permission("Agreement", "read", agreement_name):
+		frappe.throw(_("You don't have permission to read Agreement"), frappe.PermissionError)
+
+	from culinary_order_management.culinary_order_management.agreement import _get_standard_selling_rates
+
+	agreement = frappe.db.get_value("Agreement", agreement_name, ["customer", "docstatus"], as_dict=True)
+	if not agreement or agreement.docstatus != 1:
+		return {"total": 0, "rows": []}
+
+	start = cint(start)
+	page_length = cint(page_length) or 50
+	changed_only = cint(changed_only)
+
+	filters = {"parent": agreement_name, "parenttype": "Agreement", "item_code": ["is", "set"]}
+	item_codes = frappe.parse_json(item_codes) if item_codes else None
+	if item_codes:
+		filters["item_code"] = ["in", item_codes]
+
+	paging = {} if changed_only else {"limit_start": start, "limit_page_length": page_length}
+	items = frappe.get_all(
+		"Agreement Item",
+		filters=filters,
+		fields=["item_code", "item_name", "currency", "standard_selling_rate", "price_list_rate"],
+		order_by="idx asc",
+		**paging,
+	)
+	if not items:
+		return {"total": 0 if changed_only else frappe.db.count("Agreement Item", filters), "rows": []}
+
+	company_currency = frappe.db.get_value("Company", {"is_group": 0}, "default_currency") or "EUR"
+	standard_rates = _get_standard_selling_rates(
+		[(item.item_code, item.currency or company_currency) for item in items]
+	)
+	agreement_rates = _get_current_agreement_rates(
+		agreement_name, agreement.customer, [item.item_code for item in items]
+	)
+
+	rows = []
+	for item in items:
+		currency = item.currency or company_currency
+		current_standard = standard_rates.get((item.item_code, currency), 0.0)
+		current_agreement = agreement_rates.get((item.item_code, currency), 0.0)
+		original_standard = flt(item.standard_selling_rate)
+		original_agreement = flt(item.price_list_rate)
+		agreement_changed = current_agreement > 0 and abs(current_agreement - original_agreement) >= 0.01
+		changed = agreement_changed or abs(current_standard - original_standard) >= 0.01
+		if changed_only and not agreement_changed:
+			continue
+		rows.append(
+			{
+				"item_code": item.item_code,
+				"item_name": item.item_name,
+				"currency": currency,
+				"original_standard": original_standard,
+				"current_standard": current_standard,
+				"original_agreement": original_agreement,
+				"current_agreement": current_agreement,
+				"changed": int(changed),
+				"agreement_changed": int(agreement_changed),
+			}
+		)
+
+	if changed_only:
+		return {"total": len(rows), "rows": rows[start : start + page_length]}
+	return {"total": frappe.db.count("Agreement Item", filters), "rows": rows}
 
 
 @frappe.whitelist()
 def check_active_agreement(customer, supplier, current_agreement=None):
 	"""Müşteri-tedarikçi için aktif anlaşma kontrolü.
-	
+
 	Returns:
 		dict: {"has_active": bool, "agreements": [{"name": str, "valid_from": date, "valid_to": date}]}
 	"""
-	filters = {
-		"customer": customer,
-		"supplier": supplier,
-		"docstatus": 1
-	}
-	
+	filters = {"customer": customer, "supplier": supplier, "docstatus": 1}
+
 	if current_agreement:
 		filters["name"] = ["!=", current_agreement]
-	
-	active = frappe.get_all(
-		"Agreement",
-		filters=filters,
-		fields=["name", "valid_from", "valid_to", "status"]
-	)
-	
-	return {
-		"has_active": len(active) > 0,
-		"agreements": active
-	}
+
+	active = frappe.get_all("Agreement", filters=filters, fields=["name", "valid_from", "valid_to", "status"])
+
+	return {"has_active": len(active) > 0, "agreements": active}
 
 
 @frappe.whitelist()
 def replace_agreement(old_agreement, new_agreement):
 	"""Eski anlaşmayı cancel et, yeni anlaşmayı submit et.
-	
+
 	Transaction içinde çalışır - hata olursa rollback yapılır.
 	Frappe otomatik transaction yönetimi kullanır.
 	"""
@@ -323,122 +344,390 @@ def replace_agreement(old_agreement, new_agreement):
 		old_doc = frappe.get_doc("Agreement", old_agreement)
 		if old_doc.docstatus != 1:
 			frappe.throw(_("Eski anlaşma zaten submit edilmemiş"))
-		
+
 		old_doc.cancel()
-		
+
 		# Yeni anlaşmayı submit et
 		new_doc = frappe.get_doc("Agreement", new_agreement)
 		if new_doc.docstatus != 0:
 			frappe.throw(_("Yeni anlaşma zaten submit edilmiş"))
-		
+
 		# Flag ekle - check_overlapping_agreements atlanacak
 		new_doc.flags.is_replacement = True
 		new_doc.submit()
-		
-		return {
-			"success": True,
-			"message": _("Eski anlaşma iptal edildi, yeni anlaşma onaylandı")
-		}
-		
+
+		return {"success": True, "message": _("Eski anlaşma iptal edildi, yeni anlaşma onaylandı")}
+
 	except Exception as e:
-		frappe.log_error(
-			message=f"Agreement replacement failed: {str(e)}",
-			title="Agreement Replacement Error"
-		)
+		frappe.log_error(message=f"Agreement replacement failed: {e!s}", title="Agreement Replacement Error")
 		frappe.throw(_("İşlem başarısız: {0}").format(str(e)))
 
 
+STATUS_WATERMARK_KEY = "culinary_agreement_status_watermark"
+STATUS_JOB_PREFIX = "agreement-status-transition"
+
+
+STATUS_JOB_QUEUE = "culinary_agreement_status"
+
+
+def _get_status_job_queue() -> str:
+	"""Status geçiş job'larının kuyruğu (site_config: culinary_agreement_status_queue).
+
+	Varsayılan ayrı kuyruktur; price-sync ve diğer long job'larla yarışmaz. Kuyruk
+	common_site_config.json "workers" altında tanımlı değilse "long" kullanılır.
+	"""
+	from frappe.utils.background_jobs import get_queues_timeout
+
+	queue = frappe.conf.get("culinary_agreement_status_queue") or STATUS_JOB_QUEUE
+	if queue not in get_queues_timeout():
+		frappe.logger().warning(f"Agreement status queue '{queue}' tanımlı değil, 'long' kullanılıyor")
+		return "long"
+	return queue
+
+
+def _get_status_job_concurrency() -> int:
+	"""Aynı anda kuyruğa atılan en fazla job sayısı (site_config: culinary_agreement_status_concurrency)."""
+	return max(cint(frappe.conf.get("culinary_agreement_status_concurrency")) or 4, 1)
+
+
+def get_status_for_dates(valid_from, valid_to, today=None) -> str:
+	"""Submitted bir anlaşmanın verilen gündeki tarih bazlı statusu."""
+	today = getdate(today or nowdate())
+	if today < getdate(valid_from):
+		return "Not Started"
+	if today > getdate(valid_to):
+		return "Expired"
+	return "Active"
+
+
+def _get_status_transition_candidates(today) -> list:
+	"""Son başarılı çalışmadan (watermark) bu yana tarih sınırı geçilen anlaşmalar.
+
+	- valid_from (watermark, bugün] aralığında: Not Started -> Active
+	- valid_to [watermark, bugün) aralığında: Active -> Expired
+	- Expired ama hâlâ submitted olanlar: önceki auto-cancel başarısız olmuş, tekrar dene
+
+	Watermark yoksa (ilk çalışma) saklanan status ile tarihlerden hesaplanan status'ün
+	farklı olduğu tüm submitted anlaşmalar seçilir.
+	"""
+	watermark = frappe.db.get_global(STATUS_WATERMARK_KEY)
+	fields = "name, customer, docstatus, valid_from, valid_to, status"
+
+	if not watermark:
+		return frappe.db.sql(
+			f"""
+			SELECT {fields}
+			FROM `tabAgreement`
+			WHERE docstatus = 1
+			  AND (status = 'Expired' OR status != CASE
+				WHEN %(today)s < valid_from THEN 'Not Started'
+				WHEN %(today)s > valid_to THEN 'Expired'
+				ELSE 'Active'
+			  END)
+		""",
+			{"today": today},
+			as_dict=True,
+		)
+
+	# Her koşul kendi index'ini kullanabilsin diye OR yerine UNION
+	return frappe.db.sql(
+		f"""
+		SELECT {fields} FROM `tabAgreement`
+		WHERE docstatus = 1 AND valid_from > %(watermark)s AND valid_from <= %(today)s
+		UNION
+		SELECT {fields} FROM `tabAgreement`
+		WHERE docstatus = 1 AND valid_to >= %(watermark)s AND valid_to < %(today)s
+		UNION
+		SELECT {fields} FROM `tabAgreement`
+		WHERE docstatus = 1 AND status = 'Expired'
+	""",
+		{"watermark": getdate(watermark), "today": today},
+		as_dict=True,
+	)
+
+
 @frappe.whitelist()
 def update_all_agreement_statuses():
-	"""Tüm agreement'ların statuslerini güncelle ve expired olanları otomatik cancel et.
-	
+	"""Tarih sınırı geçilen agreement'ların status geçişlerini arka plan job'larına dağıt.
+
 	Bu fonksiyon scheduled job olarak her gün çalıştırılabilir.
-	
+
+	Sadece son başarılı çalışmadan (watermark) bu yana valid_from/valid_to sınırını
+	geçen anlaşmalar seçilir. Geçişler müşteri bazında gruplanır (aynı müşterinin
+	Price List'ine tek job dokunur) ve en fazla culinary_agreement_status_concurrency
+	job'a bölünür. Her anlaşma kendi commit'i ile işlenir, sonuçlar Agreement Status Run
+	kaydında toplanır.
+
 	Önemli: Expired olan agreement'lar otomatik cancel edilir (docstatus=2).
 	Cancel işlemi mevcut on_cancel hook'u ile fiyatları otomatik temizler.
 	"""
-	agreements = frappe.get_all(
-		"Agreement",
-		fields=["name", "docstatus", "valid_from", "valid_to", "status"],
-		filters={"docstatus": ["!=", 2]}  # Zaten cancel edilmiş olanları atlıyoruz
-	)
-	
-	updated_count = 0
-	cancelled_count = 0
-	
+	today = getdate(nowdate())
+	agreements = [
+		agreement_data
+		for agreement_data in _get_status_transition_candidates(today)
+		if agreement_data.status
+		!= get_status_for_dates(agreement_data.valid_from, agreement_data.valid_to, today)
+		or agreement_data.status == "Expired"
+	]
+
+	if not agreements:
+		frappe.db.set_global(STATUS_WATERMARK_KEY, str(today))
+		frappe.db.commit()
+		return {"run": None, "jobs": 0, "total": 0}
+
+	by_customer = {}
 	for agreement_data in agreements:
+		by_customer.setdefault(agreement_data.customer, []).append(agreement_data.name)
+
+	job_count = min(_get_status_job_concurrency(), len(by_customer))
+	buckets = [[] for _ in range(job_count)]
+	# Büyük müşteriler önce, her seferinde en az yüklü job'a
+	for names in sorted(by_customer.values(), key=len, reverse=True):
+		min(buckets, key=len).extend(names)
+
+	run = frappe.get_doc(
+		{
+			"doctype": "Agreement Status Run",
+			"run_date": today,
+			"status": "Queued",
+			"total_jobs": job_count,
+			"transitions": len(agreements),
+		}
+	).insert(ignore_permissions=True)
+	frappe.db.commit()
+
+	for index, agreement_names in enumerate(buckets):
+		frappe.enqueue(
+			"culinary_order_management.culinary_order_management.doctype.agreement.agreement.process_agreement_status_transitions",
+			queue=_get_status_job_queue(),
+			timeout=3600,
+			job_id=f"{STATUS_JOB_PREFIX}::{run.name}::{index}",
+			deduplicate=True,
+			run_name=run.name,
+			agreement_names=agreement_names,
+		)
+
+	frappe.logger().info(
+		f"{len(agreements)} agreement status geçişi {job_count} job'a dağıtıldı ({run.name})"
+	)
+	return {"run": run.name, "jobs": job_count, "total": len(agreements)}
+
+
+def process_agreement_status_transitions(run_name: str, agreement_names: list):
+	"""Background job: bir grup anlaşmanın status geçişini uygula.
+
+	Her anlaşma ayrı commit edilir; bir hata sadece o anlaşmayı geri alır (status dahil).
+	"""
+	frappe.db.set_value("Agreement Status Run", run_name, "status", "Running", update_modified=False)
+	frappe.db.commit()
+
+	outcomes = []
+	affected_customers = set()
+	for agreement_name in agreement_names:
 		try:
-			doc = frappe.get_doc("Agreement", agreement_data.name)
-			old_status = doc.status
-			doc.update_status()
-			
-			# Status değiştiyse kaydet ve Price List'i güncelle
-			if old_status != doc.status:
-				doc.db_set("status", doc.status, update_modified=False)
-				updated_count += 1
-				frappe.logger().info(f"Agreement {doc.name} status güncellendi: {old_status} -> {doc.status}")
-				
-				# Status değişimlerine göre fiyat yönetimi
-				if old_status == "Not Started" and doc.status == "Active":
-					# Anlaşma aktif oldu - fiyatları oluştur
-					from culinary_order_management.culinary_order_management.agreement import create_price_list_for_agreement
-					try:
-						create_price_list_for_agreement(doc, "status_change")
-						frappe.logger().info(f"Agreement {doc.name} aktif oldu - fiyatlar oluşturuldu")
-					except Exception as e:
-						frappe.log_error(
-							message=f"Fiyat oluşturma hatası: {str(e)}",
-							title="Agreement Activation - Price Creation Failed"
-						)
-				
-				elif old_status == "Active" and doc.status == "Expired":
-					# Anlaşma expired oldu - fiyatları temizle
-					from culinary_order_management.culinary_order_management.agreement import cleanup_item_prices
-					try:
-						cleanup_item_prices(doc, "status_change")
-						frappe.logger().info(f"Agreement {doc.name} expired oldu - fiyatlar temizlendi")
-					except Exception as e:
-						frappe.log_error(
-							message=f"Fiyat temizleme hatası: {str(e)}",
-							title="Agreement Expiration - Price Cleanup Failed"
-						)
-				
-				# Price List durumunu güncelle
-				if doc.customer:
-					price_list_name = f"{doc.customer}"
-					if frappe.db.exists("Price List", price_list_name):
-						# Aynı müşteri için herhangi bir aktif anlaşma var mı kontrol et
-						active_count = frappe.db.count("Agreement", {
-							"customer": doc.customer,
-							"docstatus": 1,
-							"status": "Active"
-						})
-						
-						should_enable = 1 if active_count > 0 else 0
-						frappe.db.set_value("Price List", price_list_name, "enabled", should_enable, update_modified=False)
-						frappe.logger().info(f"Price List {price_list_name} {'aktivated' if should_enable else 'deactivated'}")
-			
-			# Kritik: Expired olmuş ve submitted olan agreement'ları otomatik cancel et
-			if doc.status == "Expired" and doc.docstatus == 1:
-				try:
-					# Cancel et (on_cancel hook'u tetiklenir ve fiyatlar temizlenir)
-					doc.cancel()
-					# Status'ü "Expired" olarak koru (liste görünümünde "Günü Geçmiş" gösterilsin)
-					doc.db_set("status", "Expired", update_modified=False)
-					cancelled_count += 1
-					frappe.logger().info(f"Agreement {doc.name} expired - otomatik cancel edildi, fiyatlar temizlendi")
-				except Exception as cancel_error:
-					frappe.log_error(
-						message=f"Agreement {doc.name} cancel işlemi hatası: {str(cancel_error)}",
-						title="Agreement Auto-Cancel Error"
-					)
-		
+			outcome = _apply_agreement_status_transition(agreement_name)
+			frappe.db.commit()
 		except Exception as e:
+			frappe.db.rollback()
 			frappe.log_error(
-				message=f"Agreement {agreement_data.name} işlenirken hata: {str(e)}",
-				title="Agreement Status Update Error"
+				message=f"Agreement {agreement_name} işlenirken hata: {e!s}",
+				title="Agreement Status Update Error",
 			)
-	
+			outcome = {"agreement": agreement_name, "result": "Failed", "error": str(e)}
+
+		if outcome:
+			outcomes.append(outcome)
+			if outcome.get("customer"):
+				affected_customers.add(outcome["customer"])
+
+	# Price List durumunu job sonunda tek seferde güncelle
+	# (müşteriler job'lara bölünmez, başka job aynı Price List'e dokunmaz)
+	if affected_customers:
+		from culinary_order_management.culinary_order_management.agreement import sync_price_list_states
+
+		try:
+			sync_price_list_states(affected_customers)
+			frappe.db.commit()
+		except Exception as e:
+			frappe.db.rollback()
+			frappe.log_error(
+				message=f"Price List durumu güncellenemedi ({', '.join(sorted(affected_customers))}): {e!s}",
+				title="Agreement Status Update - Price List Sync Failed",
+			)
+
+	_record_status_run_outcomes(run_name, outcomes)
+
+
+def _apply_agreement_status_transition(agreement_name: str) -> dict | None:
+	"""Tek anlaşmanın statusunu güncelle, fiyatları oluştur/temizle, expired ise cancel et."""
+	doc = frappe.get_doc("Agreement", agreement_name)
+	old_status = doc.status
+	doc.update_status()
+
+	outcome = {
+		"agreement": doc.name,
+		"customer": doc.customer,
+		"old_status": old_status,
+		"new_status": doc.status,
+		"result": "Updated",
+		"error": None,
+	}
+
+	def fail(message):
+		outcome["result"] = "Failed"
+		outcome["error"] = message
+
+	# Status değiştiyse kaydet (Price List durumu job sonunda toplu güncellenir).
+	# Status ve fiyatlar aynı transaction'da; aktivasyonda fiyat oluşturma hatası
+	# yükseltilir, job rollback yapar ve anlaşma "Not Started" kalıp tekrar denenir.
+	if old_status != doc.status:
+		doc.db_set("status", doc.status, update_modified=False)
+		doc.refresh_price_indexes()
+		frappe.logger().info(f"Agreement {doc.name} status güncellendi: {old_status} -> {doc.status}")
+
+		# Status değişimlerine göre fiyat yönetimi
+		if old_status == "Not Started" and doc.status == "Active":
+			# Anlaşma aktif oldu - fiyatları oluştur
+			from culinary_order_management.culinary_order_management.agreement import (
+				create_price_list_for_agreement,
+			)
+
+			try:
+				create_price_list_for_agreement(doc, "status_change")
+				frappe.logger().info(f"Agreement {doc.name} aktif oldu - fiyatlar oluşturuldu")
+			except Exception as e:
+				frappe.log_error(
+					message=f"Fiyat oluşturma hatası: {e!s}",
+					title="Agreement Activation - Price Creation Failed",
+				)
+				raise
+
+		elif old_status == "Active" and doc.status == "Expired":
+			# Anlaşma expired oldu - fiyatları temizle
+			from culinary_order_management.culinary_order_management.agreement import cleanup_item_prices
+
+			try:
+				cleanup_item_prices(doc, "status_change")
+				frappe.logger().info(f"Agreement {doc.name} expired oldu - fiyatlar temizlendi")
+			except Exception as e:
+				fail(str(e))
+				frappe.log_error(
+					message=f"Fiyat temizleme hatası: {e!s}",
+					title="Agreement Expiration - Price Cleanup Failed",
+				)
+
+	# Kritik: Expired olmuş ve submitted olan agreement'ları otomatik cancel et
+	if doc.status == "Expired" and doc.docstatus == 1:
+		try:
+			# Cancel et (on_cancel hook'u tetiklenir ve fiyatlar temizlenir)
+			doc.flags.defer_price_list_sync = True
+			doc.cancel()
+			# Status'ü "Expired" olarak koru (liste görünümünde "Günü Geçmiş" gösterilsin)
+			doc.db_set("status", "Expired", update_modified=False)
+			if outcome["result"] != "Failed":
+				outcome["result"] = "Cancelled"
+			frappe.logger().info(
+				f"Agreement {doc.name} expired - otomatik cancel edildi, fiyatlar temizlendi"
+			)
+		except Exception as cancel_error:
+			fail(str(cancel_error))
+			frappe.log_error(
+				message=f"Agreement {doc.name} cancel işlemi hatası: {cancel_error!s}",
+				title="Agreement Auto-Cancel Error",
+			)
+
+	if old_status == doc.status and outcome["result"] == "Updated":
+		# Başka bir job zaten işlemiş
+		return None
+	return outcome
+
+
+def _record_status_run_outcomes(run_name: str, outcomes: list):
+	"""Job sonuçlarını Agreement Status Run'a yaz; son biten job özeti kapatır."""
+	now = frappe.utils.now()
+	user = frappe.session.user
+	outcome_fields = ["agreement", "customer", "old_status", "new_status", "result", "error"]
+	if outcomes:
+		frappe.db.bulk_insert(
+			"Agreement Status Run Outcome",
+			[
+				"name",
+				"creation",
+				"modified",
+				"owner",
+				"modified_by",
+				"docstatus",
+				"parent",
+				"parenttype",
+				"parentfield",
+				*outcome_fields,
+			],
+			[
+				(
+					frappe.generate_hash(length=10),
+					now,
+					now,
+					user,
+					user,
+					0,
+					run_name,
+					"Agreement Status Run",
+					"outcomes",
+					*(outcome.get(field) for field in outcome_fields),
+				)
+				for outcome in outcomes
+			],
+		)
+
+	# Atomik sayaç; job'lar paralel bitebilir
+	frappe.db.sql(
+		"""
+		UPDATE `tabAgreement Status Run`
+		SET finished_jobs = finished_jobs + 1
+		WHERE name = %s
+	""",
+		run_name,
+	)
+	frappe.db.commit()
+
+	run = frappe.db.get_value(
+		"Agreement Status Run", run_name, ["run_date", "total_jobs", "finished_jobs"], as_dict=True
+	)
+	if run.finished_jobs < run.total_jobs:
+		return
+
+	counts = dict(
+		frappe.db.sql(
+			"""
+		SELECT result, COUNT(*)
+		FROM `tabAgreement Status Run Outcome`
+		WHERE parent = %s AND parenttype = 'Agreement Status Run'
+		GROUP BY result
+	""",
+			run_name,
+		)
+	)
+	failed_count = counts.get("Failed", 0)
+	frappe.db.set_value(
+		"Agreement Status Run",
+		run_name,
+		{
+			"status": "Completed with Errors" if failed_count else "Completed",
+			"updated_count": counts.get("Updated", 0),
+			"cancelled_count": counts.get("Cancelled", 0),
+			"failed_count": failed_count,
+		},
+		update_modified=False,
+	)
+
+	# Hata olduysa watermark ilerlemez; bir sonraki çalışma aynı aralığı tekrar dener.
+	# Başarısız aktivasyonlar rollback ile "Not Started" kalır ve bu aralıkta tekrar seçilir;
+	# temizleme/cancel hatasında status "Expired" + submitted kalır, o sorgu ayrıca seçer.
+	if not failed_count:
+		frappe.db.set_global(STATUS_WATERMARK_KEY, str(run.run_date))
+
 	frappe.db.commit()
-	frappe.logger().info(f"Toplam {updated_count} agreement status güncellendi, {cancelled_count} expired agreement otomatik cancel edildi")
-	return {"updated": updated_count, "total": len(agreements), "cancelled": cancelled_count}
+	frappe.logger().info(
+		f"{run_name}: {counts.get('Updated', 0)} agreement status güncellendi, "
+		f"{counts.get('Cancelled', 0)} expired agreement otomatik cancel edildi, {failed_count} hata"
+	)
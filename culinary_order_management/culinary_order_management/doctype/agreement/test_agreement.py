@@ -0,0 +1,126 @@
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import add_days, nowdate
+
+from culinary_order_management.culinary_order_management.doctype.agreement.agreement import (
+	get_price_comparison,
+)
+
+
+def _leaf(doctype: str) -> str:
+	return frappe.db.get_value(doctype, {"is_group": 0}, "name")
+
+
+def make_item(standard_rate: float) -> tuple:
+	"""Ürün ve Standard Selling fiyatı; (item_code, Item Price adı) döner."""
+	item_code = f"_Test Agreement Item {frappe.generate_hash(length=8)}"
+	frappe.get_doc(
+		{
+			"doctype": "Item",
+			"item_code": item_code,
+			"item_group": _leaf("Item Group"),
+			"stock_uom": "Nos",
+			"is_stock_item": 0,
+		}
+	).insert(ignore_permissions=True)
+	price = frappe.get_doc(
+		{
+			"doctype": "Item Price",
+			"price_list": "Standard Selling",
+			"item_code": item_code,
+			"price_list_rate": standard_rate,
+		}
+	).insert(ignore_permissions=True)
+	return item_code, price.name
+
+
+def make_agreement(items: list, submit: bool = True):
+	"""Bugünü kapsayan anlaşma; items: [(item_code, price_list_rate[, standard_selling_rate])]."""
+	suffix = frappe.generate_hash(length=8)
+	customer = frappe.get_doc(
+		{
+			"doctype": "Customer",
+			"customer_name": f"_Test Agreement Customer {suffix}",
+			"customer_group": _leaf("Customer Group"),
+			"territory": _leaf("Territory"),
+		}
+	).insert(ignore_permissions=True)
+	supplier = frappe.get_doc(
+		{
+			"doctype": "Supplier",
+			"supplier_name": f"_Test Agreement Supplier {suffix}",
+			"supplier_group": _leaf("Supplier Group"),
+		}
+	).insert(ignore_permissions=True)
+	currency = frappe.db.get_value("Price List", "Standard Selling", "currency")
+	agreement = frappe.get_doc(
+		{
+			"doctype": "Agreement",
+			"customer": customer.name,
+			"supplier": supplier.name,
+			"valid_from": add_days(nowdate(), -1),
+			"valid_to": add_days(nowdate(), 30),
+			"agreement_items": [
+				{
+					"item_code": row[0],
+					"price_list_rate": row[1],
+					"standard_selling_rate": row[2] if len(row) > 2 else 0,
+					"currency": currency,
+				}
+				for row in items
+			],
+		}
+	)
+	agreement.insert(ignore_permissions=True)
+	if submit:
+		agreement.submit()
+	return agreement
+
+
+class TestAgreement(FrappeTestCase):
+	def setUp(self):
+		self.items = [make_item(standard_rate=100) for _ in range(3)]
+		self.item_codes = [item_code for item_code, _price in self.items]
+		self.agreement = make_agreement([(item_code, 90, 100) for item_code in self.item_codes])
+
+	def _set_agreement_rate(self, item_code: str, rate: float):
+		name = frappe.db.get_value(
+			"Item Price", {"custom_agreement": self.agreement.name, "item_code": item_code}
+		)
+		frappe.db.set_value("Item Price", name, "price_list_rate", rate)
+
+	def test_price_comparison_pages_all_rows(self):
+		first = get_price_comparison(self.agreement.name, start=0, page_length=2)
+		second = get_price_comparison(self.agreement.name, start=2, page_length=2)
+
+		self.assertEqual(first["total"], 3)
+		self.assertEqual(second["total"], 3)
+		self.assertEqual([row["item_code"] for row in first["rows"] + second["rows"]], self.item_codes)
+		self.assertFalse(any(row["changed"] for row in first["rows"] + second["rows"]))
+
+	def test_changed_only_ignores_standard_rate_only_changes(self):
+		# Sadece standart fiyat değişti: satır değişmiş sayılır ama diyalogda listelenmez
+		frappe.db.set_value("Item Price", self.items[0][1], "price_list_rate", 150)
+		self._set_agreement_rate(self.item_codes[1], 85)
+		self._set_agreement_rate(self.item_codes[2], 95)
+
+		rows = {row["item_code"]: row for row in get_price_comparison(self.agreement.name)["rows"]}
+		self.assertEqual(
+			(rows[self.item_codes[0]]["changed"], rows[self.item_codes[0]]["agreement_changed"]), (1, 0)
+		)
+		self.assertEqual(rows[self.item_codes[1]]["agreement_changed"], 1)
+
+		changed = get_price_comparison(self.agreement.name, changed_only=1)
+		self.assertEqual(changed["total"], 2)
+		self.assertEqual([row["item_code"] for row in changed["rows"]], self.item_codes[1:])
+
+		page = get_price_comparison(self.agreement.name, start=1, page_length=1, changed_only=1)
+		self.assertEqual(page["total"], 2)
+		self.assertEqual([row["item_code"] for row in page["rows"]], [self.item_codes[2]])
+		self.assertEqual(page["rows"][0]["current_agreement"], 95)
+
+	def test_price_comparison_is_empty_for_drafts(self):
+		item_code, _price = make_item(standard_rate=100)
+		draft = make_agreement([(item_code, 90)], submit=False)
+
+		self.assertEqual(get_price_comparison(draft.name), {"total": 0, "rows": []})
@@ -0,0 +1,164 @@
+"""
+Culinary Order Management - Supplier item search index
+
+Tedarikçi ürün seçicisi (api.item_by_supplier) için bellek içi trigram index.
+Satırlar cache sırasını (modified desc) korur; arama alt dize (substring) eşleşmesidir.
+Frappe'ye bağımlı değildir (yükleme ve invalidation api.py içinde), benchmark doğrudan
+çalıştırılabilir:
+
+	python -m culinary_order_management.culinary_order_management.item_search [items] [queries]
+"""
+
+import random
+import string
+import sys
+import time
+from array import array
+
+GRAM_SIZE = 3
+
+
+def _grams(text: str) -> set:
+	return {text[i : i + GRAM_SIZE] for i in range(len(text) - GRAM_SIZE + 1)}
+
+
+class SupplierItemIndex:
+	"""[(item_code, item_name)] satırları için trigram index.
+
+	Her trigram için satır numaraları artan sırada tutulur. 3+ karakterlik aramada
+	en kısa posting listesi aday kümesidir; adaylar sırayla doğrulanır ve sayfa
+	dolunca durulur. Daha kısa aramalarda satırlar sırayla taranır (erken çıkışlı).
+	"""
+
+	def __init__(self, rows: list, version=None):
+		self.rows = rows
+		self.version = version
+		self.codes = [row[0].casefold() for row in rows]
+		self.names = [(row[1] or "").casefold() for row in rows]
+
+		# Kod ve ad tek metinde; ayraç (\x00) aramada geçmediği için sınırdaki trigramlar eşleşmez
+		postings = {}
+		get = postings.get
+		for position, text in enumerate(map("\x00".join, zip(self.codes, self.names, strict=True))):
+			for gram in {text[i : i + GRAM_SIZE] for i in range(len(text) - GRAM_SIZE + 1)}:
+				positions = get(gram)
+				if positions is None:
+					postings[gram] = array("I", (position,))
+				else:
+					positions.append(position)
+		self.postings = postings
+
+	def _candidates(self, needle: str):
+		if len(needle) < GRAM_SIZE:
+			return range(len(self.rows))
+
+		smallest = None
+		for gram in _grams(needle):
+			positions = self.postings.get(gram)
+			if positions is None:
+				return ()
+			if smallest is None or len(positions) < len(smallest):
+				smallest = positions
+		return smallest
+
+	def search(self, txt: str, start: int = 0, page_len: int = 20, searchfield: str = "name") -> list:
+		"""txt'yi kodda veya adda içeren satırlar (searchfield="item_name" ise sadece adda).
+
+		Returns:
+			list: [(item_code, item_name)], satır sırası korunur
+		"""
+		needle = (txt or "").strip().casefold()
+		if not needle:
+			return self.rows[start : start + page_len]
+
+		codes = None if searchfield == "item_name" else self.codes
+		names = self.names
+		wanted = start + page_len
+		matches = []
+		for position in self._candidates(needle):
+			if needle in names[position] or (codes is not None and needle in codes[position]):
+				matches.append(self.rows[position])
+				if len(matches) >= wanted:
+					break
+		return matches[start:wanted]
+
+	@staticmethod
+	def scan(rows: list, txt: str, start: int = 0, page_len: int = 20, searchfield: str = "name") -> list:
+		"""Index kurmadan aynı eşleşme (doğrusal tarama); küçük/cache'siz setler ve doğrulama için."""
+		needle = (txt or "").strip().casefold()
+		matches = [
+			row
+			for row in rows
+			if needle in (row[1] or "").casefold()
+			or (searchfield != "item_name" and needle in row[0].casefold())
+		]
+		return matches[start : start + page_len]
+
+
+def _random_word(rng: random.Random, length: int) -> str:
+	return "".join(rng.choice(string.ascii_lowercase) for _ in range(length))
+
+
+def benchmark_item_search(
+	items: int = 200_000, queries: int = 1_000, seed: int = 42, verify: int = 200
+) -> dict:
+	"""Sentetik katalogla (kod + 2-4 kelimelik ad) index kurma ve arama süreleri.
+
+	Sorgular katalogdaki adlardan alınan 1-8 karakterlik parçalar (tuşa basış simülasyonu)
+	ve %10 eşleşmeyen rastgele metinlerdir. İlk `verify` sorgu doğrusal taramayla karşılaştırılır.
+
+	bench --site <site> execute \
+		culinary_order_management.culinary_order_management.item_search.benchmark_item_search
+	"""
+	rng = random.Random(seed)
+	vocabulary = [_random_word(rng, rng.randint(3, 10)).capitalize() for _ in range(5_000)]
+	rows = [
+		(f"ITEM-{index:06d}", " ".join(rng.choice(vocabulary) for _ in range(rng.randint(2, 4))))
+		for index in range(items)
+	]
+
+	started = time.perf_counter()
+	index = SupplierItemIndex(rows)
+	build_s = time.perf_counter() - started
+
+	searches = []
+	for _ in range(queries):
+		if rng.random() < 0.1:
+			searches.append(_random_word(rng, rng.randint(3, 6)))
+		else:
+			name = rng.choice(rows)[1]
+			offset = rng.randrange(len(name))
+			searches.append(name[offset : offset + rng.randint(1, 8)])
+
+	mismatches = sum(
+		1 for txt in searches[:verify] if index.search(txt, 0, 20) != SupplierItemIndex.scan(rows, txt, 0, 20)
+	)
+
+	timings = []
+	for txt in searches:
+		started = time.perf_counter()
+		index.search(txt, 0, 20)
+		timings.append((time.perf_counter() - started) * 1000)
+	timings.sort()
+
+	started = time.perf_counter()
+	for txt in searches[:verify]:
+		SupplierItemIndex.scan(rows, txt, 0, 20)
+	linear_ms = (time.perf_counter() - started) * 1000 / max(verify, 1)
+
+	return {
+		"items": items,
+		"queries": queries,
+		"build_s": round(build_s, 2),
+		"p50_ms": round(timings[len(timings) // 2], 3),
+		"p95_ms": round(timings[int(len(timings) * 0.95)], 3),
+		"max_ms": round(timings[-1], 3),
+		"linear_scan_avg_ms": round(linear_ms, 3),
+		"verify_mismatches": mismatches,
+	}
+
+
+if __name__ == "__main__":
+	args = [int(arg) for arg in sys.argv[1:3]]
+	for key, value in benchmark_item_search(*args).items():
+		print(f"{key}: {value}")
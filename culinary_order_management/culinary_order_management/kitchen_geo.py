@@ -0,0 +1,243 @@
+"""
+Culinary Order Management - Geodistance kitchen routing engine
+
+Mutfak koordinatları üzerinde sabit hücreli grid index; en yakın mutfağı
+kapasite ve hizmet yarıçapı kısıtlarıyla bulur. Frappe'ye bağımlı değildir
+(veri yükleme kitchen_routing.py içinde), benchmark doğrudan çalıştırılabilir:
+
+	python -m culinary_order_management.culinary_order_management.kitchen_geo [orders] [kitchens]
+"""
+
+import csv
+import math
+import random
+import sys
+import time
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 111.32
+DEFAULT_CELL_DEGREES = 0.5
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+	"""İki koordinat arası büyük daire mesafesi (km)."""
+	phi1, phi2 = math.radians(lat1), math.radians(lat2)
+	d_phi = phi2 - phi1
+	d_lambda = math.radians(lon2 - lon1)
+	a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+	return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def load_centroids(path: str) -> dict:
+	"""Posta kodu centroid dosyasını oku.
+
+	Beklenen CSV başlığı: postcode,latitude,longitude
+
+	Returns:
+		dict: {postcode: (lat, lon)}
+	"""
+	centroids = {}
+	with open(path, newline="", encoding="utf-8") as f:
+		for row in csv.DictReader(f):
+			postcode = "".join((row.get("postcode") or "").split()).upper()
+			if not postcode:
+				continue
+			try:
+				centroids[postcode] = (float(row["latitude"]), float(row["longitude"]))
+			except (TypeError, ValueError, KeyError):
+				continue
+	return centroids
+
+
+class KitchenGrid:
+	"""Mutfaklar için sabit hücreli (derece) grid index.
+
+	cell_degrees verilmezse mutfak yoğunluğuna göre seçilir.
+
+	Sorgu, müşterinin hücresinden başlayıp halka halka genişler; bulunan en iyi
+	adaydan daha yakın mutfak içerebilecek halka kalmayınca durur.
+
+	kitchens: [{"company", "lat", "lon", "capacity" (0 = sınırsız), "radius_km" (0 = sınırsız)}]
+	"""
+
+	def __init__(self, kitchens: list, cell_degrees: float | None = None):
+		self.kitchens = list(kitchens)
+		self.cell = cell_degrees or self._auto_cell_degrees(self.kitchens)
+		self.cells = {}
+		for kitchen in self.kitchens:
+			self.cells.setdefault(self._cell_of(kitchen["lat"], kitchen["lon"]), []).append(kitchen)
+
+		if self.cells:
+			rows = [key[0] for key in self.cells]
+			cols = [key[1] for key in self.cells]
+			self._bounds = (min(rows), max(rows), min(cols), max(cols))
+			self._max_abs_lat = max(abs(kitchen["lat"]) for kitchen in self.kitchens)
+		else:
+			self._bounds = None
+			self._max_abs_lat = 0.0
+
+		radii = [kitchen.get("radius_km") or 0 for kitchen in self.kitchens]
+		self._max_radius_km = max(radii) if radii and all(radii) else None
+
+	@staticmethod
+	def _auto_cell_degrees(kitchens: list) -> float:
+		"""Hücre başına ~1 mutfak düşecek boyut (0.05° - 2° arası)."""
+		if len(kitchens) < 2:
+			return DEFAULT_CELL_DEGREES
+		lat_span = max(k["lat"] for k in kitchens) - min(k["lat"] for k in kitchens)
+		lon_span = max(k["lon"] for k in kitchens) - min(k["lon"] for k in kitchens)
+		cell = math.sqrt(max(lat_span * lon_span, 1e-6) / len(kitchens))
+		return min(max(cell, 0.05), 2.0)
+
+	def _cell_of(self, lat: float, lon: float) -> tuple:
+		return (math.floor(lat / self.cell), math.floor(lon / self.cell))
+
+	def _ring(self, center: tuple, radius: int):
+		ci, cj = center
+		if radius == 0:
+			yield center
+			return
+		for j in range(cj - radius, cj + radius + 1):
+			yield (ci - radius, j)
+			yield (ci + radius, j)
+		for i in range(ci - radius + 1, ci + radius):
+			yield (i, cj - radius)
+			yield (i, cj + radius)
+
+	def _min_cell_km(self, lat: float) -> float:
+		"""Bir hücre kenarının en kısa hali (boylam yönü, en kuzey noktada).
+
+		Paralel boyunca mesafe büyük daire mesafesinden biraz uzun olabildiği için %10 pay bırakılır.
+		"""
+		max_abs_lat = min(max(abs(lat), self._max_abs_lat) + self.cell, 89.0)
+		return 0.9 * self.cell * KM_PER_DEGREE * max(math.cos(math.radians(max_abs_lat)), 0.01)
+
+	def _max_ring(self, center: tuple) -> int:
+		min_row, max_row, min_col, max_col = self._bounds
+		ci, cj = center
+		return max(abs(ci - min_row), abs(ci - max_row), abs(cj - min_col), abs(cj - max_col))
+
+	def nearest(self, lat: float, lon: float, loads: dict | None = None):
+		"""Kapasitesi dolmamış ve hizmet yarıçapı içindeki en yakın mutfak.
+
+		Args:
+			loads: {company: atanmış sipariş sayısı}; None ise kapasite kontrol edilmez
+
+		Returns:
+			tuple: (company, distance_km) ya da (None, None)
+		"""
+		if not self._bounds:
+			return None, None
+
+		center = self._cell_of(lat, lon)
+		cell_km = self._min_cell_km(lat)
+		best, best_distance = None, None
+		for radius in range(self._max_ring(center) + 1):
+			# Bu halkadaki herhangi bir nokta en az (radius - 1) hücre uzakta
+			lower_bound = max(radius - 1, 0) * cell_km
+			if best_distance is not None and lower_bound > best_distance:
+				break
+			if self._max_radius_km is not None and lower_bound > self._max_radius_km:
+				break
+
+			for key in self._ring(center, radius):
+				for kitchen in self.cells.get(key, ()):
+					distance = haversine_km(lat, lon, kitchen["lat"], kitchen["lon"])
+					if kitchen.get("radius_km") and distance > kitchen["radius_km"]:
+						continue
+					if (
+						loads is not None
+						and kitchen.get("capacity")
+						and loads.get(kitchen["company"], 0) >= kitchen["capacity"]
+					):
+						continue
+					if best_distance is None or (distance, kitchen["company"]) < (best_distance, best):
+						best, best_distance = kitchen["company"], distance
+
+		return best, best_distance
+
+	def route(self, lat: float, lon: float, loads: dict | None = None):
+		"""nearest + atanan mutfağın yükünü artır (toplu routing için)."""
+		company, _distance = self.nearest(lat, lon, loads)
+		if company and loads is not None:
+			loads[company] = loads.get(company, 0) + 1
+		return company
+
+
+def _brute_force_nearest(kitchens: list, lat: float, lon: float, loads: dict | None = None):
+	best, best_distance = None, None
+	for kitchen in kitchens:
+		distance = haversine_km(lat, lon, kitchen["lat"], kitchen["lon"])
+		if kitchen.get("radius_km") and distance > kitchen["radius_km"]:
+			continue
+		if (
+			loads is not None
+			and kitchen.get("capacity")
+			and loads.get(kitchen["company"], 0) >= kitchen["capacity"]
+		):
+			continue
+		if best_distance is None or (distance, kitchen["company"]) < (best_distance, best):
+			best, best_distance = kitchen["company"], distance
+	return best, best_distance
+
+
+def benchmark_routing(orders: int = 100_000, kitchens: int = 30, seed: int = 42, verify: int = 1_000) -> dict:
+	"""Sentetik koordinatlarla (Almanya sınır kutusu) toplu routing benchmark'ı.
+
+	Kapasite: siparişlerin tamamı sığacak şekilde mutfaklara eşit dağıtılır (+%20),
+	yarıçap 150 km. İlk `verify` sipariş brute-force sonuçla karşılaştırılır.
+
+	bench --site <site> execute \
+		culinary_order_management.culinary_order_management.kitchen_geo.benchmark_routing
+	"""
+	rng = random.Random(seed)
+	lat_range, lon_range = (47.3, 55.0), (5.9, 15.0)
+	capacity = math.ceil(orders / kitchens * 1.2)
+	kitchen_rows = [
+		{
+			"company": f"Mutfak - {index:03d}",
+			"lat": rng.uniform(*lat_range),
+			"lon": rng.uniform(*lon_range),
+			"capacity": capacity,
+			"radius_km": 150.0,
+		}
+		for index in range(kitchens)
+	]
+	points = [(rng.uniform(*lat_range), rng.uniform(*lon_range)) for _ in range(orders)]
+
+	started = time.perf_counter()
+	grid = KitchenGrid(kitchen_rows)
+	build_ms = (time.perf_counter() - started) * 1000
+
+	mismatches = 0
+	for lat, lon in points[:verify]:
+		if grid.nearest(lat, lon)[0] != _brute_force_nearest(kitchen_rows, lat, lon)[0]:
+			mismatches += 1
+
+	loads = {}
+	started = time.perf_counter()
+	assigned = sum(1 for lat, lon in points if grid.route(lat, lon, loads))
+	route_seconds = time.perf_counter() - started
+
+	started = time.perf_counter()
+	for lat, lon in points[:verify]:
+		_brute_force_nearest(kitchen_rows, lat, lon)
+	brute_seconds_per_order = (time.perf_counter() - started) / max(verify, 1)
+
+	return {
+		"orders": orders,
+		"kitchens": kitchens,
+		"grid_build_ms": round(build_ms, 3),
+		"route_total_s": round(route_seconds, 3),
+		"route_us_per_order": round(route_seconds / orders * 1_000_000, 2),
+		"brute_force_us_per_order": round(brute_seconds_per_order * 1_000_000, 2),
+		"assigned": assigned,
+		"unassigned": orders - assigned,
+		"verify_mismatches": mismatches,
+	}
+
+
+if __name__ == "__main__":
+	args = [int(arg) for arg in sys.argv[1:3]]
+	for key, value in benchmark_routing(*args).items():
+		print(f"{key}: {value}")
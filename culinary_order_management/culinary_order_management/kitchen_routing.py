@@ -0,0 +1,233 @@
+"""
+Culinary Order Management - Kitchen routing
+
+Posta kodu → mutfak şirketi index'i. Mutfaklar ("Mutfak - %" şirketleri) ve varsayılan
+adreslerinin posta kodları bir kez okunur, Redis'te saklanır; Company/Address
+değişikliklerinde silinir.
+
+site_config:
+	culinary_kitchen_routing_fallback: "prefix" (varsayılan) | "first" | "none"
+		prefix: en uzun ortak önek, eşitlikte sayısal olarak en yakın posta kodu
+		first: ilk mutfak şirketi (alfabetik)
+		none: eşleşme yoksa mutfak atanmaz
+		prefix ile de bulunamazsa ilk mutfak şirketi döner.
+	culinary_kitchen_routing_min_prefix: prefix fallback için en kısa ortak önek (varsayılan 1)
+	culinary_kitchen_routing_mode: "postcode" (varsayılan) | "geo"
+		geo: posta kodu centroid'leri üzerinden en yakın mutfak (bkz. kitchen_geo.py);
+			Company.custom_kitchen_capacity (günlük sipariş, 0 = sınırsız) ve
+			Company.custom_service_radius_km (0 = sınırsız) dikkate alınır.
+			Müşteri posta kodunun centroid'i yoksa posta kodu routing'ine düşülür.
+	culinary_postcode_centroids_path: centroid CSV yolu (varsayılan: data/postcode_centroids.csv)
+"""
+
+import os
+
+import frappe
+from frappe.utils import cint, flt, today
+
+from culinary_order_management.culinary_order_management.kitchen_geo import KitchenGrid, load_centroids
+
+KITCHEN_ROUTING_CACHE_KEY = "culinary_kitchen_routing"
+KITCHEN_GRID_CACHE_KEY = "culinary_kitchen_grid"
+KITCHEN_COMPANY_PATTERN = "Mutfak - %"
+
+# Centroid dosyası süreç başına bir kez okunur: {path: {postcode: (lat, lon)}}
+_centroid_cache = {}
+
+
+def _normalize_pincode(pincode) -> str:
+	return "".join(str(pincode or "").split()).upper()
+
+
+def _pincode_distance(a: str, b: str) -> int:
+	"""Aynı önekli posta kodları arasında sayısal mesafe (sayısal değilse 0)."""
+	if a.isdigit() and b.isdigit():
+		return abs(int(a) - int(b))
+	return 0
+
+
+def build_kitchen_routing_index() -> dict:
+	"""Mutfak şirketleri ve posta kodlarından routing index'i oluştur.
+
+	Returns:
+		dict: {
+			"kitchens": [company],
+			"exact": {pincode: company},
+			"prefix": {prefix: [[pincode, company]]},
+			"pincodes": {company: pincode},
+			"limits": {company: [capacity, radius_km]},
+		}
+	"""
+	from frappe.contacts.doctype.address.address import get_default_address
+
+	kitchen_rows = frappe.get_all(
+		"Company",
+		filters={"name": ["like", KITCHEN_COMPANY_PATTERN]},
+		fields=["name", "custom_kitchen_capacity", "custom_service_radius_km"],
+		order_by="name asc",
+	)
+	kitchens = [row.name for row in kitchen_rows]
+	limits = {
+		row.name: [cint(row.custom_kitchen_capacity), flt(row.custom_service_radius_km)]
+		for row in kitchen_rows
+	}
+
+	exact = {}
+	prefix = {}
+	pincodes = {}
+	for company in kitchens:
+		addr_name = get_default_address("Company", company)
+		if not addr_name:
+			continue
+		pincode = _normalize_pincode(frappe.db.get_value("Address", addr_name, "pincode"))
+		if not pincode:
+			continue
+		pincodes[company] = pincode
+		# Aynı posta kodunda birden fazla mutfak varsa ilki (alfabetik) kazanır
+		exact.setdefault(pincode, company)
+		for length in range(1, len(pincode) + 1):
+			prefix.setdefault(pincode[:length], []).append([pincode, company])
+
+	return {"kitchens": kitchens, "exact": exact, "prefix": prefix, "pincodes": pincodes, "limits": limits}
+
+
+def get_kitchen_routing_index() -> dict:
+	"""Routing index'i (istek içi → Redis → yeniden oluştur)."""
+	index = frappe.local.cache.get(KITCHEN_ROUTING_CACHE_KEY)
+	if index is not None:
+		return index
+
+	index = frappe.cache().get_value(KITCHEN_ROUTING_CACHE_KEY)
+	if index is None:
+		index = build_kitchen_routing_index()
+		frappe.cache().set_value(KITCHEN_ROUTING_CACHE_KEY, index)
+
+	frappe.local.cache[KITCHEN_ROUTING_CACHE_KEY] = index
+	return index
+
+
+def clear_kitchen_routing_index(doc=None, method=None, *args):
+	"""Company/Address değiştiğinde index'i sil (bir sonraki routing'de yeniden kurulur)."""
+	if doc and doc.doctype == "Company" and not frappe.utils.cstr(doc.name).startswith("Mutfak - "):
+		# after_rename: eski ad mutfak olabilir
+		if method != "after_rename":
+			return
+	if (
+		doc
+		and doc.doctype == "Address"
+		and not any(link.link_doctype == "Company" for link in doc.get("links") or [])
+	):
+		return
+
+	frappe.local.cache.pop(KITCHEN_ROUTING_CACHE_KEY, None)
+	frappe.local.cache.pop(KITCHEN_GRID_CACHE_KEY, None)
+	frappe.cache().delete_value(KITCHEN_ROUTING_CACHE_KEY)
+
+
+def get_postcode_centroids() -> dict:
+	"""Posta kodu centroid'leri (süreç başına bir kez okunur, dosya yoksa boş)."""
+	path = frappe.conf.get("culinary_postcode_centroids_path") or frappe.get_app_path(
+		"culinary_order_management", "culinary_order_management", "data", "postcode_centroids.csv"
+	)
+	if path not in _centroid_cache:
+		_centroid_cache[path] = load_centroids(path) if os.path.exists(path) else {}
+	return _centroid_cache[path]
+
+
+def get_kitchen_grid() -> KitchenGrid:
+	"""Koordinatı bilinen mutfaklar için grid index (istek içi memo)."""
+	grid = frappe.local.cache.get(KITCHEN_GRID_CACHE_KEY)
+	if grid is not None:
+		return grid
+
+	index = get_kitchen_routing_index()
+	centroids = get_postcode_centroids()
+	kitchens = []
+	for company, pincode in index["pincodes"].items():
+		point = centroids.get(pincode)
+		if not point:
+			continue
+		capacity, radius_km = index["limits"].get(company) or [0, 0]
+		kitchens.append(
+			{
+				"company": company,
+				"lat": point[0],
+				"lon": point[1],
+				"capacity": capacity,
+				"radius_km": radius_km,
+			}
+		)
+
+	grid = KitchenGrid(kitchens)
+	frappe.local.cache[KITCHEN_GRID_CACHE_KEY] = grid
+	return grid
+
+
+def _get_kitchen_loads(grid: KitchenGrid):
+	"""Kapasitesi tanımlı mutfakların bugünkü sipariş sayıları (tek GROUP BY sorgusu)."""
+	companies = [kitchen["company"] for kitchen in grid.kitchens if kitchen.get("capacity")]
+	if not companies:
+		return None
+
+	rows = frappe.get_all(
+		"Sales Order",
+		filters={"company": ["in", companies], "transaction_date": today(), "docstatus": ["<", 2]},
+		fields=["company", "count(name) as orders"],
+		group_by="company",
+	)
+	return {row.company: cint(row.orders) for row in rows}
+
+
+def _get_routing_mode() -> str:
+	mode = frappe.conf.get("culinary_kitchen_routing_mode") or "postcode"
+	return mode if mode in ("postcode", "geo") else "postcode"
+
+
+def _get_routing_fallback() -> str:
+	fallback = frappe.conf.get("culinary_kitchen_routing_fallback") or "prefix"
+	return fallback if fallback in ("prefix", "first", "none") else "prefix"
+
+
+def _route_by_prefix(index: dict, pincode: str):
+	"""En uzun ortak önekli mutfak; eşitlikte sayısal olarak en yakın posta kodu."""
+	min_prefix = max(cint(frappe.conf.get("culinary_kitchen_routing_min_prefix")) or 1, 1)
+	for length in range(len(pincode), min_prefix - 1, -1):
+		candidates = index["prefix"].get(pincode[:length])
+		if candidates:
+			return min(candidates, key=lambda row: (_pincode_distance(pincode, row[0]), row[1]))[1]
+	return None
+
+
+def route_kitchen(customer_pincode):
+	"""Müşteri posta koduna göre mutfak şirketi.
+
+	geo modunda müşteri posta kodunun centroid'ine en yakın uygun mutfak; kapasite ya da
+	yarıçap nedeniyle uygun mutfak yoksa None. Diğer durumlarda önce tam eşleşme, yoksa
+	culinary_kitchen_routing_fallback kuralı.
+	"""
+	pincode = _normalize_pincode(customer_pincode)
+	if not pincode:
+		return None
+
+	if _get_routing_mode() == "geo":
+		point = get_postcode_centroids().get(pincode)
+		grid = get_kitchen_grid()
+		if point and grid.kitchens:
+			company, _distance = grid.nearest(point[0], point[1], _get_kitchen_loads(grid))
+			return company
+
+	index = get_kitchen_routing_index()
+	company = index["exact"].get(pincode)
+	if company:
+		return company
+
+	fallback = _get_routing_fallback()
+	if fallback == "prefix":
+		company = _route_by_prefix(index, pincode)
+		if company:
+			return company
+
+	# Posta kodu olan mutfak yoksa (ya da "first") ilk mutfak şirketi
+	if fallback != "none" and index["kitchens"]:
+		return index["kitchens"][0]
+	return None
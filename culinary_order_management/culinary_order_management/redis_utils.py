@@ -0,0 +1,47 @@
+"""
+Culinary Order Management - Redis helpers
+
+frappe.cache() (RedisWrapper) üzerinde olmayan toplu komutlar. Anahtarlar wrapper ile
+aynı şekilde make_key ile prefix'lenir ve wrapper'ın bağlantısı kullanılır; böylece
+cache.sadd / cache.hset ile yazılan kayıtlar burada okunabilir (ve tersi).
+"""
+
+import pickle
+
+import frappe
+
+
+def spop_many(name: str, count: int) -> list:
+	"""SPOP name count: setten en fazla `count` üyeyi atomik olarak al.
+
+	RedisWrapper.spop sayı almaz; üyeler decode edilmiş string olarak döner.
+	"""
+	cache = frappe.cache()
+	members = cache.execute_command("SPOP", cache.make_key(name), count)
+	return [frappe.safe_decode(member) for member in members or []]
+
+
+def hmget(name: str, keys: list) -> dict:
+	"""HMGET: hash alanlarını tek istekte oku (cache.hget ile aynı pickle formatı).
+
+	Returns:
+		dict: {key: value}, olmayan alanlar yer almaz
+	"""
+	if not keys:
+		return {}
+	cache = frappe.cache()
+	values = cache.execute_command("HMGET", cache.make_key(name), *keys)
+	return {key: pickle.loads(value) for key, value in zip(keys, values, strict=True) if value is not None}
+
+
+def hset_many(name: str, mapping: dict):
+	"""HSET name k1 v1 k2 v2 ...: birden çok alanı tek istekte yaz (cache.hset ile aynı format)."""
+	if not mapping:
+		return
+	cache = frappe.cache()
+	_name = cache.make_key(name)
+	# cache.hset gibi request-local kopyayı da güncelle
+	frappe.local.cache.setdefault(_name, {}).update(mapping)
+	cache.execute_command(
+		"HSET", _name, *(part for key, value in mapping.items() for part in (key, pickle.dumps(value)))
+	)
@@ -1,62 +1,252 @@
+from datetime import date
+
 import frappe
 from frappe import _
-from frappe.utils import getdate
-from typing import Optional, Dict, Any
+from frappe.utils import cint, getdate, nowdate
+from typing import Optional, Dict, Any, List
+
+from culinary_order_management.culinary_order_management.agreement import get_item_agreements
+from culinary_order_management.culinary_order_management.redis_utils import hmget, hset_many
+
+
+CONVERSION_RATE_CACHE_KEY = "culinary_conversion_rate"
+
+
+def _get_conversion_rate_cache_ttl() -> int:
+	"""Redis katmanının TTL süresi (saniye).
+
+	site_config.json içindeki `culinary_conversion_rate_cache_ttl` ile açılır;
+	tanımlı değilse sadece istek/job bazlı bellek cache'i kullanılır.
+	"""
+	return cint(frappe.conf.get("culinary_conversion_rate_cache_ttl") or 0)
+
+
+def _fetch_conversion_rate(from_currency: str, to_currency: str, date: str) -> Optional[float]:
+	"""Currency Exchange tablosundan verilen tarihteki (veya öncesindeki) son kuru okur."""
+	rate = frappe.db.get_value(
+		"Currency Exchange",
+		{
+			"from_currency": from_currency,
+			"to_currency": to_currency,
+			"date": ["<=", date],
+		},
+		"exchange_rate",
+		order_by="date desc",
+	)
+	return float(rate) if rate else None
 
 
 def get_conversion_rate(from_currency: str, to_currency: str, date: str) -> float:
-	"""Currency conversion rate al"""
+	"""Currency conversion rate al
+
+	(from_currency, to_currency, date) anahtarıyla istek/job boyunca bellekte,
+	TTL tanımlıysa Redis'te de saklanır.
+	"""
 	if from_currency == to_currency:
 		return 1.0
 	try:
-		rate = frappe.db.get_value(
-			"Currency Exchange",
-			{
-				"from_currency": from_currency,
-				"to_currency": to_currency,
-				"date": ["<=", date],
-			},
-			"exchange_rate",
-			order_by="date desc",
-		)
-		if rate:
-			return float(rate)
-		else:
+		date = str(getdate(date))
+		key = f"{from_currency}|{to_currency}|{date}"
+		local_rates = frappe.local.cache.setdefault(CONVERSION_RATE_CACHE_KEY, {})
+		if key in local_rates:
+			return local_rates[key]
+
+		ttl = _get_conversion_rate_cache_ttl()
+		redis_key = f"{CONVERSION_RATE_CACHE_KEY}|{key}"
+		if ttl:
+			rate = frappe.cache().get_value(redis_key)
+			if rate is not None:
+				local_rates[key] = rate
+				return rate
+
+		rate = _fetch_conversion_rate(from_currency, to_currency, date)
+		if rate is None:
 			frappe.log_error(
 				f"Currency conversion rate not found: {from_currency} to {to_currency} on {date}"
 			)
+			# Aynı istekte tekrar tekrar log yazmamak için sadece bellekte tut
+			local_rates[key] = 1.0
 			return 1.0
+
+		local_rates[key] = rate
+		if ttl:
+			frappe.cache().set_value(redis_key, rate, expires_in_sec=ttl)
+		return rate
 	except Exception as e:
 		frappe.log_error(f"Currency conversion error: {str(e)}")
 		return 1.0
 
 
-def _get_item_price_from_agreements(
-	customer: str, item_code: str, posting_date
-) -> Optional[Dict[str, Any]]:
+def clear_conversion_rate_cache(doc=None, method=None):
+	"""Currency Exchange kaydı değiştiğinde kur cache'ini temizle.
+
+	Yeni bir kur, kendi tarihinden sonraki tüm tarihler için sonucu değiştirebilir;
+	bu yüzden tüm anahtarlar silinir.
+	"""
+	frappe.local.cache.pop(CONVERSION_RATE_CACHE_KEY, None)
+	frappe.cache().delete_keys(CONVERSION_RATE_CACHE_KEY)
+
+
+def _get_item_prices_from_agreements(
+	customer: str, item_codes: List[str], posting_date
+) -> Dict[str, Dict[str, Any]]:
+	"""Müşteri + ürün listesi için geçerli anlaşma kalemlerini getirir.
+
+	Anlaşma satırları ürün → anlaşma index'inden okunur (eksikler tek sorguda
+	yüklenir). Sadece submitted anlaşmalar fiyat verir (taslak/iptal hariç); her ürün
+	için en son başlayan (valid_from desc) anlaşma kazanır.
+
+	Returns:
+		dict: {item_code: {"agreement", "supplier", "item_code", "price_list_rate",
+		"currency", "valid_from", "valid_to"}}
+	"""
+	item_codes = list({code for code in item_codes if code})
+	if not customer or not item_codes:
+		return {}
+
+	posting_date = getdate(posting_date)
+	result = {}
+	for item_code, entries in get_item_agreements(item_codes).items():
+		candidates = [
+			entry
+			for entry in entries
+			if entry.docstatus == 1
+			and entry.customer == customer
+			and (not entry.valid_from or getdate(entry.valid_from) <= posting_date)
+			and (not entry.valid_to or getdate(entry.valid_to) >= posting_date)
+		]
+		if candidates:
+			result[item_code] = max(
+				candidates, key=lambda e: getdate(e.valid_from) if e.valid_from else date.min
+			)
+	return result
+
+
+def _get_item_price_from_agreements(customer: str, item_code: str, posting_date) -> Optional[Dict[str, Any]]:
 	# Müşteri + ürün için geçerli anlaşma kalemini getirir
-	rows = frappe.db.sql(
-		"""
-		select ag.name as agreement,
-		       ag.supplier,
-		       ai.item_code,
-		       ai.price_list_rate,
-		       ai.currency,
-		       ag.valid_from,
-		       ag.valid_to
-		  from `tabAgreement` ag
-		  join `tabAgreement Item` ai on ai.parent = ag.name
-		 where ag.customer = %s
-		   and ai.item_code = %s
-		   and ifnull(ag.valid_from, '0001-01-01') <= %s
-		   and ifnull(ag.valid_to, '9999-12-31') >= %s
-		 order by ag.valid_from desc
-		 limit 1
-		""",
-		(customer, item_code, posting_date, posting_date),
-		as_dict=True,
-	)
-	return rows[0] if rows else None
+	return _get_item_prices_from_agreements(customer, [item_code], posting_date).get(item_code)
+
+
+AGREEMENT_PRICE_CACHE_KEY = "culinary_agreement_price"
+AGREEMENT_PRICE_CACHE_HITS_KEY = "culinary_agreement_price_hits"
+AGREEMENT_PRICE_CACHE_MISSES_KEY = "culinary_agreement_price_misses"
+# Anlaşması olmayan ürünler de cache'lenir, aksi halde her seçimde SQL çalışır
+_NO_AGREEMENT = "__no_agreement__"
+
+
+def _get_agreement_price_cache_ttl() -> int:
+	"""Müşteri bazlı fiyat index'inin Redis TTL süresi (saniye, varsayılan 1 gün)."""
+	return cint(frappe.conf.get("culinary_agreement_price_cache_ttl") or 86400)
+
+
+def _agreement_price_cache_name(customer: str, date_bucket: str = "") -> str:
+	"""Müşteri + gün başına bir hash (alan: item_code); eski günler TTL ile düşer."""
+	return f"{AGREEMENT_PRICE_CACHE_KEY}|{customer}|{date_bucket}"
+
+
+def _store_agreement_prices(
+	customer: str, item_codes: List[str], date_bucket: str
+) -> Dict[str, Dict[str, Any]]:
+	"""Verilen ürünleri DB'den çözüp (customer, gün) index'ine tek HSET ile yazar."""
+	resolved = _get_item_prices_from_agreements(customer, item_codes, date_bucket)
+	cache = frappe.cache()
+	name = _agreement_price_cache_name(customer, date_bucket)
+	hset_many(name, {item_code: resolved.get(item_code) or _NO_AGREEMENT for item_code in item_codes})
+	cache.expire(cache.make_key(name), _get_agreement_price_cache_ttl())
+	return resolved
+
+
+def _record_agreement_price_cache_stats(hits: int, misses: int):
+	try:
+		cache = frappe.cache()
+		if hits:
+			cache.incrby(cache.make_key(AGREEMENT_PRICE_CACHE_HITS_KEY), hits)
+		if misses:
+			cache.incrby(cache.make_key(AGREEMENT_PRICE_CACHE_MISSES_KEY), misses)
+	except Exception:
+		# İstatistik yazılamaması fiyat getirmeyi engellememeli
+		pass
+
+
+def _get_cached_agreement_prices(
+	customer: str, item_codes: List[str], posting_date
+) -> Dict[str, Dict[str, Any]]:
+	"""Anlaşma fiyatlarını Redis index'inden okur, eksik olanları tek sorguda tamamlar.
+
+	Index (customer, gün) anahtarlı hash'lerdir, alanlar ürün kodudur; tüm ürünler tek
+	HMGET ile okunur. Anlaşma submit/cancel ve fiyat senkronizasyonu müşterinin
+	index'ini yeniden kurar.
+	"""
+	item_codes = list({code for code in item_codes if code})
+	if not customer or not item_codes:
+		return {}
+
+	date_bucket = str(getdate(posting_date))
+	cached = hmget(_agreement_price_cache_name(customer, date_bucket), item_codes)
+
+	result = {item_code: info for item_code, info in cached.items() if info != _NO_AGREEMENT}
+	missing = [item_code for item_code in item_codes if item_code not in cached]
+
+	_record_agreement_price_cache_stats(len(item_codes) - len(missing), len(missing))
+
+	if missing:
+		result.update(_store_agreement_prices(customer, missing, date_bucket))
+	return result
+
+
+def rebuild_agreement_price_cache(doc, method=None):
+	"""Agreement submit/cancel/fiyat senkronizasyonunda müşterinin fiyat index'ini yeniden kur.
+
+	Müşterinin tüm günlere ait kayıtları silinir, anlaşmadaki ürünler bugünün tarihi
+	için yeniden hesaplanır (ilk seçimde cache miss olmasın).
+	"""
+	if not doc.customer:
+		return
+	try:
+		frappe.cache().delete_keys(_agreement_price_cache_name(doc.customer))
+		item_codes = [item.item_code for item in doc.get("agreement_items") or [] if item.item_code]
+		if item_codes:
+			_store_agreement_prices(doc.customer, item_codes, str(getdate(nowdate())))
+	except Exception as e:
+		frappe.log_error(
+			message=f"Agreement price cache rebuild failed for {doc.name}: {str(e)}",
+			title="Agreement Price Cache - Rebuild Failed",
+		)
+
+
+@frappe.whitelist()
+def get_agreement_price_cache_stats() -> Dict[str, Any]:
+	"""Anlaşma fiyat index'inin hit/miss sayaçlarını döndürür."""
+	frappe.only_for("System Manager")
+
+	cache = frappe.cache()
+	hits = cint(cache.get(cache.make_key(AGREEMENT_PRICE_CACHE_HITS_KEY)))
+	misses = cint(cache.get(cache.make_key(AGREEMENT_PRICE_CACHE_MISSES_KEY)))
+	total = hits + misses
+	return {
+		"hits": hits,
+		"misses": misses,
+		"hit_ratio": round(hits / total, 4) if total else 0,
+	}
+
+
+def _get_agreement_price_response(info: Dict[str, Any], so_currency: str, posting_date) -> Dict[str, Any]:
+	"""Anlaşma satırını Sales Order para birimine çevirip client yanıtına dönüştürür."""
+	agreement_currency = info["currency"]
+	agreement_rate = info["price_list_rate"]
+
+	if agreement_currency != so_currency:
+		conversion_rate = get_conversion_rate(agreement_currency, so_currency, posting_date)
+		converted_rate = agreement_rate * conversion_rate
+	else:
+		converted_rate = agreement_rate
+
+	return {
+		"price_list_rate": converted_rate,
+		"currency": so_currency,
+		"supplier": info["supplier"],
+		"rate_locked": 1,
+	}
 
 
 @frappe.whitelist()
@@ -67,29 +257,37 @@ def get_item_price_from_agreement(
 	Client-side'dan çağrılır - item seçildiğinde fiyatı otomatik olarak getirir
 	"""
 	try:
-		info = _get_item_price_from_agreements(customer, item_code, posting_date)
+		info = _get_cached_agreement_prices(customer, [item_code], posting_date).get(item_code)
 		if not info:
 			return {}
 
-		# Currency conversion yap
-		agreement_currency = info["currency"]
-		agreement_rate = info["price_list_rate"]
+		return _get_agreement_price_response(info, so_currency, posting_date)
+	except Exception as e:
+		frappe.log_error(f"get_item_price_from_agreement error: {str(e)}")
+		return {}
 
-		if agreement_currency != so_currency:
-			conversion_rate = get_conversion_rate(
-				agreement_currency, so_currency, posting_date
-			)
-			converted_rate = agreement_rate * conversion_rate
-		else:
-			converted_rate = agreement_rate
 
+@frappe.whitelist()
+def get_item_prices_from_agreement(
+	customer: str, item_codes, posting_date: str, so_currency: str = "EUR"
+) -> Dict[str, Dict[str, Any]]:
+	"""
+	Client-side'dan çağrılır - çok sayıda satır eklendiğinde (WooCommerce siparişi,
+	yapıştırılan liste) tüm fiyatları tek istekte getirir.
+
+	Returns:
+		dict: {item_code: {"price_list_rate", "currency", "supplier", "rate_locked"}}
+		Anlaşması olmayan ürünler yanıtta yer almaz.
+	"""
+	try:
+		item_codes = frappe.parse_json(item_codes) or []
+		infos = _get_cached_agreement_prices(customer, item_codes, posting_date)
 		return {
-			"price_list_rate": converted_rate,
-			"currency": so_currency,
-			"supplier": info["supplier"],
+			item_code: _get_agreement_price_response(info, so_currency, posting_date)
+			for item_code, info in infos.items()
 		}
 	except Exception as e:
-		frappe.log_error(f"get_item_price_from_agreement error: {str(e)}")
+		frappe.log_error(f"get_item_prices_from_agreement error: {str(e)}")
 		return {}
 
 
@@ -98,16 +296,19 @@ def validate_sales_order(doc, method=None):
 		return
 
 	# Validate each item against agreements and set price
-	posting_date = (
-		doc.get("transaction_date") or doc.get("delivery_date") or frappe.utils.nowdate()
-	)
+	posting_date = doc.get("transaction_date") or doc.get("delivery_date") or frappe.utils.nowdate()
 
 	# Sales Order'ın currency'sini al
 	so_currency = doc.currency or frappe.get_default("currency") or "EUR"
 
+	# Tüm satırlar için anlaşma fiyatlarını tek sorguda çöz
+	agreement_prices = _get_item_prices_from_agreements(
+		doc.customer, [item.item_code for item in doc.items], posting_date
+	)
+
 	for item in doc.items:
-		info = _get_item_price_from_agreements(doc.customer, item.item_code, posting_date)
-		
+		info = agreement_prices.get(item.item_code)
+
 		# Agreement yoksa standart fiyatlandırma kullanılsın
 		if not info:
 			continue
@@ -130,9 +331,7 @@ def validate_sales_order(doc, method=None):
 			valid_to_obj = getdate(valid_to)
 			if posting_date_obj > valid_to_obj:
 				frappe.throw(
-					_("Item {0} Agreement has expired. Valid until: {1}").format(
-						item.item_code, valid_to
-					)
+					_("Item {0} Agreement has expired. Valid until: {1}").format(item.item_code, valid_to)
 				)
 
 		# Currency conversion yap
@@ -140,9 +339,7 @@ def validate_sales_order(doc, method=None):
 		agreement_rate = info["price_list_rate"]
 
 		if agreement_currency != so_currency:
-			conversion_rate = get_conversion_rate(
-				agreement_currency, so_currency, posting_date
-			)
+			conversion_rate = get_conversion_rate(agreement_currency, so_currency, posting_date)
 			converted_rate = agreement_rate * conversion_rate
 		else:
 			converted_rate = agreement_rate
@@ -5,11 +5,22 @@ from frappe.utils import flt
 from frappe.model.document import Document
 from frappe import whitelist
 
+from culinary_order_management.culinary_order_management.split_trace import (
+    TRACE_LEVELS,
+    current_trace,
+    split_trace,
+)
+
+COMPANY_RESOLUTION_CACHE_KEY = "culinary_company_resolution"
+COMPANY_NAME_SUFFIXES = ("", " Company", " GmbH", " AG", " Ltd", " Limited")
+
 
 def split_order_to_companies(doc, method):
     """
     Satış siparişi submit edildikten sonra ürünlere göre marka/mutfak şirketlerine ayrıştır
     
+    Adımlar split_trace ile izlenir (varsayılan kapalı, bkz. split_trace.py).
+    
     Args:
         doc: Sales Order doc
         method: Event method name (after_submit)
@@ -19,79 +30,60 @@ def split_order_to_companies(doc, method):
         return
     
     try:
-        # Debug: Başlangıç bilgisi
-        frappe.log_error(f"Split Order başlıyor - SO: {doc.name}, Items: {len(doc.items)}", "Split Order Debug")
-        
-        # Teslimat adresi (varsa)
+        with split_trace(doc.name) as trace:
+            _split_order_to_companies(doc, trace)
+    except Exception as e:
+        frappe.log_error(f"Sipariş ayrıştırma hatası: {str(e)}", "Culinary Order Split Error")
+
+
+def _split_order_to_companies(doc, trace):
+    trace.info("start", items=len(doc.items))
+    
+    # Teslimat adresi (varsa)
+    with trace.step("address"):
         customer_address = get_customer_delivery_address(doc.customer, doc.shipping_address_name)
-        
-        # Ürünleri gruplandır (mutfak/supplier)
-        kitchen_items, supplier_items = group_items_by_type(doc.items)
-        
-        # Debug: Gruplama sonucu
-        print(f"🔵 Gruplama - Mutfak: {len(kitchen_items)}, Supplier: {len(supplier_items)}")
-        frappe.log_error(f"🔵 Gruplama - Mutfak: {len(kitchen_items)}, Supplier: {len(supplier_items)}", "Split Order Debug")
-        
-        # Debug: Item detayları
-        for i, item in enumerate(doc.items):
-            is_kitchen = is_kitchen_item(item.item_code)
-            supplier = get_item_brand(item.item_code)  # Artık supplier döndürüyor
-            print(f"🔵 Item {i+1}: {item.item_code} - Kitchen: {is_kitchen}, Supplier: {supplier}")
-            frappe.log_error(f"🔵 Item {i+1}: {item.item_code} - Kitchen: {is_kitchen}, Supplier: {supplier}", "Split Order Debug")
-        
-        # Mutfak siparişlerini oluştur
-        if kitchen_items:
-            print(f"🟢 Mutfak items var: {len(kitchen_items)}")
-            frappe.log_error(f"🟢 Mutfak items var: {len(kitchen_items)}", "Split Order Debug")
-            
-            customer_pin = getattr(customer_address, "pincode", None)
-            print(f"🔵 Customer PIN: {customer_pin}")
-            frappe.log_error(f"🔵 Customer PIN: {customer_pin}", "Split Order Debug")
-            
+    
+    # Ürünleri gruplandır (mutfak/supplier) - tüm satırlar için tek sorgu
+    with trace.step("classify"):
+        classification = get_item_classification([item.item_code for item in doc.items])
+        kitchen_items, supplier_items = group_items_by_type(doc.items, classification)
+    trace.info("grouped", kitchen=len(kitchen_items), suppliers=len(supplier_items))
+    
+    if trace.level >= TRACE_LEVELS["debug"]:
+        trace.debug("items", classification=classification)
+    
+    # Mutfak siparişlerini oluştur
+    if kitchen_items:
+        customer_pin = getattr(customer_address, "pincode", None)
+        with trace.step("route_kitchen"):
             kitchen_company = find_nearest_kitchen(customer_pin, doc.customer)
-            print(f"🔵 Kitchen Company: {kitchen_company}")
-            frappe.log_error(f"🔵 Kitchen Company: {kitchen_company}", "Split Order Debug")
-            
-            if kitchen_company and not child_order_exists(doc, kitchen_company):
-                print(f"🟢 Creating Kitchen SO for: {kitchen_company}")
-                frappe.log_error(f"🟢 Creating Kitchen SO for: {kitchen_company}", "Split Order Debug")
+        trace.info("kitchen", pincode=customer_pin, company=kitchen_company)
+        
+        if kitchen_company and not child_order_exists(doc, kitchen_company):
+            with trace.step("create_orders"):
                 create_company_sales_order(doc, kitchen_items, kitchen_company, "kitchen")
-            else:
-                print(f"❌ Kitchen SO not created - Company: {kitchen_company}, Exists: {child_order_exists(doc, kitchen_company) if kitchen_company else 'N/A'}")
-                frappe.log_error(f"❌ Kitchen SO not created - Company: {kitchen_company}, Exists: {child_order_exists(doc, kitchen_company) if kitchen_company else 'N/A'}", "Split Order Debug")
         else:
-            print(f"❌ No kitchen items found")
-            frappe.log_error(f"❌ No kitchen items found", "Split Order Debug")
-        
-        # Supplier siparişlerini oluştur
-        print(f"🔵 Processing {len(supplier_items)} supplier groups")
-        frappe.log_error(f"🔵 Processing {len(supplier_items)} supplier groups", "Split Order Debug")
-        
-        for supplier_name, items in supplier_items.items():
-            print(f"🔵 Processing supplier: {supplier_name} with {len(items)} items")
-            frappe.log_error(f"🔵 Processing supplier: {supplier_name} with {len(items)} items", "Split Order Debug")
-            
+            trace.info("kitchen_skipped", company=kitchen_company)
+    
+    # Supplier siparişlerini oluştur
+    for supplier_name, items in supplier_items.items():
+        with trace.step("resolve_company"):
             supplier_company = get_brand_company(supplier_name)
-            print(f"🔵 Supplier Company for {supplier_name}: {supplier_company}")
-            frappe.log_error(f"🔵 Supplier Company for {supplier_name}: {supplier_company}", "Split Order Debug")
-            
-            if supplier_company and not child_order_exists(doc, supplier_company):
-                print(f"🟢 Creating Supplier SO for: {supplier_company}")
-                frappe.log_error(f"🟢 Creating Supplier SO for: {supplier_company}", "Split Order Debug")
-                create_company_sales_order(doc, items, supplier_company, supplier_name)
-            else:
-                print(f"❌ Supplier SO not created for {supplier_name} - Company: {supplier_company}, Exists: {child_order_exists(doc, supplier_company) if supplier_company else 'N/A'}")
-                frappe.log_error(f"❌ Supplier SO not created for {supplier_name} - Company: {supplier_company}, Exists: {child_order_exists(doc, supplier_company) if supplier_company else 'N/A'}", "Split Order Debug")
+        trace.info("supplier", supplier=supplier_name, items=len(items), company=supplier_company)
         
-        # Proforma oluştur
-        try:
-            from culinary_order_management.culinary_order_management.proforma_hooks import create_proforma_invoice
+        if supplier_company and not child_order_exists(doc, supplier_company):
+            with trace.step("create_orders"):
+                create_company_sales_order(doc, items, supplier_company, supplier_name)
+        else:
+            trace.info("supplier_skipped", supplier=supplier_name, company=supplier_company)
+    
+    # Proforma oluştur
+    try:
+        from culinary_order_management.culinary_order_management.proforma_hooks import create_proforma_invoice
+        with trace.step("proforma"):
             create_proforma_invoice(doc.name)
-        except Exception as proforma_error:
-            frappe.log_error(f"Proforma oluşturma hatası: {str(proforma_error)}", "Proforma Creation Error")
-        
-    except Exception as e:
-        frappe.log_error(f"Sipariş ayrıştırma hatası: {str(e)}", "Culinary Order Split Error")
+    except Exception as proforma_error:
+        frappe.log_error(f"Proforma oluşturma hatası: {str(proforma_error)}", "Proforma Creation Error")
 
 
 @whitelist()
@@ -100,39 +92,20 @@ def split_order_to_companies_api(name: str):
     Doc submit edilmiş olmalı.
     """
     try:
-        print(f"🔵 API Called - SO Name: {name}")
-        frappe.log_error(f"🔵 API Called - SO Name: {name}", "Split Order API Debug")
-        
         doc = frappe.get_doc("Sales Order", name)
-        print(f"🔵 SO Loaded - Status: {doc.docstatus}, Company: {doc.company}, Items: {len(doc.items)}")
-        frappe.log_error(f"🔵 SO Loaded - Status: {doc.docstatus}, Company: {doc.company}, Items: {len(doc.items)}", "Split Order API Debug")
         
         if doc.docstatus != 1:
-            error_msg = "Sipariş onaylanmış olmalı (Submitted)."
-            print(f"❌ Error: {error_msg}")
-            frappe.log_error(f"❌ Error: {error_msg}", "Split Order API Debug")
-            return {"ok": False, "error": error_msg}
+            return {"ok": False, "error": "Sipariş onaylanmış olmalı (Submitted)."}
         
         if doc.company != "Culinary":
-            error_msg = "Sadece Culinary şirketi siparişleri bölünebilir."
-            print(f"❌ Error: {error_msg}")
-            frappe.log_error(f"❌ Error: {error_msg}", "Split Order API Debug")
-            return {"ok": False, "error": error_msg}
-        
-        print(f"🟢 Starting split_order_to_companies for: {name}")
-        frappe.log_error(f"🟢 Starting split_order_to_companies for: {name}", "Split Order API Debug")
+            return {"ok": False, "error": "Sadece Culinary şirketi siparişleri bölünebilir."}
         
         split_order_to_companies(doc, "after_submit")
         
-        print(f"✅ Split Order Completed for: {name}")
-        frappe.log_error(f"✅ Split Order Completed for: {name}", "Split Order API Debug")
-        
         return {"ok": True, "message": "Sipariş başarıyla ayrıştırıldı."}
         
     except Exception as e:
-        error_msg = f"API Exception: {str(e)}"
-        print(f"💥 {error_msg}")
-        frappe.log_error(f"💥 {error_msg}", "Split Order API Debug")
+        frappe.log_error(f"API Exception: {str(e)}", "Split Order API Error")
         return {"ok": False, "error": str(e)}
 
 
@@ -151,17 +124,57 @@ def get_customer_delivery_address(customer, shipping_address_name):
     return None
 
 
-def group_items_by_type(items):
-    """Ürünleri mutfak/supplier gruplarına ayır"""
+def get_item_classification(item_codes):
+    """Siparişteki tüm ürünler için mutfak bayrağı ve birincil tedarikçi (tek sorgu).
+
+    Birincil tedarikçi: Item Supplier tablosundaki ilk satır (en küçük idx).
+
+    Returns:
+        dict: {item_code: {"is_kitchen_item": bool, "supplier": str | None}}
+    """
+    item_codes = list({code for code in item_codes if code})
+    if not item_codes:
+        return {}
+
+    rows = frappe.db.sql(
+        """
+        select i.name, i.is_kitchen_item, s.supplier
+          from `tabItem` i
+          left join (
+                select parent, supplier,
+                       row_number() over (partition by parent order by idx) as rn
+                  from `tabItem Supplier`
+                 where parenttype = 'Item' and parent in %(item_codes)s
+          ) s on s.parent = i.name and s.rn = 1
+         where i.name in %(item_codes)s
+        """,
+        {"item_codes": item_codes},
+        as_dict=True,
+    )
+    return {
+        row.name: {"is_kitchen_item": bool(row.is_kitchen_item), "supplier": row.supplier}
+        for row in rows
+    }
+
+
+def group_items_by_type(items, classification=None):
+    """Ürünleri mutfak/supplier gruplarına ayır
+
+    classification verilmezse get_item_classification ile tek sorguda hesaplanır.
+    """
+    if classification is None:
+        classification = get_item_classification([item.item_code for item in items])
+
     kitchen_items = []
     supplier_items = {}
     
     for item in items:
-        if is_kitchen_item(item.item_code):
+        info = classification.get(item.item_code) or {}
+        if info.get("is_kitchen_item"):
             kitchen_items.append(item)
         else:
             # Supplier bilgisini al
-            supplier = get_item_brand(item.item_code)  # Artık supplier döndürüyor
+            supplier = info.get("supplier")
             if supplier:
                 if supplier not in supplier_items:
                     supplier_items[supplier] = []
@@ -187,52 +200,30 @@ def get_item_brand(item_code):
         )
         
         if supplier_items:
-            supplier = supplier_items[0].supplier
-            print(f"🔵 Item {item_code} supplier: {supplier}")
-            frappe.log_error(f"🔵 Item {item_code} supplier: {supplier}", "Split Order Debug")
-            return supplier
+            return supplier_items[0].supplier
         
-        print(f"❌ No supplier found for item: {item_code}")
-        frappe.log_error(f"❌ No supplier found for item: {item_code}", "Split Order Debug")
+        current_trace().debug("no_supplier", item_code=item_code)
         return None
         
     except Exception as e:
-        print(f"💥 Error getting supplier for item {item_code}: {str(e)}")
-        frappe.log_error(f"💥 Error getting supplier for item {item_code}: {str(e)}", "Split Order Debug")
+        frappe.log_error(f"Error getting supplier for item {item_code}: {str(e)}", "Split Order Error")
         return None
 
 
 def find_nearest_kitchen(customer_pincode, customer_name):
     """Müşteri posta koduna göre mutfak şirketini bul.
 
-    Basit kural: Şirket adı "Mutfak -" ile başlıyorsa ve varsayılan adres posta kodu eşitse eşleşir.
-    Eşleşme yoksa ilk uygun mutfak şirketi geri döner.
+    Cache'lenmiş posta kodu → mutfak index'i kullanılır (bkz. kitchen_routing.py):
+    tam eşleşme, yoksa yapılandırılabilir önek fallback'i.
     """
     if not customer_pincode:
         return None
 
-    from frappe.contacts.doctype.address.address import get_default_address
+    from culinary_order_management.culinary_order_management.kitchen_routing import route_kitchen
 
-    kitchen_companies = frappe.get_all(
-        "Company",
-        filters={"name": ["like", "Mutfak - %"]},
-        pluck="name",
-    )
-
-    # Tam posta kodu eşleşmesi
-    for company in kitchen_companies:
-        addr_name = get_default_address("Company", company)
-        if not addr_name:
-            continue
-        addr = frappe.db.get_value(
-            "Address", addr_name, ["pincode"], as_dict=True
-        )
-        if addr and addr.get("pincode") == customer_pincode:
-            return company
-
-    # Fallback: ilk mutfak şirketi
-    if kitchen_companies:
-        return kitchen_companies[0]
+    company = route_kitchen(customer_pincode)
+    if company:
+        return company
 
     frappe.log_error(
         f"Mutfak bulunamadı - müşteri: {customer_name}, posta kodu: {customer_pincode}",
@@ -241,41 +232,80 @@ def find_nearest_kitchen(customer_pincode, customer_name):
     return None
 
 
+def build_company_resolution() -> dict:
+    """Supplier → company eşleşmesi ve company → SO prefix'i için map'leri oluştur.
+
+    Returns:
+        dict: {
+            "suppliers": {supplier: company},  # Supplier.custom_company (açık eşleşme)
+            "prefixes": {company: prefix},     # tüm şirketler, abbr'den
+        }
+    """
+    suppliers = {
+        row.name: row.custom_company
+        for row in frappe.get_all(
+            "Supplier",
+            filters={"custom_company": ["is", "set"]},
+            fields=["name", "custom_company"],
+        )
+    }
+    prefixes = {
+        row.name: _slugify_prefix(row.abbr or row.name)
+        for row in frappe.get_all("Company", fields=["name", "abbr"])
+    }
+    return {"suppliers": suppliers, "prefixes": prefixes}
+
+
+def get_company_resolution() -> dict:
+    """Company resolution map'leri (istek içi → Redis → yeniden oluştur)."""
+    resolution = frappe.local.cache.get(COMPANY_RESOLUTION_CACHE_KEY)
+    if resolution is not None:
+        return resolution
+
+    resolution = frappe.cache().get_value(COMPANY_RESOLUTION_CACHE_KEY)
+    if resolution is None:
+        resolution = build_company_resolution()
+        frappe.cache().set_value(COMPANY_RESOLUTION_CACHE_KEY, resolution)
+
+    frappe.local.cache[COMPANY_RESOLUTION_CACHE_KEY] = resolution
+    return resolution
+
+
+def clear_company_resolution(doc=None, method=None, *args):
+    """Company/Supplier değiştiğinde map'leri sil (bir sonraki split'te yeniden kurulur)."""
+    if doc and doc.doctype == "Supplier" and method == "on_update" and not doc.has_value_changed("custom_company"):
+        return
+
+    frappe.local.cache.pop(COMPANY_RESOLUTION_CACHE_KEY, None)
+    frappe.cache().delete_value(COMPANY_RESOLUTION_CACHE_KEY)
+
+
 def get_brand_company(supplier_name):
-    """Supplier için varsayılan şirketi getir"""
+    """Supplier için varsayılan şirketi getir.
+
+    Önce Supplier.custom_company; boşsa supplier adı ve "Company/GmbH/AG/Ltd/Limited"
+    varyasyonları cache'lenmiş şirket listesinde aranır.
+    """
     try:
-        print(f"🔵 Getting company for supplier: {supplier_name}")
-        frappe.log_error(f"🔵 Getting company for supplier: {supplier_name}", "Split Order Debug")
-        
-        # 1) Supplier adı ile eşleşen Company var mı?
-        if frappe.db.exists("Company", supplier_name):
-            print(f"🟢 Company exists with supplier name: {supplier_name}")
-            frappe.log_error(f"🟢 Company exists with supplier name: {supplier_name}", "Split Order Debug")
-            return supplier_name
-        
-        # 2) Supplier adını Company adıyla eşleştir (ör: "Edel Weiss" -> "Edel Weiss Company")
-        company_variations = [
-            supplier_name,
-            f"{supplier_name} Company",
-            f"{supplier_name} GmbH",
-            f"{supplier_name} AG",
-            f"{supplier_name} Ltd",
-            f"{supplier_name} Limited"
-        ]
-        
-        for variation in company_variations:
-            if frappe.db.exists("Company", variation):
-                print(f"🟢 Company found with variation: {variation}")
-                frappe.log_error(f"🟢 Company found with variation: {variation}", "Split Order Debug")
+        resolution = get_company_resolution()
+
+        company = resolution["suppliers"].get(supplier_name)
+        if company:
+            current_trace().debug("company_mapping", supplier=supplier_name, company=company)
+            return company
+
+        # Supplier adını Company adıyla eşleştir (ör: "Edel Weiss" -> "Edel Weiss Company")
+        for suffix in COMPANY_NAME_SUFFIXES:
+            variation = f"{supplier_name}{suffix}"
+            if variation in resolution["prefixes"]:
+                current_trace().debug("company_variation", supplier=supplier_name, company=variation)
                 return variation
-        
-        print(f"❌ No company found for supplier: {supplier_name}")
-        frappe.log_error(f"❌ No company found for supplier: {supplier_name}", "Split Order Debug")
+
+        current_trace().info("no_company", supplier=supplier_name)
         return None
-        
+
     except Exception as e:
-        print(f"💥 Error getting company for supplier {supplier_name}: {str(e)}")
-        frappe.log_error(f"💥 Error getting company for supplier {supplier_name}: {str(e)}", "Split Order Debug")
+        frappe.log_error(f"Error getting company for supplier {supplier_name}: {str(e)}", "Split Order Error")
         return None
 
 
@@ -335,44 +365,30 @@ def _rename_sales_order_with_prefix(new_so, target_company):
 
 def create_company_sales_order(parent_so, items, target_company, order_type):
     """Hedef şirket için Sales Order oluştur"""
+    trace = current_trace()
     try:
-        print(f"🟢 Creating Company SO - Target: {target_company}, Items: {len(items)}, Type: {order_type}")
-        frappe.log_error(f"🟢 Creating Company SO - Target: {target_company}, Items: {len(items)}, Type: {order_type}", "Split Order Debug")
-        
         # SO oluştur ve temel bilgileri doldur
         new_so = _prepare_sales_order_base(parent_so, target_company)
-        print(f"🔵 SO Base prepared: {new_so.name}")
-        frappe.log_error(f"🔵 SO Base prepared: {new_so.name}", "Split Order Debug")
         
         # Item'ları kopyala
         _copy_items_to_sales_order(new_so, items)
-        print(f"🔵 Items copied: {len(new_so.items)}")
-        frappe.log_error(f"🔵 Items copied: {len(new_so.items)}", "Split Order Debug")
         
         # Kaydet
         new_so.insert(ignore_permissions=True)
-        print(f"🔵 SO Inserted: {new_so.name}")
-        frappe.log_error(f"🔵 SO Inserted: {new_so.name}", "Split Order Debug")
         
         # Yeniden adlandır
         _rename_sales_order_with_prefix(new_so, target_company)
-        print(f"🔵 SO Renamed: {new_so.name}")
-        frappe.log_error(f"🔵 SO Renamed: {new_so.name}", "Split Order Debug")
         
         # Vergi/tutarları hesapla ve submit et
         new_so.calculate_taxes_and_totals()
         new_so.submit()
-        print(f"✅ SO Submitted: {new_so.name}")
-        frappe.log_error(f"✅ SO Submitted: {new_so.name}", "Split Order Debug")
         
         # Referans bilgisini kaydet
         frappe.db.set_value("Sales Order", new_so.name, "source_web_so", parent_so.name)
-        print(f"🔵 Reference saved: {new_so.name} -> {parent_so.name}")
-        frappe.log_error(f"🔵 Reference saved: {new_so.name} -> {parent_so.name}", "Split Order Debug")
+        trace.info("created", sales_order=new_so.name, company=target_company, items=len(items), type=order_type)
             
     except Exception as e:
         error_msg = f"Hedef şirket SO oluşturamadı - şirket: {target_company}, hata: {str(e)}"
-        print(f"💥 {error_msg}")
         frappe.log_error(error_msg, "Company SO Creation Error")
         raise
 
@@ -406,13 +422,12 @@ def _slugify_prefix(value: str) -> str:
 def _company_prefix(company_name: str) -> str:
     """Şirket için adlandırma ön eki döndür (Company.abbr varsa onu kullan).
 
-    Her şirket kendi serisini tutar; örn: "MBER-00001".
+    Her şirket kendi serisini tutar; örn: "MBER-00001". Değerler company resolution
+    cache'inden okunur.
     """
-    abbr = None
+    prefix = None
     try:
-        abbr = frappe.db.get_value("Company", company_name, "abbr")
+        prefix = get_company_resolution()["prefixes"].get(company_name)
     except Exception:
-        abbr = None
-    if abbr:
-        return _slugify_prefix(abbr)
-    return _slugify_prefix(company_name)
+        prefix = None
+    return prefix or _slugify_prefix(company_name)
@@ -0,0 +1,120 @@
+"""
+Culinary Order Management - Order split tracing
+
+Sipariş ayrıştırma (split_order_to_companies) adımlarını izlemek için hafif tracing.
+Varsayılan olarak kapalıdır; açıldığında bir split tek bir yapılandırılmış kayıt
+(adım süreleri + olaylar) olarak `culinary_split` log dosyasına yazılır.
+Error Log sadece gerçek hatalar için kullanılır.
+
+site_config:
+	culinary_split_trace_level: "off" (varsayılan) | "info" | "debug"
+	culinary_split_trace_sample_rate: 0.0 - 1.0 (varsayılan 1.0)
+"""
+
+import json
+import random
+import time
+from contextlib import contextmanager
+
+import frappe
+
+TRACE_LEVELS = {"off": 0, "info": 1, "debug": 2}
+TRACE_LOGGER = "culinary_split"
+
+
+def _get_trace_level() -> int:
+	level = frappe.conf.get("culinary_split_trace_level") or "off"
+	return TRACE_LEVELS.get(str(level).lower(), 0)
+
+
+def _get_trace_sample_rate() -> float:
+	rate = frappe.conf.get("culinary_split_trace_sample_rate")
+	return 1.0 if rate is None else float(rate)
+
+
+class SplitTrace:
+	"""Tek bir split için olayları ve adım sürelerini bellekte biriktirir."""
+
+	def __init__(self, name: str, level: int):
+		self.name = name
+		self.level = level
+		self.started = time.perf_counter()
+		self.steps = {}
+		self.events = []
+
+	@property
+	def enabled(self) -> bool:
+		return self.level > 0
+
+	def info(self, message: str, **data):
+		self._add(TRACE_LEVELS["info"], message, data)
+
+	def debug(self, message: str, **data):
+		self._add(TRACE_LEVELS["debug"], message, data)
+
+	def _add(self, level: int, message: str, data: dict):
+		if level <= self.level:
+			self.events.append({"t": self._elapsed_ms(), "msg": message, **data})
+
+	@contextmanager
+	def step(self, name: str):
+		"""Adım süresini ölç; aynı adım birden çok kez çalışırsa süreler toplanır."""
+		if not self.enabled:
+			yield
+			return
+		started = time.perf_counter()
+		try:
+			yield
+		finally:
+			self.steps[name] = round(self.steps.get(name, 0) + (time.perf_counter() - started) * 1000, 2)
+
+	def _elapsed_ms(self) -> float:
+		return round((time.perf_counter() - self.started) * 1000, 2)
+
+	def flush(self, status: str):
+		if not self.enabled:
+			return
+		record = {
+			"sales_order": self.name,
+			"status": status,
+			"total_ms": self._elapsed_ms(),
+			"steps": self.steps,
+			"events": self.events,
+		}
+		frappe.logger(TRACE_LOGGER).info(json.dumps(record, default=str, ensure_ascii=False))
+
+
+_NOOP_TRACE = SplitTrace(None, 0)
+
+
+def current_trace() -> SplitTrace:
+	"""Aktif split trace'i (yoksa hiçbir şey kaydetmeyen trace)."""
+	return getattr(frappe.local, "culinary_split_trace", None) or _NOOP_TRACE
+
+
+@contextmanager
+def split_trace(name: str):
+	"""Bir split için trace başlat; blok sonunda tek kayıt yazılır.
+
+	İç içe çağrılarda (API -> split_order_to_companies) mevcut trace kullanılır.
+	"""
+	active = getattr(frappe.local, "culinary_split_trace", None)
+	if active:
+		yield active
+		return
+
+	level = _get_trace_level()
+	if level and random.random() >= _get_trace_sample_rate():
+		level = 0
+
+	trace = SplitTrace(name, level)
+	frappe.local.culinary_split_trace = trace
+	status = "ok"
+	try:
+		yield trace
+	except Exception:
+		status = "error"
+		raise
+	finally:
+		frappe.local.culinary_split_trace = None
+		trace.flush(status)
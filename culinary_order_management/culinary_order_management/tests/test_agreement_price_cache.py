@@ -0,0 +1,139 @@
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import add_days, flt, nowdate
+
+from culinary_order_management.culinary_order_management.sales_order import (
+	_agreement_price_cache_name,
+	get_item_prices_from_agreement,
+)
+
+
+def _leaf(doctype: str) -> str:
+	return frappe.db.get_value(doctype, {"is_group": 0}, "name")
+
+
+def _currency() -> str:
+	return frappe.db.get_value("Price List", "Standard Selling", "currency")
+
+
+def _make_customer() -> str:
+	return (
+		frappe.get_doc(
+			{
+				"doctype": "Customer",
+				"customer_name": f"_Test Price Cache Customer {frappe.generate_hash(length=8)}",
+				"customer_group": _leaf("Customer Group"),
+				"territory": _leaf("Territory"),
+			}
+		)
+		.insert(ignore_permissions=True)
+		.name
+	)
+
+
+def _make_item() -> str:
+	item_code = f"_Test Price Cache Item {frappe.generate_hash(length=8)}"
+	frappe.get_doc(
+		{
+			"doctype": "Item",
+			"item_code": item_code,
+			"item_group": _leaf("Item Group"),
+			"stock_uom": "Nos",
+			"is_stock_item": 0,
+		}
+	).insert(ignore_permissions=True)
+	frappe.get_doc(
+		{
+			"doctype": "Item Price",
+			"price_list": "Standard Selling",
+			"item_code": item_code,
+			"price_list_rate": 100,
+		}
+	).insert(ignore_permissions=True)
+	return item_code
+
+
+def _make_agreement(customer: str, item_code: str, price_list_rate: float, valid_from=None):
+	supplier = frappe.get_doc(
+		{
+			"doctype": "Supplier",
+			"supplier_name": f"_Test Price Cache Supplier {frappe.generate_hash(length=8)}",
+			"supplier_group": _leaf("Supplier Group"),
+		}
+	).insert(ignore_permissions=True)
+	agreement = frappe.get_doc(
+		{
+			"doctype": "Agreement",
+			"customer": customer,
+			"supplier": supplier.name,
+			"valid_from": valid_from or add_days(nowdate(), -1),
+			"valid_to": add_days(nowdate(), 30),
+			"agreement_items": [
+				{"item_code": item_code, "price_list_rate": price_list_rate, "currency": _currency()}
+			],
+		}
+	)
+	agreement.insert(ignore_permissions=True)
+	agreement.submit()
+	return agreement
+
+
+class TestAgreementPriceCache(FrappeTestCase):
+	def setUp(self):
+		self.customer = _make_customer()
+		self.item_code = _make_item()
+		# Redis runner'ın rollback'ine dahil değil
+		self.addCleanup(frappe.cache().delete_keys, _agreement_price_cache_name(self.customer))
+
+	def _prices(self, customer: str) -> dict:
+		return get_item_prices_from_agreement(customer, [self.item_code], nowdate(), _currency())
+
+	def _cached(self, customer: str, date_bucket=None):
+		return frappe.cache().hget(
+			_agreement_price_cache_name(customer, date_bucket or nowdate()), self.item_code
+		)
+
+	def test_submit_replaces_cached_no_agreement_entry(self):
+		# Anlaşma yokken sonuç (boş) da cache'lenir
+		self.assertEqual(self._prices(self.customer), {})
+		self.assertIsNotNone(self._cached(self.customer))
+
+		_make_agreement(self.customer, self.item_code, 90)
+		frappe.db.after_commit.run()
+
+		prices = self._prices(self.customer)
+		self.assertEqual(flt(prices[self.item_code]["price_list_rate"]), 90)
+		self.assertEqual(prices[self.item_code]["rate_locked"], 1)
+
+	def test_entries_are_stored_per_day_with_ttl(self):
+		self._prices(self.customer)
+
+		cache = frappe.cache()
+		self.assertGreater(
+			cache.ttl(cache.make_key(_agreement_price_cache_name(self.customer, nowdate()))), 0
+		)
+		self.assertIsNone(self._cached(self.customer, add_days(nowdate(), -1)))
+
+	def test_newer_agreement_rebuilds_cache_after_commit(self):
+		_make_agreement(self.customer, self.item_code, 90)
+		frappe.db.after_commit.run()
+		self.assertEqual(flt(self._prices(self.customer)[self.item_code]["price_list_rate"]), 90)
+
+		# Aynı müşteri, farklı tedarikçi; daha yeni başlayan anlaşma kazanır
+		_make_agreement(self.customer, self.item_code, 80, valid_from=nowdate())
+		# Commit edilmeden cache eski fiyatı tutar
+		self.assertEqual(flt(self._prices(self.customer)[self.item_code]["price_list_rate"]), 90)
+
+		frappe.db.after_commit.run()
+		self.assertEqual(flt(self._prices(self.customer)[self.item_code]["price_list_rate"]), 80)
+
+	def test_rebuild_is_scoped_to_the_agreement_customer(self):
+		other_customer = _make_customer()
+		self.addCleanup(frappe.cache().delete_keys, _agreement_price_cache_name(other_customer))
+		self.assertEqual(self._prices(other_customer), {})
+
+		_make_agreement(self.customer, self.item_code, 90)
+		frappe.db.after_commit.run()
+
+		self.assertIsNotNone(self._cached(other_customer))
+		self.assertEqual(self._prices(other_customer), {})
@@ -0,0 +1,148 @@
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import add_days, nowdate
+
+from culinary_order_management.culinary_order_management.agreement import (
+	ITEM_AGREEMENT_INDEX_KEY,
+	check_item_agreement_index,
+	get_active_item_agreements,
+	get_item_agreements,
+)
+from culinary_order_management.culinary_order_management.sales_order import _get_item_prices_from_agreements
+
+
+def _leaf(doctype: str) -> str:
+	return frappe.db.get_value(doctype, {"is_group": 0}, "name")
+
+
+def _make_item() -> str:
+	item_code = f"_Test Index Item {frappe.generate_hash(length=8)}"
+	frappe.get_doc(
+		{
+			"doctype": "Item",
+			"item_code": item_code,
+			"item_group": _leaf("Item Group"),
+			"stock_uom": "Nos",
+			"is_stock_item": 0,
+		}
+	).insert(ignore_permissions=True)
+	frappe.get_doc(
+		{
+			"doctype": "Item Price",
+			"price_list": "Standard Selling",
+			"item_code": item_code,
+			"price_list_rate": 100,
+		}
+	).insert(ignore_permissions=True)
+	return item_code
+
+
+def _make_agreement(item_code: str, submit: bool = True):
+	suffix = frappe.generate_hash(length=8)
+	customer = frappe.get_doc(
+		{
+			"doctype": "Customer",
+			"customer_name": f"_Test Index Customer {suffix}",
+			"customer_group": _leaf("Customer Group"),
+			"territory": _leaf("Territory"),
+		}
+	).insert(ignore_permissions=True)
+	supplier = frappe.get_doc(
+		{
+			"doctype": "Supplier",
+			"supplier_name": f"_Test Index Supplier {suffix}",
+			"supplier_group": _leaf("Supplier Group"),
+		}
+	).insert(ignore_permissions=True)
+	agreement = frappe.get_doc(
+		{
+			"doctype": "Agreement",
+			"customer": customer.name,
+			"supplier": supplier.name,
+			"valid_from": add_days(nowdate(), -1),
+			"valid_to": add_days(nowdate(), 30),
+			"agreement_items": [
+				{
+					"item_code": item_code,
+					"price_list_rate": 90,
+					"currency": frappe.db.get_value("Price List", "Standard Selling", "currency"),
+				}
+			],
+		}
+	)
+	agreement.insert(ignore_permissions=True)
+	if submit:
+		agreement.submit()
+	return agreement
+
+
+def _indexed(item_code: str):
+	return frappe.cache().hget(ITEM_AGREEMENT_INDEX_KEY, item_code)
+
+
+class TestItemAgreementIndex(FrappeTestCase):
+	def setUp(self):
+		self.item_code = _make_item()
+		# Redis runner'ın rollback'ine dahil değil
+		self.addCleanup(frappe.cache().hdel, ITEM_AGREEMENT_INDEX_KEY, self.item_code)
+
+	def test_submit_adds_and_cancel_deactivates_entry(self):
+		agreement = _make_agreement(self.item_code)
+		frappe.db.after_commit.run()
+
+		entries = _indexed(self.item_code)
+		self.assertEqual([entry.agreement for entry in entries], [agreement.name])
+		self.assertEqual(entries[0].docstatus, 1)
+		self.assertEqual(
+			[entry.agreement for entry in get_active_item_agreements([self.item_code])[self.item_code]],
+			[agreement.name],
+		)
+
+		agreement.reload()
+		agreement.cancel()
+		frappe.db.after_commit.run()
+
+		self.assertEqual(get_item_agreements([self.item_code])[self.item_code][0].docstatus, 2)
+		self.assertEqual(get_active_item_agreements([self.item_code])[self.item_code], [])
+
+	def test_index_is_not_refreshed_before_commit(self):
+		frappe.cache().hset(ITEM_AGREEMENT_INDEX_KEY, self.item_code, [])
+
+		_make_agreement(self.item_code)
+		self.assertEqual(_indexed(self.item_code), [])
+
+		frappe.db.after_commit.run()
+		self.assertEqual(len(_indexed(self.item_code)), 1)
+
+	def test_missing_entries_are_loaded_in_one_batch(self):
+		agreement = _make_agreement(self.item_code)
+		frappe.db.after_commit.run()
+		frappe.cache().hdel(ITEM_AGREEMENT_INDEX_KEY, self.item_code)
+		other_item = _make_item()
+		self.addCleanup(frappe.cache().hdel, ITEM_AGREEMENT_INDEX_KEY, other_item)
+
+		result = get_item_agreements([self.item_code, other_item])
+
+		self.assertEqual([entry.agreement for entry in result[self.item_code]], [agreement.name])
+		self.assertEqual(result[other_item], [])
+		self.assertIsNotNone(_indexed(self.item_code))
+		self.assertEqual(_indexed(other_item), [])
+
+	def test_draft_agreement_does_not_price_sales_order(self):
+		draft = _make_agreement(self.item_code, submit=False)
+		frappe.db.after_commit.run()
+
+		self.assertEqual(
+			[entry.agreement for entry in get_item_agreements([self.item_code])[self.item_code]], [draft.name]
+		)
+		self.assertEqual(_get_item_prices_from_agreements(draft.customer, [self.item_code], nowdate()), {})
+
+	def test_consistency_check_rebuilds_stale_entries(self):
+		agreement = _make_agreement(self.item_code)
+		frappe.db.after_commit.run()
+		frappe.cache().hset(ITEM_AGREEMENT_INDEX_KEY, self.item_code, [])
+
+		result = check_item_agreement_index(rebuild=True)
+
+		self.assertIn(self.item_code, result["mismatched"])
+		self.assertEqual([entry.agreement for entry in _indexed(self.item_code)], [agreement.name])
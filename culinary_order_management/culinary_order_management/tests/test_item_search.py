@@ -0,0 +1,62 @@
+import random
+import unittest
+
+from culinary_order_management.culinary_order_management.item_search import SupplierItemIndex
+
+ROWS = [
+	("ITEM-0003", "Edel Weiss Bergkäse"),
+	("ITEM-0002", "Weisswurst Classic"),
+	("KAESE-01", "Emmentaler"),
+	("ITEM-0001", None),
+]
+
+
+class TestSupplierItemIndex(unittest.TestCase):
+	def test_substring_match_on_code_and_name_keeps_order(self):
+		index = SupplierItemIndex(ROWS)
+		self.assertEqual(index.search("weiss"), [ROWS[0], ROWS[1]])
+		self.assertEqual(index.search("BERGK"), [ROWS[0]])
+		self.assertEqual(index.search("kaese"), [ROWS[2]])
+		self.assertEqual(index.search("item-000"), [ROWS[0], ROWS[1], ROWS[3]])
+		self.assertEqual(index.search("st cl"), [ROWS[1]])
+
+	def test_short_and_empty_queries(self):
+		index = SupplierItemIndex(ROWS)
+		self.assertEqual(index.search("mm"), [ROWS[2]])
+		self.assertEqual(index.search(""), ROWS)
+		self.assertEqual(index.search("  "), ROWS)
+		self.assertEqual(index.search("zzz"), [])
+
+	def test_item_name_searchfield_ignores_code(self):
+		index = SupplierItemIndex(ROWS)
+		self.assertEqual(index.search("item", searchfield="item_name"), [])
+		self.assertEqual(index.search("weiss", searchfield="item_name"), [ROWS[0], ROWS[1]])
+
+	def test_grams_do_not_span_code_and_name(self):
+		index = SupplierItemIndex([("AB", "CD")])
+		self.assertEqual(index.search("bc"), [])
+		self.assertEqual(index.search("abc"), [])
+
+	def test_paging(self):
+		rows = [(f"ITEM-{number:04d}", f"Käse {number}") for number in range(50)]
+		index = SupplierItemIndex(rows)
+		self.assertEqual(index.search("käse", start=0, page_len=20), rows[:20])
+		self.assertEqual(index.search("käse", start=40, page_len=20), rows[40:])
+
+	def test_matches_linear_scan(self):
+		rng = random.Random(3)
+		alphabet = "abcdeäöü -"
+		rows = [
+			(f"ITEM-{number:05d}", "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 20))))
+			for number in range(2_000)
+		]
+		index = SupplierItemIndex(rows)
+		for _ in range(300):
+			txt = "".join(rng.choice(alphabet + "0123") for _ in range(rng.randint(1, 5)))
+			searchfield = rng.choice(["name", "item_name"])
+			start = rng.choice([0, 20])
+			with self.subTest(txt=txt, searchfield=searchfield, start=start):
+				self.assertEqual(
+					index.search(txt, start, 20, searchfield),
+					SupplierItemIndex.scan(rows, txt, start, 20, searchfield),
+				)
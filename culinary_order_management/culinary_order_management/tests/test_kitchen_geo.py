@@ -0,0 +1,125 @@
+import os
+import random
+import unittest
+
+from culinary_order_management.culinary_order_management.kitchen_geo import (
+	KitchenGrid,
+	_brute_force_nearest,
+	haversine_km,
+	load_centroids,
+)
+
+SHIPPED_CENTROIDS = os.path.join(os.path.dirname(__file__), os.pardir, "data", "postcode_centroids.csv")
+
+
+def _random_kitchens(rng: random.Random, count: int, capacity: int = 0, radius_km: float = 0) -> list:
+	return [
+		{
+			"company": f"Mutfak - {index:03d}",
+			"lat": rng.uniform(47.3, 55.0),
+			"lon": rng.uniform(5.9, 15.0),
+			"capacity": capacity,
+			"radius_km": radius_km,
+		}
+		for index in range(count)
+	]
+
+
+def _random_points(rng: random.Random, count: int) -> list:
+	return [(rng.uniform(47.0, 55.5), rng.uniform(5.5, 15.5)) for _ in range(count)]
+
+
+class TestKitchenGrid(unittest.TestCase):
+	def assert_matches_brute_force(self, kitchens: list, points: list, cell_degrees=None):
+		grid = KitchenGrid(kitchens, cell_degrees)
+		for lat, lon in points:
+			self.assertEqual(
+				grid.nearest(lat, lon)[0], _brute_force_nearest(kitchens, lat, lon)[0], (lat, lon)
+			)
+
+	def test_nearest_matches_brute_force(self):
+		rng = random.Random(7)
+		for count in (1, 2, 30, 300):
+			with self.subTest(kitchens=count):
+				self.assert_matches_brute_force(_random_kitchens(rng, count), _random_points(rng, 500))
+
+	def test_nearest_matches_brute_force_for_any_cell_size(self):
+		rng = random.Random(11)
+		kitchens = _random_kitchens(rng, 50)
+		for cell_degrees in (0.05, 0.5, 2.0, 10.0):
+			with self.subTest(cell_degrees=cell_degrees):
+				self.assert_matches_brute_force(kitchens, _random_points(rng, 300), cell_degrees)
+
+	def test_points_outside_kitchen_area(self):
+		rng = random.Random(13)
+		kitchens = _random_kitchens(rng, 20)
+		# Kuzeyde (mutfakların dışında) ve uzak noktalar
+		points = [(60.0, 10.0), (70.0, 25.0), (40.0, 0.0), (54.9, -5.0)]
+		self.assert_matches_brute_force(kitchens, points)
+
+	def test_service_radius(self):
+		rng = random.Random(17)
+		kitchens = _random_kitchens(rng, 40, radius_km=60)
+		self.assert_matches_brute_force(kitchens, _random_points(rng, 500))
+
+		grid = KitchenGrid(kitchens)
+		self.assertEqual(grid.nearest(70.0, 25.0), (None, None))
+
+	def test_capacity_matches_brute_force_during_bulk_routing(self):
+		rng = random.Random(19)
+		kitchens = _random_kitchens(rng, 25, capacity=20)
+		grid = KitchenGrid(kitchens)
+		grid_loads, brute_loads = {}, {}
+		for lat, lon in _random_points(rng, 600):
+			expected = _brute_force_nearest(kitchens, lat, lon, brute_loads)[0]
+			if expected:
+				brute_loads[expected] = brute_loads.get(expected, 0) + 1
+			self.assertEqual(grid.route(lat, lon, grid_loads), expected)
+
+		self.assertEqual(grid_loads, brute_loads)
+		self.assertTrue(all(load <= 20 for load in grid_loads.values()))
+		# 25 x 20 kapasite dolunca kalan siparişler atanmaz
+		self.assertEqual(sum(grid_loads.values()), 500)
+
+	def test_empty_grid(self):
+		self.assertEqual(KitchenGrid([]).nearest(52.5, 13.4), (None, None))
+
+	def test_distance_is_returned(self):
+		kitchen = {"company": "Mutfak - Berlin", "lat": 52.52, "lon": 13.405}
+		company, distance = KitchenGrid([kitchen]).nearest(48.137, 11.575)
+		self.assertEqual(company, "Mutfak - Berlin")
+		self.assertAlmostEqual(distance, haversine_km(48.137, 11.575, 52.52, 13.405))
+		self.assertAlmostEqual(distance, 504, delta=5)
+
+
+class TestShippedCentroids(unittest.TestCase):
+	@classmethod
+	def setUpClass(cls):
+		cls.centroids = load_centroids(SHIPPED_CENTROIDS)
+
+	def test_covers_german_postcodes(self):
+		self.assertGreater(len(self.centroids), 8000)
+		for lat, lon in self.centroids.values():
+			self.assertTrue(47.0 < lat < 55.5 and 5.5 < lon < 15.5, (lat, lon))
+
+	def test_routes_real_postcodes(self):
+		kitchens = [
+			{
+				"company": "Mutfak - Berlin",
+				"lat": self.centroids["10115"][0],
+				"lon": self.centroids["10115"][1],
+			},
+			{
+				"company": "Mutfak - München",
+				"lat": self.centroids["80331"][0],
+				"lon": self.centroids["80331"][1],
+			},
+		]
+		grid = KitchenGrid(kitchens)
+
+		self.assertEqual(grid.nearest(*self.centroids["80333"])[0], "Mutfak - München")
+		self.assertEqual(grid.nearest(*self.centroids["10178"])[0], "Mutfak - Berlin")
+		# Hamburg Berlin'e daha yakın (~255 km / ~610 km)
+		company, distance = grid.nearest(*self.centroids["20095"])
+		self.assertEqual(company, "Mutfak - Berlin")
+		self.assertAlmostEqual(distance, 255, delta=15)
@@ -0,0 +1,161 @@
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import add_days, add_to_date, flt, now, nowdate
+
+from culinary_order_management.culinary_order_management.agreement import (
+	ITEM_PRICE_BATCH_SIZE,
+	STANDARD_PRICE_CHANGES_KEY,
+	_pop_standard_price_changes,
+	process_standard_price_changes,
+)
+
+
+def _queued() -> set:
+	return {frappe.safe_decode(code) for code in frappe.cache().smembers(STANDARD_PRICE_CHANGES_KEY)}
+
+
+def _leaf(doctype: str) -> str:
+	return frappe.db.get_value(doctype, {"is_group": 0}, "name")
+
+
+def _currency() -> str:
+	return frappe.db.get_value("Price List", "Standard Selling", "currency")
+
+
+def _make_item(standard_rate: float) -> tuple:
+	item_code = f"_Test Price Change Item {frappe.generate_hash(length=8)}"
+	frappe.get_doc(
+		{
+			"doctype": "Item",
+			"item_code": item_code,
+			"item_group": _leaf("Item Group"),
+			"stock_uom": "Nos",
+			"is_stock_item": 0,
+		}
+	).insert(ignore_permissions=True)
+	price = frappe.get_doc(
+		{
+			"doctype": "Item Price",
+			"price_list": "Standard Selling",
+			"item_code": item_code,
+			"price_list_rate": standard_rate,
+		}
+	).insert(ignore_permissions=True)
+	return item_code, price.name
+
+
+def _make_agreement(item_code: str, price_list_rate: float, standard_rate: float, discount_rate: float):
+	suffix = frappe.generate_hash(length=8)
+	customer = frappe.get_doc(
+		{
+			"doctype": "Customer",
+			"customer_name": f"_Test Price Change Customer {suffix}",
+			"customer_group": _leaf("Customer Group"),
+			"territory": _leaf("Territory"),
+		}
+	).insert(ignore_permissions=True)
+	supplier = frappe.get_doc(
+		{
+			"doctype": "Supplier",
+			"supplier_name": f"_Test Price Change Supplier {suffix}",
+			"supplier_group": _leaf("Supplier Group"),
+		}
+	).insert(ignore_permissions=True)
+	agreement = frappe.get_doc(
+		{
+			"doctype": "Agreement",
+			"customer": customer.name,
+			"supplier": supplier.name,
+			"valid_from": add_days(nowdate(), -1),
+			"valid_to": add_days(nowdate(), 30),
+			"discount_rate": discount_rate,
+			"agreement_items": [
+				{
+					"item_code": item_code,
+					"price_list_rate": price_list_rate,
+					"standard_selling_rate": standard_rate,
+					"currency": _currency(),
+				}
+			],
+		}
+	)
+	agreement.insert(ignore_permissions=True)
+	agreement.submit()
+	# Ürün → anlaşma index'i commit sonrası kurulur
+	frappe.db.after_commit.run()
+	return agreement
+
+
+def _agreement_price(agreement, item_code: str) -> float:
+	return flt(
+		frappe.db.get_value(
+			"Item Price", {"custom_agreement": agreement.name, "item_code": item_code}, "price_list_rate"
+		)
+	)
+
+
+class TestStandardPriceChanges(FrappeTestCase):
+	def setUp(self):
+		frappe.cache().delete_value(STANDARD_PRICE_CHANGES_KEY)
+		self.addCleanup(frappe.cache().delete_value, STANDARD_PRICE_CHANGES_KEY)
+
+	def process(self):
+		# Job parça başına commit eder; test verisi runner'ın rollback'ine kalsın
+		with patch.object(frappe.db, "commit"):
+			process_standard_price_changes()
+
+	def test_queued_change_is_applied_and_drained(self):
+		item_code, standard_price = _make_item(standard_rate=100)
+		agreement = _make_agreement(item_code, 90, 100, discount_rate=10)
+		self.assertEqual(_agreement_price(agreement, item_code), 90)
+
+		frappe.db.set_value("Item Price", standard_price, "price_list_rate", 200)
+		frappe.cache().sadd(STANDARD_PRICE_CHANGES_KEY, item_code)
+		self.process()
+
+		self.assertFalse(_queued())
+		self.assertEqual(_agreement_price(agreement, item_code), 180)
+
+	def test_other_currency_standard_price_is_ignored(self):
+		item_code, standard_price = _make_item(standard_rate=100)
+		agreement = _make_agreement(item_code, 90, 100, discount_rate=10)
+
+		frappe.db.set_value("Item Price", standard_price, "price_list_rate", 200)
+		# Daha yeni ama farklı para birimindeki Standard Selling satırı
+		other_currency = frappe.db.get_value("Currency", {"name": ("!=", _currency()), "enabled": 1})
+		frappe.get_doc(
+			{
+				"doctype": "Item Price",
+				"price_list": "Standard Selling",
+				"item_code": item_code,
+				"currency": other_currency,
+				"price_list_rate": 999,
+				"modified": add_to_date(now(), minutes=1),
+			}
+		).db_insert()
+
+		frappe.cache().sadd(STANDARD_PRICE_CHANGES_KEY, item_code)
+		self.process()
+
+		self.assertEqual(_agreement_price(agreement, item_code), 180)
+
+	def test_standard_price_update_is_queued_after_commit(self):
+		item_code, standard_price = _make_item(standard_rate=100)
+		frappe.db.after_commit.run()
+
+		price = frappe.get_doc("Item Price", standard_price)
+		price.price_list_rate = 120
+		price.save(ignore_permissions=True)
+		self.assertNotIn(item_code, _queued())
+
+		frappe.db.after_commit.run()
+		self.assertIn(item_code, _queued())
+
+	def test_pop_drains_more_than_one_batch(self):
+		codes = {f"_Test Queued Item {index}" for index in range(ITEM_PRICE_BATCH_SIZE * 2 + 1)}
+		frappe.cache().sadd(STANDARD_PRICE_CHANGES_KEY, *codes)
+
+		self.assertEqual(set(_pop_standard_price_changes()), codes)
+		self.assertFalse(_queued())
@@ -83,7 +83,14 @@ fixtures = [
 	{
 		"dt": "Custom Field",
 		"filters": [
-			["name", "in", ["Item-supplier_display"]]
+			["name", "in", [
+				"Item-supplier_display",
+				"Item Price-custom_agreement",
+				"Company-custom_kitchen_routing_section",
+				"Company-custom_kitchen_capacity",
+				"Company-custom_service_radius_km",
+				"Supplier-custom_company",
+			]]
 		]
 	},
 	{
@@ -179,7 +186,47 @@ doc_events = {
 	# Agreement hooks - Artık Agreement class içinde direkt çağrılıyor (agreement.py)
 	# Fiyat yönetimi: on_submit → create_price_list, on_update_after_submit → sync_prices, on_cancel → cleanup_prices
 	
-	# Item Price hook - Standard Selling fiyat güncellendiğinde Agreement'ları otomatik güncelle
+	# Currency Exchange hook - kur değişince get_conversion_rate cache'ini temizle
+	"Currency Exchange": {
+		"on_update": "culinary_order_management.culinary_order_management.sales_order.clear_conversion_rate_cache",
+		"on_trash": "culinary_order_management.culinary_order_management.sales_order.clear_conversion_rate_cache",
+	},
+	
+	# Company/Address hook - posta kodu → mutfak routing index'ini ve supplier → company map'ini temizle
+	"Company": {
+		"on_update": [
+			"culinary_order_management.culinary_order_management.kitchen_routing.clear_kitchen_routing_index",
+			"culinary_order_management.culinary_order_management.sales_order_hooks.clear_company_resolution",
+		],
+		"on_trash": [
+			"culinary_order_management.culinary_order_management.kitchen_routing.clear_kitchen_routing_index",
+			"culinary_order_management.culinary_order_management.sales_order_hooks.clear_company_resolution",
+		],
+		"after_rename": [
+			"culinary_order_management.culinary_order_management.kitchen_routing.clear_kitchen_routing_index",
+			"culinary_order_management.culinary_order_management.sales_order_hooks.clear_company_resolution",
+		],
+	},
+	"Address": {
+		"on_update": "culinary_order_management.culinary_order_management.kitchen_routing.clear_kitchen_routing_index",
+		"on_trash": "culinary_order_management.culinary_order_management.kitchen_routing.clear_kitchen_routing_index",
+	},
+	
+	# Supplier hook - açık supplier → company eşleşmesi (custom_company) değişince map'i temizle
+	"Supplier": {
+		"on_update": "culinary_order_management.culinary_order_management.sales_order_hooks.clear_company_resolution",
+		"on_trash": "culinary_order_management.culinary_order_management.sales_order_hooks.clear_company_resolution",
+		"after_rename": "culinary_order_management.culinary_order_management.sales_order_hooks.clear_company_resolution",
+	},
+	
+	# Item hook - tedarikçi ürün seçici cache'ini temizle (Item Supplier child tablosu dahil)
+	"Item": {
+		"on_update": "culinary_order_management.culinary_order_management.api.clear_supplier_items_cache",
+		"on_trash": "culinary_order_management.culinary_order_management.api.clear_supplier_items_cache",
+		"after_rename": "culinary_order_management.culinary_order_management.api.clear_supplier_items_cache",
+	},
+	
+	# Item Price hook - Standard Selling fiyat değişikliğini kuyruğa al (process_standard_price_changes işler)
 	"Item Price": {
 		"after_insert": "culinary_order_management.culinary_order_management.agreement.sync_agreement_prices_on_standard_change",
 		"on_update": "culinary_order_management.culinary_order_management.agreement.sync_agreement_prices_on_standard_change",
@@ -195,8 +242,15 @@ doc_events = {
 
 scheduler_events = {
 	"daily": [
-		"culinary_order_management.culinary_order_management.doctype.agreement.agreement.update_all_agreement_statuses"
+		"culinary_order_management.culinary_order_management.doctype.agreement.agreement.update_all_agreement_statuses",
+		"culinary_order_management.culinary_order_management.agreement.check_item_agreement_index",
 	],
+	"cron": {
+		# Standard Selling fiyat değişikliklerini birleştirip toplu işle
+		"* * * * *": [
+			"culinary_order_management.culinary_order_management.agreement.process_standard_price_changes"
+		],
+	},
 }
 
 # Testing
@@ -0,0 +1,17 @@
+import frappe
+
+
+def execute():
+	"""Sales Order ürün seçicisi (items_by_customer_agreement) için index'ler.
+
+	- Agreement (customer, valid_from, valid_to, docstatus): müşteri + tarih aralığı filtresi
+	- Agreement Item (parent, item_code): anlaşma -> ürün join'i index'ten okunur
+	- Item.item_name FULLTEXT: culinary_item_search_mode = "fulltext" için
+	"""
+	frappe.db.add_index(
+		"Agreement", ["customer", "valid_from", "valid_to", "docstatus"], "customer_validity_index"
+	)
+	frappe.db.add_index("Agreement Item", ["parent", "item_code"], "parent_item_code_index")
+
+	if not frappe.db.has_index("tabItem", "item_name_fulltext"):
+		frappe.db.sql_ddl("alter table `tabItem` add fulltext index `item_name_fulltext` (`item_name`)")
@@ -0,0 +1,40 @@
+import frappe
+from frappe.custom.doctype.custom_field.custom_field import create_custom_fields
+
+
+def execute():
+	"""Item Price.custom_agreement alanını oluştur ve note alanından doldur.
+
+	Fixture'lar patch'lerden sonra senkronize edildiği için alan burada da oluşturulur.
+	Sadece note değeri bir Agreement adıyla birebir eşleşen kayıtlar doldurulur;
+	LIKE ile eşleştirme önek çakışmalarında yanlış anlaşmaya bağlayabilir.
+	"""
+	if not frappe.db.has_column("Item Price", "custom_agreement"):
+		create_custom_fields(
+			{
+				"Item Price": [
+					{
+						"fieldname": "custom_agreement",
+						"label": "Agreement",
+						"fieldtype": "Link",
+						"options": "Agreement",
+						"insert_after": "note",
+						"read_only": 1,
+						"no_copy": 1,
+						"search_index": 1,
+						"in_standard_filter": 1,
+						"description": "Agreement that owns this price",
+					}
+				]
+			},
+			update=True,
+		)
+
+	frappe.db.sql(
+		"""
+		update `tabItem Price` ip
+		  join `tabAgreement` ag on ag.name = trim(ip.note)
+		   set ip.custom_agreement = ag.name
+		 where ifnull(ip.custom_agreement, '') = ''
+		"""
+	)
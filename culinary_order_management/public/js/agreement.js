@@ -5,6 +5,10 @@ const toFloat = (v) => {
 };
 const round2 = (v) => Math.round((v + Number.EPSILON) * 100) / 100;
 
+const SUPPLIER_ITEMS_PAGE_LENGTH = 200;
+const DISCOUNT_DEBOUNCE_MS = 300;
+const DISCOUNT_CHUNK_SIZE = 500;
+
 frappe.ui.form.on('Agreement', {
     refresh(frm) {
         const grid = frm.fields_dict.agreement_items && frm.fields_dict.agreement_items.grid;
@@ -36,14 +40,16 @@ frappe.ui.form.on('Agreement', {
         }
     },
     discount_rate(frm) {
-        // İndirim oranı değiştiğinde tüm satırlarda anlaşma fiyatını güncelle
-        apply_agreement_discount(frm);
+        // İndirim oranı değiştiğinde tüm satırlarda anlaşma fiyatını güncelle (debounce)
+        clearTimeout(frm._agreement_discount_timer);
+        frm._agreement_discount_timer = setTimeout(() => apply_agreement_discount(frm), DISCOUNT_DEBOUNCE_MS);
     },
     customer(frm) {
         // müşteri değiştiğinde tabloyu yeniden kurmayız; sadece fiyat hesaplarken kullanılır
     },
     supplier(frm) {
         // Tedarikçi seçildiğinde tüm ürünleri tabloya getir
+        frm._supplier_items_token = (frm._supplier_items_token || 0) + 1;
         if (!frm.doc.supplier) return;
         frm.clear_table('agreement_items');
         // set_query tekrar uygula (yeni satırlarda da tedarikçi filtreli olsun)
@@ -59,27 +65,9 @@ frappe.ui.form.on('Agreement', {
                 };
             };
         }
-        frappe.call({
-            method: 'culinary_order_management.culinary_order_management.agreement.get_supplier_items_with_standard_prices',
-            args: {
-                supplier: frm.doc.supplier,
-                currency: (frm.doc.agreement_items && frm.doc.agreement_items[0] && frm.doc.agreement_items[0].currency) || null,
-            },
-        }).then(r => {
-            (r.message || []).forEach(row => {
-                const d = frm.add_child('agreement_items');
-                d.item_code = row.item_code;
-                d.item_name = row.item_name;
-                d.item_group = row.item_group;
-                d.kitchen_item = row.kitchen_item ? 1 : 0;
-                d.uom = row.uom;
-                d.standard_selling_rate = row.standard_selling_rate;
-                d.price_list_rate = row.price_list_rate;
-                d.currency = row.currency;
-            });
-            frm.refresh_field('agreement_items');
-            // mevcut indirim oranını uygula
-            apply_agreement_discount(frm);
+        load_supplier_items(frm, {
+            supplier: frm.doc.supplier,
+            currency: (frm.doc.agreement_items && frm.doc.agreement_items[0] && frm.doc.agreement_items[0].currency) || null,
         });
     },
     
@@ -219,14 +207,71 @@ frappe.ui.form.on('Agreement', {
     }
 });
 
+// Tedarikçi ürünlerini sayfa sayfa getir; her sayfa tabloya eklenir ve grid bir kez yenilenir
+function load_supplier_items(frm, args) {
+    // Yükleme sırasında tedarikçi değişirse eski yükleme durur
+    const token = (frm._supplier_items_token || 0) + 1;
+    frm._supplier_items_token = token;
+
+    const load_page = (cursor) => frappe.call({
+        method: 'culinary_order_management.culinary_order_management.agreement.get_supplier_items_page',
+        args: Object.assign({}, args, {
+            cursor: cursor ? JSON.stringify(cursor) : null,
+            page_length: SUPPLIER_ITEMS_PAGE_LENGTH,
+        }),
+    }).then(r => {
+        if (frm._supplier_items_token !== token) return;
+        const page = r.message || {};
+        const discount = toFloat(frm.doc.discount_rate || 0);
+        (page.items || []).forEach(row => {
+            const d = frm.add_child('agreement_items');
+            d.item_code = row.item_code;
+            d.item_name = row.item_name;
+            d.item_group = row.item_group;
+            d.kitchen_item = row.kitchen_item ? 1 : 0;
+            d.uom = row.uom;
+            d.standard_selling_rate = row.standard_selling_rate;
+            // mevcut indirim oranını uygula
+            d.price_list_rate = get_discounted_rate(row.standard_selling_rate, discount) || row.price_list_rate;
+            d.currency = row.currency;
+        });
+        frm.refresh_field('agreement_items');
+        if (page.next_cursor) {
+            return load_page(page.next_cursor);
+        }
+    });
+
+    return load_page(null);
+}
+
+function get_discounted_rate(standard_rate, discount) {
+    const base = toFloat(standard_rate || 0);
+    if (base <= 0) return null;
+    return round2(discount ? base * (1.0 - discount / 100.0) : base);
+}
+
+// Satırlar parça parça hesaplanır (tarayıcı donmasın), grid en sonda tek sefer yenilenir
 function apply_agreement_discount(frm) {
     const discount = toFloat(frm.doc.discount_rate || 0);
-    (frm.doc.agreement_items || []).forEach(d => {
-        const base = toFloat(d.standard_selling_rate || 0);
-        if (base > 0) {
-            const eff = discount ? base * (1.0 - discount / 100.0) : base;
-            d.price_list_rate = round2(eff);
+    const rows = frm.doc.agreement_items || [];
+    const token = (frm._agreement_discount_token || 0) + 1;
+    frm._agreement_discount_token = token;
+
+    const apply_chunk = (start) => {
+        // Yeni bir indirim değişikliği geldiyse bu tur bırakılır
+        if (frm._agreement_discount_token !== token) return;
+        rows.slice(start, start + DISCOUNT_CHUNK_SIZE).forEach(d => {
+            const rate = get_discounted_rate(d.standard_selling_rate, discount);
+            if (rate !== null) {
+                d.price_list_rate = rate;
+            }
+        });
+        if (start + DISCOUNT_CHUNK_SIZE < rows.length) {
+            setTimeout(() => apply_chunk(start + DISCOUNT_CHUNK_SIZE), 0);
+        } else {
+            frm.refresh_field('agreement_items');
         }
-    });
-    frm.refresh_field('agreement_items');
+    };
+
+    apply_chunk(0);
 }
@@ -55,4 +55,71 @@ frappe.ui.form.on('Sales Order', {
             }, __('Faturalama'));
         }
     }
-});
\ No newline at end of file
+});
+
+// Anlaşma fiyatları: ERPNext'in item_code → get_item_details fiyat isteği bittikten
+// sonra uygulanır (frappe.after_ajax), böylece son yazan anlaşma fiyatı olur.
+// Aynı anda birden çok satır değişirse (WooCommerce siparişi / yapıştırılan liste)
+// tek toplu istek, tek satırda tekil istek kullanılır.
+const AGREEMENT_PRICE_METHOD = 'culinary_order_management.culinary_order_management.sales_order.get_item_price_from_agreement';
+const AGREEMENT_PRICES_METHOD = 'culinary_order_management.culinary_order_management.sales_order.get_item_prices_from_agreement';
+
+frappe.ui.form.on('Sales Order Item', {
+    item_code(frm, cdt, cdn) {
+        queue_agreement_price(frm, cdn);
+    }
+});
+
+function queue_agreement_price(frm, cdn) {
+    frm._agreement_price_queue = frm._agreement_price_queue || new Set();
+    frm._agreement_price_queue.add(cdn);
+    if (frm._agreement_price_scheduled) return;
+    frm._agreement_price_scheduled = true;
+    frappe.after_ajax(() => {
+        frm._agreement_price_scheduled = false;
+        flush_agreement_prices(frm);
+    });
+}
+
+function fetch_agreement_prices(frm, item_codes) {
+    const args = {
+        customer: frm.doc.customer,
+        posting_date: frm.doc.transaction_date || frappe.datetime.get_today(),
+        so_currency: frm.doc.currency || 'EUR',
+    };
+    if (item_codes.length === 1) {
+        return frappe.call({
+            method: AGREEMENT_PRICE_METHOD,
+            args: Object.assign({item_code: item_codes[0]}, args),
+        }).then(r => (r.message && r.message.price_list_rate ? {[item_codes[0]]: r.message} : {}));
+    }
+    return frappe.call({
+        method: AGREEMENT_PRICES_METHOD,
+        args: Object.assign({item_codes: item_codes}, args),
+    }).then(r => r.message || {});
+}
+
+function flush_agreement_prices(frm) {
+    const cdns = Array.from(frm._agreement_price_queue || []);
+    frm._agreement_price_queue = new Set();
+    if (!frm.doc.customer || frm.doc.docstatus !== 0) return;
+
+    const rows = cdns
+        .map(cdn => locals['Sales Order Item'] && locals['Sales Order Item'][cdn])
+        .filter(row => row && row.item_code);
+    if (!rows.length) return;
+
+    const requested = new Map(rows.map(row => [row.name, row.item_code]));
+    fetch_agreement_prices(frm, [...new Set(requested.values())]).then(async (prices) => {
+        for (const row of rows) {
+            const price = prices[row.item_code];
+            // Yanıt gelene kadar ürünü değişen satırlara dokunma
+            if (!price || requested.get(row.name) !== row.item_code) continue;
+            row._agreement_supplier = price.supplier;
+            row._agreement_rate_locked = price.rate_locked;
+            // price_list_rate tetikleyicisi rate'i yeniden hesaplar; anlaşma fiyatı sonra yazılır
+            await frappe.model.set_value(row.doctype, row.name, 'price_list_rate', price.price_list_rate);
+            await frappe.model.set_value(row.doctype, row.name, 'rate', price.price_list_rate);
+        }
+    });
+}